@@ -1,17 +1,22 @@
 # 标准库
 import asyncio
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
 
 # 第三方库
-import aiohttp
-import dashscope
+import httpx
 from PIL import Image
 from pydantic import BaseModel
 
 # 本地模块
+from .backends import GenerationResult, LLMBackend, create_backend, create_session
+from .cache import make_cache_key, response_cache
+from .circuit_breaker import CircuitOpenError, breakers, parse_failover_chain
 from .config import config
 from .logger import Logger
 from .monitor import monitor
+from .rate_limiter import estimate_tokens, limiters
+from .retry import get_hedger, is_retryable, retry_policy
+from .singleflight import singleflight
 
 
 class PromptTemplate(BaseModel):
@@ -23,20 +28,81 @@ class PromptTemplate(BaseModel):
     parameters: Dict[str, str] = {}
 
 
+class _StreamInterrupted(Exception):
+    """流式生成在输出增量之后失败，不能再重试或切换后端"""
+
+    def __init__(self, error: Exception):
+        super().__init__(str(error))
+        self.error = error
+
+
+class _SharedStream:
+    """一次共享的流式生成，后加入的调用方先收到已产出的增量，再继续接收新的增量"""
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.readers = 0
+        self.task: Optional["asyncio.Task[None]"] = None
+        self._changed = asyncio.Condition()
+
+    async def push(self, delta: str) -> None:
+        async with self._changed:
+            self.chunks.append(delta)
+            self._changed.notify_all()
+
+    async def finish(self, error: Optional[BaseException] = None) -> None:
+        async with self._changed:
+            self.done = True
+            self.error = error
+            self._changed.notify_all()
+
+    async def iterate(self) -> AsyncIterator[str]:
+        """逐段产出增量，生成失败时抛出异常；最后一个读取方离开时取消尚未完成的生成"""
+        index = 0
+        self.readers += 1
+        try:
+            while True:
+                async with self._changed:
+                    await self._changed.wait_for(lambda: self.done or len(self.chunks) > index)
+                    chunks, done = self.chunks[index:], self.done
+                index += len(chunks)
+                for delta in chunks:
+                    yield delta
+                if done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+        finally:
+            self.readers -= 1
+            if self.readers == 0 and self.task is not None and not self.task.done():
+                self.task.cancel()
+
+
+# 正在进行的流式生成，按缓存键共享
+_shared_streams: Dict[str, _SharedStream] = {}
+
+
 class AsyncAgent:
     def __init__(self, name: str, role: str):
         self.logger = Logger(f"Agent.{name}")
         self.name = name
         self.role = role
         self.memory: Dict[str, Any] = {}
-        
-        if not config.dashscope_api_key:
+
+        # 按顺序尝试的 (后端, 模型)，第一个为主模型
+        self.failover_chain = parse_failover_chain(config.llm_failover_chain) or [
+            ("dashscope", config.dashscope_model)
+        ]
+        if not config.dashscope_api_key and any(backend == "dashscope" for backend, _ in self.failover_chain):
             raise ValueError("DASHSCOPE_API_KEY 未配置")
-            
-        dashscope.api_key = config.dashscope_api_key
-        self.model = dashscope.Generation()
+
+        self.backend, self.model = self.failover_chain[0]
         self.prompt_templates: Dict[str, PromptTemplate] = {}
-        self.session: Optional[aiohttp.ClientSession] = None
+        self.session: Optional[httpx.AsyncClient] = None
+        self.backends: Dict[str, LLMBackend] = {}
+        self.cache = response_cache
         
         self.logger.info(f"初始化智能体 {name}，角色：{role}")
         monitor.log_event("agent_init", f"初始化智能体：{name} ({role})")
@@ -44,34 +110,111 @@ class AsyncAgent:
     async def initialize(self):
         """初始化异步会话"""
         if not self.session:
-            self.session = aiohttp.ClientSession()
+            self.session = create_session()
+            self.backends = {
+                backend: create_backend(backend, self.session)
+                for backend, _ in self.failover_chain
+            }
 
     async def close(self):
         """关闭异步会话"""
         if self.session:
-            await self.session.close()
+            for backend in self.backends.values():
+                await backend.close()
+            await self.session.aclose()
             self.session = None
+            self.backends = {}
+
+    def _build_messages(self, context: str) -> List[Dict[str, str]]:
+        """构造发送给模型的消息列表"""
+        return [
+            {
+                "role": "system",
+                "content": f"你是一个名为{self.name}的AI助手，扮演{self.role}的角色。",
+            },
+            {"role": "user", "content": context},
+        ]
+
+    def _estimate_tokens(self, messages: List[Dict[str, str]]) -> int:
+        """估算一次调用的令牌数，用于每分钟令牌数限流"""
+        return sum(estimate_tokens(message["content"]) for message in messages)
+
+    async def _generate(self, messages: List[Dict[str, str]]) -> str:
+        """调用模型生成回应，优先使用响应缓存"""
+        cache_key = make_cache_key(self.backend, self.model, messages)
+        if self.cache:
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                monitor.log_event("agent_think_cached", f"智能体 {self.name} 命中响应缓存")
+                return cached
+
+        # 相同请求并发时只向模型发送一次
+        return await singleflight.do(cache_key, lambda: self._call_model(messages))
+
+    async def _call_model(self, messages: List[Dict[str, str]]) -> str:
+        """向模型发送请求并写入缓存，失败时按重试策略重试，仍失败则转移到下一个后端
+
+        缓存按实际回应的后端/模型写入，后备模型的回应不会在主模型恢复后继续命中。
+        """
+        # 环境初始化之后才加入的智能体需要在这里建立会话
+        await self.initialize()
+
+        last_error: Optional[Exception] = None
+        for backend, model in self.failover_chain:
+
+            async def request() -> GenerationResult:
+                if config.llm_hedging_enabled:
+                    hedger = get_hedger(f"{backend}:{model}")
+                    return await hedger.call(lambda: self._request(backend, model, messages))
+                return await self._request(backend, model, messages)
+
+            try:
+                result = await retry_policy.call(request, on_retry=self._log_retry)
+            except Exception as e:
+                if not self._should_failover(e):
+                    raise
+                last_error = e
+                self._log_failover(backend, model, e)
+                continue
+
+            if self.cache:
+                await self.cache.set(make_cache_key(backend, model, messages), result.text)
+            return result.text
+
+        raise last_error
+
+    async def _request(self, backend: str, model: str, messages: List[Dict[str, str]]) -> GenerationResult:
+        """在熔断器和限流器许可下发送一次请求"""
+        limiter = limiters.get(backend, model)
+        async with breakers.get(f"{backend}:{model}").guard():
+            async with limiter.acquire(self._estimate_tokens(messages)) as permit:
+                result = await self.backends[backend].chat(model, messages)
+                if result.usage:
+                    output_tokens = result.usage.get("output_tokens", 0)
+                    permit.record_tokens(result.usage.get("input_tokens", 0) + output_tokens, output_tokens)
+        return result
+
+    def _should_failover(self, error: BaseException) -> bool:
+        """熔断或后端故障时转移到下一个后端，请求本身有误时直接报错"""
+        return isinstance(error, CircuitOpenError) or is_retryable(error)
+
+    def _log_failover(self, backend: str, model: str, error: BaseException) -> None:
+        self.logger.warning(f"{backend}:{model} 不可用，尝试下一个后端: {error}")
+        monitor.log_event("llm_failover", f"智能体 {self.name} 的 {backend}:{model} 调用失败: {error}")
+
+    def _log_retry(self, attempt: int, error: BaseException, delay: float) -> None:
+        self.logger.warning(f"第 {attempt} 次调用失败，{delay:.2f} 秒后重试: {error}")
 
     async def think(self, context: str) -> str:
         """异步思考并生成回应"""
         monitor.log_event("agent_think_start", f"智能体 {self.name} 开始思考")
         try:
-            response = await asyncio.to_thread(
-                self.model.call,
-                dashscope.Generation.Models.qwen_turbo,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": f"你是一个名为{self.name}的AI助手，扮演{self.role}的角色。",
-                    },
-                    {"role": "user", "content": context},
-                ],
-            )
-            
+            text = await self._generate(self._build_messages(context))
+
             # 记录思考结果
             monitor.add_artifact(
                 "agent_thought",
-                f"# {self.name} 的思考结果\n\n**上下文**:\n{context}\n\n**回应**:\n{response.output.text}",
+                f"# {self.name} 的思考结果\n\n**上下文**:\n{context}\n\n**回应**:\n{text}",
                 {
                     "agent": self.name,
                     "role": self.role
@@ -79,12 +222,130 @@ class AsyncAgent:
             )
             
             monitor.log_event("agent_think_end", f"智能体 {self.name} 完成思考")
-            return response.output.text
+            return text
         except Exception as e:
             error_msg = f"思考时出错: {str(e)}"
             monitor.log_event("agent_think_error", error_msg)
             return error_msg
 
+    async def _stream_model(self, messages: List[Dict[str, str]], on_delta: Callable[[str], Awaitable[None]]) -> str:
+        """流式请求模型并写入缓存，与 _call_model 一样重试和转移后端
+
+        只有在输出第一段增量之前失败时才重试或转移到下一个后端，之后的失败直接抛出。
+        """
+        await self.initialize()
+
+        chunks: List[str] = []
+        last_error: Optional[Exception] = None
+        for backend, model in self.failover_chain:
+            try:
+                await retry_policy.call(
+                    lambda: self._request_stream(backend, model, messages, chunks, on_delta),
+                    on_retry=self._log_retry,
+                )
+            except _StreamInterrupted as e:
+                raise e.error
+            except Exception as e:
+                if not self._should_failover(e):
+                    raise
+                last_error = e
+                self._log_failover(backend, model, e)
+                continue
+
+            text = "".join(chunks)
+            if self.cache:
+                await self.cache.set(make_cache_key(backend, model, messages), text)
+            return text
+
+        raise last_error
+
+    async def _request_stream(
+        self,
+        backend: str,
+        model: str,
+        messages: List[Dict[str, str]],
+        chunks: List[str],
+        on_delta: Callable[[str], Awaitable[None]],
+    ) -> None:
+        """在熔断器和限流器许可下发送一次流式请求，按最后一段返回的用量修正令牌数"""
+        limiter = limiters.get(backend, model)
+        input_tokens = self._estimate_tokens(messages)
+        try:
+            async with breakers.get(f"{backend}:{model}").guard():
+                async with limiter.acquire(input_tokens) as permit:
+                    usage: Dict[str, int] = {}
+                    async for part in self.backends[backend].stream(model, messages):
+                        if part.usage:
+                            usage = part.usage
+                        if part.text:
+                            chunks.append(part.text)
+                            await on_delta(part.text)
+                    # 后端没有返回用量时按生成的文本估算输出令牌数
+                    output_tokens = usage.get("output_tokens") or estimate_tokens("".join(chunks))
+                    permit.record_tokens((usage.get("input_tokens") or input_tokens) + output_tokens, output_tokens)
+        except Exception as e:
+            if chunks:
+                raise _StreamInterrupted(e) from e
+            raise
+
+    async def _run_shared_stream(self, cache_key: str, messages: List[Dict[str, str]], shared: _SharedStream) -> None:
+        """经单飞合并执行流式生成，结果写入共享流"""
+        try:
+            text = await singleflight.do(cache_key, lambda: self._stream_model(messages, shared.push))
+            if not shared.chunks:
+                # 合并到了相同的非流式调用，整段回应作为一段增量
+                await shared.push(text)
+            await shared.finish()
+        except Exception as e:
+            await shared.finish(e)
+        except asyncio.CancelledError as e:
+            await shared.finish(e)
+            raise
+        finally:
+            if _shared_streams.get(cache_key) is shared:
+                del _shared_streams[cache_key]
+
+    async def think_stream(self, context: str) -> AsyncIterator[str]:
+        """异步流式思考，逐段产出回应增量
+
+        与 think 一样使用响应缓存、单飞合并、重试和令牌数修正；
+        相同请求正在流式生成时，从已产出的增量开始跟随同一次生成。
+        """
+        monitor.log_event("agent_think_start", f"智能体 {self.name} 开始流式思考")
+        messages = self._build_messages(context)
+        cache_key = make_cache_key(self.backend, self.model, messages)
+        text = await self.cache.get(cache_key) if self.cache else None
+        if text is not None:
+            monitor.log_event("agent_think_cached", f"智能体 {self.name} 命中响应缓存")
+            yield text
+        else:
+            shared = _shared_streams.get(cache_key)
+            if shared is None:
+                shared = _SharedStream()
+                _shared_streams[cache_key] = shared
+                shared.task = asyncio.ensure_future(self._run_shared_stream(cache_key, messages, shared))
+            chunks: List[str] = []
+            async for delta in shared.iterate():
+                chunks.append(delta)
+                yield delta
+            text = "".join(chunks)
+
+        monitor.add_artifact(
+            "agent_thought",
+            f"# {self.name} 的思考结果\n\n**上下文**:\n{context}\n\n**回应**:\n{text}",
+            {
+                "agent": self.name,
+                "role": self.role
+            }
+        )
+        monitor.log_event("agent_think_end", f"智能体 {self.name} 完成流式思考")
+
+    async def embed(self, texts: List[str], model: Optional[str] = None) -> List[List[float]]:
+        """使用主后端计算文本向量"""
+        await self.initialize()
+        backend = self.backends[self.backend]
+        return await backend.embed(model or backend.default_embedding_model, texts)
+
     def add_prompt_template(self, template: PromptTemplate) -> None:
         """添加提示词模板"""
         self.prompt_templates[template.name] = template
@@ -140,13 +401,25 @@ class AsyncAgent:
             monitor.log_event("memory_retrieved", f"回忆记忆：{key}")
         return value
 
-    async def interact(self, other_agent: "AsyncAgent", message: str) -> str:
-        """与其他智能体异步交互"""
+    async def interact(
+        self,
+        other_agent: "AsyncAgent",
+        message: str,
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None,
+    ) -> str:
+        """与其他智能体异步交互，提供 on_delta 时以流式方式接收回应"""
         monitor.log_event("agent_interaction_start", 
                         f"{self.name} 开始与 {other_agent.name} 交互")
         
         context = f"来自{self.name}的消息：{message}"
-        response = await other_agent.think(context)
+        if on_delta is None:
+            response = await other_agent.think(context)
+        else:
+            chunks: List[str] = []
+            async for delta in other_agent.think_stream(context):
+                chunks.append(delta)
+                await on_delta(delta)
+            response = "".join(chunks)
         
         monitor.log_event("agent_interaction_end", 
                         f"{self.name} 与 {other_agent.name} 交互完成")
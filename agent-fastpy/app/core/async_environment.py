@@ -1,6 +1,8 @@
-from typing import Dict, List, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
 from app.core.async_agent import AsyncAgent, PromptTemplate
+from app.core.message_queue import AsyncMessageQueue, Message
 import asyncio
+import functools
 from PIL import Image
 
 class AsyncEnvironment:
@@ -8,6 +10,7 @@ class AsyncEnvironment:
         self.agents: Dict[str, AsyncAgent] = {}
         self.interactions: List[Dict] = []
         self.prompt_templates: Dict[str, PromptTemplate] = {}
+        self.message_queue = AsyncMessageQueue("environment")
     
     async def initialize(self):
         """初始化所有智能体"""
@@ -16,12 +19,15 @@ class AsyncEnvironment:
     
     async def close(self):
         """关闭所有智能体的会话"""
+        await self.message_queue.close()
         for agent in self.agents.values():
             await agent.close()
     
     def add_agent(self, agent: AsyncAgent) -> None:
         """添加智能体到环境中"""
         self.agents[agent.name] = agent
+        # 创建收件箱队列，智能体开始读取前收到的消息也会保留
+        self.message_queue.create_queue(self.inbox_topic(agent.name))
     
     def remove_agent(self, agent_name: str) -> None:
         """从环境中移除智能体"""
@@ -51,8 +57,17 @@ class AsyncEnvironment:
         """列出所有提示词模板"""
         return list(self.prompt_templates.keys())
     
-    async def broadcast(self, sender: str, message: str) -> Dict[str, str]:
-        """异步广播消息给所有其他智能体"""
+    async def broadcast(
+        self,
+        sender: str,
+        message: str,
+        on_delta: Optional[Callable[[str, str], Awaitable[None]]] = None,
+    ) -> Dict[str, str]:
+        """异步广播消息给所有其他智能体
+
+        提供 on_delta 时各智能体以流式方式回应，每收到一段增量就以
+        (智能体名称, 增量文本) 调用一次 on_delta。
+        """
         responses = {}
         sender_agent = self.agents.get(sender)
         if not sender_agent:
@@ -61,24 +76,63 @@ class AsyncEnvironment:
         tasks = []
         for name, agent in self.agents.items():
             if name != sender:
-                task = asyncio.create_task(sender_agent.interact(agent, message))
+                agent_on_delta = None
+                if on_delta is not None:
+                    agent_on_delta = functools.partial(on_delta, name)
+                task = asyncio.create_task(sender_agent.interact(agent, message, agent_on_delta))
                 tasks.append((name, task))
         
-        for name, task in tasks:
-            try:
-                response = await task
-                responses[name] = response
-                self.interactions.append({
-                    'sender': sender,
-                    'receiver': name,
-                    'message': message,
-                    'response': response
-                })
-            except Exception as e:
-                responses[name] = f"交互出错: {str(e)}"
+        try:
+            for name, task in tasks:
+                try:
+                    response = await task
+                    responses[name] = response
+                    self.interactions.append({
+                        'sender': sender,
+                        'receiver': name,
+                        'message': message,
+                        'response': response
+                    })
+                except Exception as e:
+                    responses[name] = f"交互出错: {str(e)}"
+        except asyncio.CancelledError:
+            # 广播被取消时一并取消各智能体的生成，释放模型调用名额
+            for _, task in tasks:
+                task.cancel()
+            await asyncio.gather(*(task for _, task in tasks), return_exceptions=True)
+            raise
         
         return responses
     
+    @staticmethod
+    def inbox_topic(agent_name: str) -> str:
+        """智能体收件箱对应的消息主题"""
+        return f"agent.{agent_name}"
+
+    async def send_message(
+        self,
+        sender: str,
+        receiver: str,
+        content: Any,
+        metadata: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> bool:
+        """向指定智能体的收件箱发送消息，接收方不存在或消息被丢弃时返回 False"""
+        if receiver not in self.agents:
+            return False
+        message = Message(
+            topic=self.inbox_topic(receiver), content=content, sender=sender, metadata=metadata or {}
+        )
+        return await self.message_queue.publish(message, timeout)
+
+    async def receive_message(self, agent_name: str, timeout: Optional[float] = None) -> Optional[Message]:
+        """从智能体的收件箱取出一条消息，超时返回 None"""
+        return await self.message_queue.get(self.inbox_topic(agent_name), timeout)
+
+    def inbox(self, agent_name: str) -> AsyncIterator[Message]:
+        """逐条消费智能体收件箱中的消息，环境关闭时结束"""
+        return self.message_queue.iterate(self.inbox_topic(agent_name))
+
     async def process_image(self, image_path: str, processors: List[AsyncAgent]) -> Optional[Image.Image]:
         """多智能体协作处理图片"""
         current_image = None
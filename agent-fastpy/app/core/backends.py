@@ -0,0 +1,64 @@
+from typing import Callable, Dict, Optional
+
+import httpx
+
+from core_lab.llm.backends import (  # noqa: F401
+    DashScopeBackend,
+    DashScopeError,
+    FakeBackend,
+    FakeBackendError,
+    GenerationResult,
+    LatencyDistribution,
+    LLMBackend,
+    OllamaBackend,
+    OllamaError,
+)
+
+from .config import config
+
+
+def create_session() -> httpx.AsyncClient:
+    """创建各后端共用的 HTTP 客户端，带连接池和长连接"""
+    limits = httpx.Limits(
+        max_connections=config.http_pool_size,
+        max_keepalive_connections=config.http_pool_size,
+        keepalive_expiry=config.http_keepalive_timeout,
+    )
+    return httpx.AsyncClient(limits=limits, timeout=config.request_timeout)
+
+
+def create_fake_backend() -> FakeBackend:
+    """按配置创建模拟后端"""
+    return FakeBackend(
+        latency=LatencyDistribution.parse(config.fake_latency),
+        responses=FakeBackend.load_responses(config.fake_responses_path),
+        chunk_size=config.fake_chunk_size,
+        chunk_interval=config.fake_chunk_interval_ms / 1000,
+        error_rate=config.fake_error_rate,
+        seed=config.fake_seed,
+    )
+
+
+BACKENDS: Dict[str, Callable[[Optional[httpx.AsyncClient]], LLMBackend]] = {
+    "dashscope": lambda session: DashScopeBackend(
+        config.dashscope_api_key,
+        config.dashscope_base_url,
+        config.dashscope_embedding_model,
+        client=session,
+        timeout=config.request_timeout,
+    ),
+    "ollama": lambda session: OllamaBackend(
+        config.ollama_base_url,
+        config.ollama_embedding_model,
+        client=session,
+        timeout=config.request_timeout,
+    ),
+    "fake": lambda session: create_fake_backend(),
+}
+
+
+def create_backend(name: str, session: Optional[httpx.AsyncClient]) -> LLMBackend:
+    """按名称创建模型后端，session 为共用的 HTTP 客户端"""
+    if name not in BACKENDS:
+        raise ValueError(f"未知的模型后端: {name}")
+    return BACKENDS[name](session)
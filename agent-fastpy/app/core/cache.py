@@ -0,0 +1,23 @@
+from core_lab.llm.cache import (  # noqa: F401
+    CacheTier,
+    MemoryCacheTier,
+    ResponseCache,
+    SQLiteCacheTier,
+    build_response_cache,
+    make_cache_key,
+)
+
+from .config import config
+from .logger import Logger
+
+# 为共用模块的日志记录器配置文件和控制台输出
+Logger("ResponseCache")
+
+# 单例缓存实例
+response_cache = build_response_cache(
+    enabled=config.llm_cache_enabled,
+    memory_size=config.llm_cache_memory_size,
+    path=config.llm_cache_path,
+    ttl=config.llm_cache_ttl,
+    max_entries=config.llm_cache_max_entries,
+)
@@ -0,0 +1,19 @@
+from core_lab.llm.circuit_breaker import (  # noqa: F401
+    BreakerRegistry,
+    CircuitBreaker,
+    CircuitOpenError,
+    parse_failover_chain,
+)
+
+from .config import config
+from .logger import Logger
+
+# 为共用模块的日志记录器配置文件和控制台输出
+Logger("CircuitBreaker")
+
+# 单例熔断器注册表
+breakers = BreakerRegistry(
+    failure_threshold=config.breaker_failure_threshold,
+    recovery_timeout=config.breaker_recovery_timeout,
+    half_open_max_calls=config.breaker_half_open_max_calls,
+)
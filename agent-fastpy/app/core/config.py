@@ -9,6 +9,95 @@ class Config:
         self.log_level: str = os.getenv("LOG_LEVEL", "INFO")
         self.max_retries: int = int(os.getenv("MAX_RETRIES", "3"))
 
+        # 通义千问接口
+        self.dashscope_base_url: str = os.getenv(
+            "DASHSCOPE_BASE_URL", "https://dashscope.aliyuncs.com/api/v1"
+        )
+        self.dashscope_model: str = os.getenv("DASHSCOPE_MODEL", "qwen-turbo")
+
+        # HTTP 连接池
+        self.http_pool_size: int = int(os.getenv("HTTP_POOL_SIZE", "100"))
+        self.http_keepalive_timeout: float = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))
+        self.request_timeout: float = float(os.getenv("REQUEST_TIMEOUT", "120"))
+
+        # 模型响应缓存
+        self.llm_cache_enabled: bool = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+        self.llm_cache_memory_size: int = int(os.getenv("LLM_CACHE_MEMORY_SIZE", "256"))
+        self.llm_cache_path: str = os.getenv("LLM_CACHE_PATH", "llm_cache.db")
+        self.llm_cache_ttl: float = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+        self.llm_cache_max_entries: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+
+        # 模型调用限流，RPM/TPM 为 0 表示不限制
+        self.llm_max_concurrency: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+        self.llm_rpm: float = float(os.getenv("LLM_RPM", "0"))
+        self.llm_tpm: float = float(os.getenv("LLM_TPM", "0"))
+        # 自适应并发的上限，默认 0 即关闭，使用固定的 LLM_MAX_CONCURRENCY
+        self.llm_adaptive_max_concurrency: int = int(os.getenv("LLM_ADAPTIVE_MAX_CONCURRENCY", "0"))
+
+        # 模型调用重试，MAX_RETRIES 为总尝试次数，截止时间为 0 表示不限制
+        self.retry_base_delay: float = float(os.getenv("RETRY_BASE_DELAY", "0.5"))
+        self.retry_max_delay: float = float(os.getenv("RETRY_MAX_DELAY", "10"))
+        self.retry_deadline: float = float(os.getenv("RETRY_DEADLINE", "300"))
+
+        # 对冲请求：耗时超过历史分位数时发出第二个相同请求
+        self.llm_hedging_enabled: bool = os.getenv("LLM_HEDGING_ENABLED", "false").lower() == "true"
+        self.hedge_percentile: float = float(os.getenv("HEDGE_PERCENTILE", "0.95"))
+        self.hedge_min_samples: int = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+
+        self.dashscope_embedding_model: str = os.getenv("DASHSCOPE_EMBEDDING_MODEL", "text-embedding-v2")
+
+        # 本地 Ollama 接口
+        self.ollama_base_url: str = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+        self.ollama_model: str = os.getenv("OLLAMA_MODEL", "qwen2.5-coder:1.5b")
+        self.ollama_embedding_model: str = os.getenv("OLLAMA_EMBEDDING_MODEL", "nomic-embed-text")
+
+        # 模型后端：dashscope / ollama / fake（进程内模拟后端，用于压测编排和接口吞吐）
+        self.llm_backend: str = os.getenv("LLM_BACKEND", "dashscope")
+
+        # 模拟后端：延迟分布格式为 "分布:参数"，支持 fixed、uniform、normal、lognormal、exponential
+        self.fake_latency: str = os.getenv("FAKE_LATENCY", "lognormal:0.5,0.3")
+        self.fake_chunk_size: int = int(os.getenv("FAKE_CHUNK_SIZE", "4"))
+        self.fake_chunk_interval_ms: float = float(os.getenv("FAKE_CHUNK_INTERVAL_MS", "10"))
+        self.fake_error_rate: float = float(os.getenv("FAKE_ERROR_RATE", "0"))
+        self.fake_responses_path: Optional[str] = os.getenv("FAKE_RESPONSES_PATH")
+        self.fake_seed: int = int(os.getenv("FAKE_SEED", "0"))
+
+        # 熔断与故障转移，链中的后端按顺序尝试，格式为 "后端:模型,后端:模型"
+        self.breaker_failure_threshold: int = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+        self.breaker_recovery_timeout: float = float(os.getenv("BREAKER_RECOVERY_TIMEOUT", "30"))
+        self.breaker_half_open_max_calls: int = int(os.getenv("BREAKER_HALF_OPEN_MAX_CALLS", "1"))
+        # 未设置 LLM_FAILOVER_CHAIN 时，是否在主后端之后追加本地 Ollama 兜底
+        self.llm_ollama_fallback: bool = os.getenv("LLM_OLLAMA_FALLBACK", "false").lower() == "true"
+        self.llm_failover_chain: str = os.getenv("LLM_FAILOVER_CHAIN", self._default_failover_chain())
+
+        # 流式输出推送间隔（毫秒）
+        self.stream_flush_interval_ms: int = int(os.getenv("STREAM_FLUSH_INTERVAL_MS", "50"))
+
+        # 智能体消息队列：每个主题的容量，以及队列满时的处理方式（block/drop_new/drop_oldest）
+        self.message_queue_max_size: int = int(os.getenv("MESSAGE_QUEUE_MAX_SIZE", "1000"))
+        self.message_queue_overflow: str = os.getenv("MESSAGE_QUEUE_OVERFLOW", "block")
+        # 读取时自动创建的主题队列超过该秒数没有消费者读取后清理，0 表示不清理
+        self.message_queue_idle_ttl: float = float(os.getenv("MESSAGE_QUEUE_IDLE_TTL", "300"))
+        # 订阅者投递：每个订阅者的待投递上限、慢消费者策略（block/drop/drop_oldest/disconnect）和投递线程数，
+        # 默认丢弃最早的待投递消息，慢订阅者不会让发布方等待
+        self.message_queue_subscriber_queue_size: int = int(os.getenv("MESSAGE_QUEUE_SUBSCRIBER_QUEUE_SIZE", "100"))
+        self.message_queue_slow_consumer: str = os.getenv("MESSAGE_QUEUE_SLOW_CONSUMER", "drop_oldest")
+        self.message_queue_dispatch_workers: int = int(os.getenv("MESSAGE_QUEUE_DISPATCH_WORKERS", "4"))
+        # 投递线程每轮为一个订阅者最多投递的消息数，之后让出线程给其他订阅者
+        self.message_queue_dispatch_batch: int = int(os.getenv("MESSAGE_QUEUE_DISPATCH_BATCH", "16"))
+
+    def _default_failover_chain(self) -> str:
+        """默认只使用 LLM_BACKEND，开启 LLM_OLLAMA_FALLBACK 时以本地 Ollama 兜底"""
+        if self.llm_backend == "dashscope":
+            chain = f"dashscope:{self.dashscope_model}"
+        elif self.llm_backend == "ollama":
+            return f"ollama:{self.ollama_model}"
+        else:
+            chain = f"{self.llm_backend}:{self.llm_backend}"
+        if self.llm_ollama_fallback:
+            chain += f",ollama:{self.ollama_model}"
+        return chain
+
     def validate(self) -> bool:
         """验证必要配置是否已设置"""
         if not self.dashscope_api_key:
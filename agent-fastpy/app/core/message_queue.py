@@ -1,9 +1,17 @@
-from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import inspect
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple, Union
 from dataclasses import dataclass, field
 from datetime import datetime
-from queue import Queue
-from threading import Lock
-from logger import Logger
+from queue import Full, Queue
+from threading import Condition, RLock, get_ident
+
+from .config import config
+from .logger import Logger
+from .topic_trie import MULTI_WILDCARD, SINGLE_WILDCARD, TopicTrie
 
 @dataclass
 class Message:
@@ -14,81 +22,329 @@ class Message:
     timestamp: datetime = field(default_factory=datetime.now)
     metadata: Dict[str, Any] = field(default_factory=dict)
 
+
+def is_pattern(topic: str) -> bool:
+    """主题中是否包含通配符"""
+    return SINGLE_WILDCARD in topic or MULTI_WILDCARD in topic
+
+
+SLOW_CONSUMER_POLICIES = ("block", "drop", "drop_oldest", "disconnect")
+
+
+def _check_slow_consumer(policy: str) -> str:
+    if policy not in SLOW_CONSUMER_POLICIES:
+        raise ValueError(f"未知的慢消费者策略: {policy}，可选 {', '.join(SLOW_CONSUMER_POLICIES)}")
+    return policy
+
+
+class _QueueUsage:
+    """主题队列的使用情况，用于清理长时间没有消费者读取的队列
+
+    create_queue 显式创建的队列一直保留，直到 delete_queue；
+    第一次读取时自动创建的队列在没有消费者等待、且超过 idle_ttl 秒没有被读取后清理。
+    """
+
+    def __init__(self, durable: bool):
+        self.durable = durable
+        self.waiters = 0
+        self.last_used = time.monotonic()
+
+    def touch(self) -> None:
+        self.last_used = time.monotonic()
+
+    def expired(self, now: float, idle_ttl: float) -> bool:
+        return not self.durable and not self.waiters and now - self.last_used >= idle_ttl
+
+
+class _Subscription:
+    """订阅者的投递状态：有界的待投递队列，以及投递延迟和丢弃统计
+
+    每个订阅者同一时间最多有一个投递任务，按发布顺序逐条调用回调。
+    待投递队列满时按 policy 处理：block 让发布方等待，drop 丢弃这条消息，
+    drop_oldest 丢弃最早的待投递消息，disconnect 断开该订阅者。
+    回调中向自己订阅的主题发布消息时不会等待，超出上限也直接入队，避免等待自己而死锁。
+    """
+
+    def __init__(self, topic: str, callback: Callable, policy: str, max_pending: int):
+        self.topic = topic
+        self.callback = callback
+        self.policy = _check_slow_consumer(policy)
+        self.max_pending = max_pending
+        self.pending: Deque[Tuple[float, Message]] = deque()  # (入队时间, 消息)
+        self.draining = False
+        self.deliverer: Any = None  # 正在调用回调的投递线程或协程任务
+        self.space = Condition()  # 线程版本中待投递队列有空位或断开时通知等待的发布方
+        self.disconnected = False
+        self.delivered = 0
+        self.dropped = 0
+        self.failed = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def full(self) -> bool:
+        return 0 < self.max_pending <= len(self.pending)
+
+    def next(self) -> Optional[Message]:
+        """取出下一条待投递的消息并记录它等待的时间，没有消息时结束本轮投递"""
+        if self.disconnected or not self.pending:
+            self.draining = False
+            return None
+        enqueued_at, message = self.pending.popleft()
+        self.last_lag = time.monotonic() - enqueued_at
+        self.max_lag = max(self.max_lag, self.last_lag)
+        return message
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "callback": getattr(self.callback, "__qualname__", repr(self.callback)),
+            "policy": self.policy,
+            "pending": len(self.pending),
+            "max_pending": self.max_pending,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            # 最早一条待投递消息已等待的秒数
+            "lag": round(time.monotonic() - self.pending[0][0], 4) if self.pending else 0.0,
+            "last_lag": round(self.last_lag, 4),
+            "max_lag": round(self.max_lag, 4),
+            "disconnected": self.disconnected,
+        }
+
+
 class MessageQueue:
-    """消息队列系统，用于管理智能体间的异步通信"""
+    """消息队列系统，用于管理智能体间的异步通信
 
-    def __init__(self, name: str, max_size: int = 1000):
+    主题按 "." 分层，订阅时可以使用通配符，订阅者保存在主题前缀树中按层匹配。
+    订阅回调不在发布方的线程中执行：每个订阅者有自己的有界待投递队列，
+    由线程池中的投递任务逐条调用回调，慢订阅者不会拖慢发布方和其他订阅者。
+    投递任务每轮最多投递 dispatch_batch 条消息，之后排到线程池队尾，
+    积压很多的订阅者不会一直占住投递线程。
+    主题队列只为消费者保留消息，由 create_queue 或第一次 get_message 创建，
+    只有订阅者的主题不创建队列；自动创建的队列超过 queue_idle_ttl 秒没有读取后清理。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_size: int = 1000,
+        subscriber_queue_size: Optional[int] = None,
+        slow_consumer: Optional[str] = None,
+        dispatch_workers: Optional[int] = None,
+        dispatch_batch: Optional[int] = None,
+        queue_idle_ttl: Optional[float] = None,
+    ):
         self.name = name
         self.logger = Logger(f"queue_{name}")
         self.queues: Dict[str, Queue] = {}
-        self.subscribers: Dict[str, List[Callable]] = {}
+        self.usage: Dict[str, _QueueUsage] = {}
+        self.queue_idle_ttl = config.message_queue_idle_ttl if queue_idle_ttl is None else queue_idle_ttl
+        self._last_expire = time.monotonic()
+        self.subscribers: TopicTrie[_Subscription] = TopicTrie()  # 订阅模式 -> 订阅者
         self.max_size = max_size
-        self.lock = Lock()
+        self.subscriber_queue_size = (
+            config.message_queue_subscriber_queue_size if subscriber_queue_size is None else subscriber_queue_size
+        )
+        self.slow_consumer = _check_slow_consumer(slow_consumer or config.message_queue_slow_consumer)
+        # subscribe 持有锁时会调用 create_queue，需要可重入锁
+        self.lock = RLock()
+        self._delivery = Condition(self.lock)  # 待投递队列有空位或投递结束时通知
+        self.executor = ThreadPoolExecutor(
+            max_workers=dispatch_workers or config.message_queue_dispatch_workers,
+            thread_name_prefix=f"queue_{name}",
+        )
+        self.dispatch_batch = max(1, dispatch_batch or config.message_queue_dispatch_batch)
 
-    def create_queue(self, topic: str) -> None:
-        """创建新的消息队列"""
+    def create_queue(self, topic: str, durable: bool = True) -> None:
+        """创建新的消息队列，durable 为 False 时队列长时间没有读取后会被清理"""
         with self.lock:
             if topic not in self.queues:
                 self.queues[topic] = Queue(maxsize=self.max_size)
-                self.subscribers[topic] = []
+                self.usage[topic] = _QueueUsage(durable)
                 self.logger.info(f"创建新队列: {topic}")
+            elif durable:
+                self.usage[topic].durable = True
+
+    def delete_queue(self, topic: str) -> None:
+        """删除主题队列，队列中的消息一并丢弃"""
+        with self.lock:
+            queue = self.queues.pop(topic, None)
+            self.usage.pop(topic, None)
+            if queue is not None:
+                self.logger.info(f"队列已删除: {topic}，丢弃 {queue.qsize()} 条消息")
+
+    def _expire_queues(self) -> None:
+        """清理超过 queue_idle_ttl 秒没有消费者读取的自动创建的队列"""
+        if self.queue_idle_ttl <= 0:
+            return
+        now = time.monotonic()
+        with self.lock:
+            if now - self._last_expire < self.queue_idle_ttl:
+                return
+            self._last_expire = now
+            for topic in [topic for topic, usage in self.usage.items() if usage.expired(now, self.queue_idle_ttl)]:
+                self.delete_queue(topic)
 
     def publish(self, message: Message) -> bool:
-        """发布消息到指定主题"""
-        try:
-            if message.topic not in self.queues:
-                self.create_queue(message.topic)
+        """发布消息到指定主题
 
-            queue = self.queues[message.topic]
-            if queue.full():
-                self.logger.warning(f"队列 {message.topic} 已满")
-                return False
+        主题有队列时放入队列，队列已满时返回 False；无论队列是否已满，消息都会投递给订阅者。
+        """
+        try:
+            self._expire_queues()
+            stored = True
+            queue = self.queues.get(message.topic)
+            if queue is not None:
+                try:
+                    queue.put_nowait(message)
+                except Full:
+                    self.logger.warning(f"队列 {message.topic} 已满")
+                    stored = False
 
-            queue.put(message)
             self.logger.info(
                 f"消息已发布: {message.topic} - 来自 {message.sender}"
             )
 
-            # 通知订阅者
-            for callback in self.subscribers[message.topic]:
-                try:
-                    callback(message)
-                except Exception as e:
-                    self.logger.error(f"订阅者回调执行失败: {str(e)}")
+            # 放入各订阅者的待投递队列，由投递任务异步调用回调；
+            # 先投给有空位的订阅者，再在不持有队列锁的情况下等待已满的 block 订阅者
+            with self.lock:
+                blocked = [
+                    subscription for subscription in self.subscribers.match(message.topic)
+                    if not self._enqueue(subscription, message)
+                ]
+            for subscription in blocked:
+                while True:
+                    with subscription.space:
+                        subscription.space.wait_for(lambda: subscription.disconnected or not subscription.full())
+                    with self.lock:
+                        if self._enqueue(subscription, message):
+                            break
 
-            return True
+            return stored
         except Exception as e:
             self.logger.error(f"发布消息失败: {str(e)}")
             return False
 
-    def subscribe(self, topic: str, callback: Callable[[Message], None]) -> None:
-        """订阅指定主题"""
+    def _enqueue(self, subscription: _Subscription, message: Message) -> bool:
+        """不等待地放入订阅者的待投递队列（持有锁时调用）
+
+        只有 block 策略的待投递队列已满、发布方需要等待时返回 False，入队、丢弃或断开都返回 True。
+        """
+        if subscription.disconnected:
+            return True
+        if subscription.full() and subscription.deliverer != get_ident():
+            if subscription.policy == "drop":
+                subscription.dropped += 1
+                return True
+            if subscription.policy == "disconnect":
+                self._disconnect(subscription, "待投递消息过多")
+                return True
+            if subscription.policy == "block":
+                return False
+            subscription.pending.popleft()
+            subscription.dropped += 1
+        subscription.pending.append((time.monotonic(), message))
+        if not subscription.draining:
+            subscription.draining = True
+            self.executor.submit(self._drain, subscription)
+        return True
+
+    def _drain(self, subscription: _Subscription) -> None:
+        """投递任务：逐条调用订阅者回调，每轮最多投递 dispatch_batch 条后让出线程"""
+        while True:
+            for _ in range(self.dispatch_batch):
+                with self.lock:
+                    message = subscription.next()
+                    self._delivery.notify_all()
+                with subscription.space:
+                    subscription.space.notify_all()
+                if message is None:
+                    return
+                subscription.deliverer = get_ident()
+                try:
+                    subscription.callback(message)
+                    subscription.delivered += 1
+                except Exception as e:
+                    subscription.failed += 1
+                    self.logger.error(f"订阅者回调执行失败: {str(e)}")
+                finally:
+                    subscription.deliverer = None
+            try:
+                # 重新排到线程池队尾，等待中的其他订阅者先投递
+                self.executor.submit(self._drain, subscription)
+                return
+            except RuntimeError:
+                # 线程池正在关闭，不再接受新任务，在当前线程投递完剩余消息
+                continue
+
+    def _disconnect(self, subscription: _Subscription, reason: str) -> None:
+        subscription.disconnected = True
+        subscription.dropped += len(subscription.pending)
+        subscription.pending.clear()
+        self.subscribers.remove(subscription.topic, subscription)
+        self._delivery.notify_all()
+        with subscription.space:
+            subscription.space.notify_all()
+        self.logger.warning(f"订阅者已断开: {subscription.topic} - {reason}")
+
+    def subscribe(
+        self,
+        topic: str,
+        callback: Callable[[Message], None],
+        slow_consumer: Optional[str] = None,
+        max_pending: Optional[int] = None,
+    ) -> None:
+        """订阅指定主题，slow_consumer 和 max_pending 默认使用队列的设置
+
+        topic 可以包含通配符：* 匹配恰好一层，# 匹配零层或多层，
+        例如 "task.*.done" 或 "task.#"。订阅不会创建主题队列。
+        """
         with self.lock:
-            if topic not in self.queues:
-                self.create_queue(topic)
-            self.subscribers[topic].append(callback)
+            self.subscribers.add(topic, _Subscription(
+                topic,
+                callback,
+                slow_consumer or self.slow_consumer,
+                self.subscriber_queue_size if max_pending is None else max_pending,
+            ))
             self.logger.info(f"新订阅者已添加到主题: {topic}")
 
     def unsubscribe(self, topic: str, callback: Callable[[Message], None]) -> None:
-        """取消订阅"""
+        """取消订阅，尚未投递的消息被丢弃"""
         with self.lock:
-            if topic in self.subscribers and callback in self.subscribers[topic]:
-                self.subscribers[topic].remove(callback)
-                self.logger.info(f"订阅者已从主题移除: {topic}")
+            for subscription in self.subscribers.get(topic):
+                if subscription.callback == callback:
+                    self._disconnect(subscription, "取消订阅")
+                    break
 
-    def get_message(self, topic: str, timeout: Optional[float] = None) -> Optional[Message]:
-        """从指定主题获取消息"""
-        try:
-            if topic not in self.queues:
-                return None
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待已发布的消息全部投递给订阅者，超时返回 False"""
+        with self.lock:
+            return self._delivery.wait_for(
+                lambda: not any(sub.draining for _, subs in self.subscribers.items() for sub in subs),
+                timeout,
+            )
 
+    def close(self) -> None:
+        """等待投递任务结束并释放线程池"""
+        self.executor.shutdown(wait=True)
+
+    def get_message(self, topic: str, timeout: Optional[float] = None) -> Optional[Message]:
+        """从指定主题获取消息，主题还没有队列时创建，之后发布的消息会保留"""
+        with self.lock:
+            self.create_queue(topic, durable=False)
             queue = self.queues[topic]
+            usage = self.usage[topic]
+            usage.waiters += 1
+        try:
             message = queue.get(timeout=timeout) if timeout else queue.get_nowait()
             self.logger.debug(f"消息已获取: {topic}")
             return message
         except Exception as e:
             self.logger.debug(f"获取消息失败: {str(e)}")
             return None
+        finally:
+            with self.lock:
+                usage.waiters -= 1
+                usage.touch()
 
     def get_queue_size(self, topic: str) -> int:
         """获取指定主题队列的当前大小"""
@@ -107,5 +363,332 @@ class MessageQueue:
         return list(self.queues.keys())
 
     def get_subscriber_count(self, topic: str) -> int:
-        """获取指定主题的订阅者数量"""
-        return len(self.subscribers[topic]) if topic in self.subscribers else 0
\ No newline at end of file
+        """获取指定主题（按订阅模式原样查找）的订阅者数量"""
+        return len(self.subscribers.get(topic))
+
+    def subscriber_stats(self) -> Dict[str, List[Dict[str, Any]]]:
+        """各主题订阅者的待投递数量、投递延迟和丢弃统计"""
+        with self.lock:
+            return {topic: [sub.stats() for sub in subs] for topic, subs in self.subscribers.items()}
+
+
+OVERFLOW_POLICIES = ("block", "drop_new", "drop_oldest")
+
+AsyncCallback = Callable[[Message], Union[None, Awaitable[None]]]
+
+
+class _TopicQueue:
+    """单个主题的有界消息队列，关闭后唤醒所有等待的发布者和消费者"""
+
+    def __init__(self, max_size: int, durable: bool):
+        self.max_size = max_size
+        self.usage = _QueueUsage(durable)
+        self.messages: Deque[Message] = deque()
+        self.closed = False
+        self.dropped = 0
+        self._lock = asyncio.Lock()
+        self._not_empty = asyncio.Condition(self._lock)
+        self._not_full = asyncio.Condition(self._lock)
+
+    def full(self) -> bool:
+        return 0 < self.max_size <= len(self.messages)
+
+    async def put(self, message: Message, overflow: str, timeout: Optional[float] = None) -> bool:
+        """放入消息，队列满时按 overflow 等待或丢弃，返回消息是否入队"""
+        async with self._lock:
+            if self.full() and not self.closed:
+                if overflow == "drop_new":
+                    self.dropped += 1
+                    return False
+                if overflow == "drop_oldest":
+                    self.messages.popleft()
+                    self.dropped += 1
+                else:
+                    try:
+                        await asyncio.wait_for(
+                            self._not_full.wait_for(lambda: self.closed or not self.full()), timeout
+                        )
+                    except asyncio.TimeoutError:
+                        self.dropped += 1
+                        return False
+            if self.closed:
+                return False
+            self.messages.append(message)
+            self._not_empty.notify()
+            return True
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Message]:
+        """取出一条消息，超时或队列关闭且已取空时返回 None"""
+        self.usage.waiters += 1
+        try:
+            async with self._lock:
+                try:
+                    await asyncio.wait_for(
+                        self._not_empty.wait_for(lambda: self.closed or self.messages), timeout
+                    )
+                except asyncio.TimeoutError:
+                    return None
+                if not self.messages:
+                    return None
+                message = self.messages.popleft()
+                self._not_full.notify()
+                return message
+        finally:
+            self.usage.waiters -= 1
+            self.usage.touch()
+
+    def get_nowait(self) -> Optional[Message]:
+        self.usage.touch()
+        if not self.messages:
+            return None
+        was_full = self.full()
+        message = self.messages.popleft()
+        if was_full:
+            # 唤醒等待的发布者需要持有锁，交给事件循环执行
+            asyncio.ensure_future(self._wake_publisher())
+        return message
+
+    async def _wake_publisher(self) -> None:
+        async with self._lock:
+            self._not_full.notify()
+
+    async def close(self) -> None:
+        async with self._lock:
+            self.closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+
+class AsyncMessageQueue:
+    """基于 asyncio 的消息队列，供事件循环中的智能体互相通信
+
+    与 MessageQueue 接口对应，但发布和获取都是协程：队列满时 publish 按 overflow
+    等待（背压）或丢弃消息，get 等待消息期间不阻塞事件循环。
+    每个主题是一个竞争消费的队列，由 create_queue 或第一次 get 创建，在此之前发布的消息不会保留，
+    第一次 get 创建的队列超过 queue_idle_ttl 秒没有读取后清理；订阅回调则对每条消息都会调用，可以是普通函数或协程函数。
+    与 MessageQueue 相同，每个订阅者有自己的待投递队列和投递协程，publish 不等待回调执行；
+    普通函数回调在事件循环中直接调用，耗时的回调应写成协程函数。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_size: Optional[int] = None,
+        overflow: Optional[str] = None,
+        subscriber_queue_size: Optional[int] = None,
+        slow_consumer: Optional[str] = None,
+        queue_idle_ttl: Optional[float] = None,
+    ):
+        self.name = name
+        self.logger = Logger(f"queue_{name}")
+        self.max_size = config.message_queue_max_size if max_size is None else max_size
+        self.queue_idle_ttl = config.message_queue_idle_ttl if queue_idle_ttl is None else queue_idle_ttl
+        self._last_expire = time.monotonic()
+        self.overflow = overflow or config.message_queue_overflow
+        if self.overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"未知的队列溢出策略: {self.overflow}，可选 {', '.join(OVERFLOW_POLICIES)}")
+        self.queues: Dict[str, _TopicQueue] = {}
+        self.subscribers: TopicTrie[_Subscription] = TopicTrie()  # 订阅模式 -> 订阅者
+        self.subscriber_queue_size = (
+            config.message_queue_subscriber_queue_size if subscriber_queue_size is None else subscriber_queue_size
+        )
+        self.slow_consumer = _check_slow_consumer(slow_consumer or config.message_queue_slow_consumer)
+        self.published = 0
+        self._delivery = asyncio.Condition()  # 待投递队列有空位或投递结束时通知
+        self._drains: Set["asyncio.Task[None]"] = set()
+
+    def create_queue(self, topic: str, durable: bool = True) -> None:
+        """创建新的消息队列，durable 为 False 时队列长时间没有读取后会被清理"""
+        if topic not in self.queues:
+            self.queues[topic] = _TopicQueue(self.max_size, durable)
+            self.logger.info(f"创建新队列: {topic}")
+        elif durable:
+            self.queues[topic].usage.durable = True
+
+    async def delete_queue(self, topic: str) -> None:
+        """删除主题队列，队列中的消息一并丢弃，等待中的发布者返回 False"""
+        queue = self.queues.pop(topic, None)
+        if queue is not None:
+            await queue.close()
+            self.logger.info(f"队列已删除: {topic}，丢弃 {len(queue.messages)} 条消息")
+
+    async def _expire_queues(self) -> None:
+        """清理超过 queue_idle_ttl 秒没有消费者读取的自动创建的队列"""
+        if self.queue_idle_ttl <= 0:
+            return
+        now = time.monotonic()
+        if now - self._last_expire < self.queue_idle_ttl:
+            return
+        self._last_expire = now
+        for topic in [topic for topic, queue in self.queues.items() if queue.usage.expired(now, self.queue_idle_ttl)]:
+            await self.delete_queue(topic)
+
+    async def publish(self, message: Message, timeout: Optional[float] = None) -> bool:
+        """发布消息到指定主题
+
+        主题有消费者（调用过 create_queue 或 get）时消息放入该主题的队列，
+        队列满时 block 策略最多等待 timeout 秒（None 表示一直等待），
+        drop_new 丢弃这条消息，drop_oldest 丢弃队列中最早的消息。返回消息是否入队。
+        主题没有消费者时消息只投递给订阅者，不在队列中保留。
+        """
+        await self._expire_queues()
+        # 只有有消费者的主题才保留消息，只有订阅者的主题直接投递给订阅者
+        queue = self.queues.get(message.topic)
+        if queue is not None and not await queue.put(message, self.overflow, timeout):
+            self.logger.warning(f"队列 {message.topic} 已满或已关闭，消息被丢弃 - 来自 {message.sender}")
+            return False
+        self.published += 1
+        self.logger.debug(f"消息已发布: {message.topic} - 来自 {message.sender}")
+
+        subscriptions = self.subscribers.match(message.topic)
+        if subscriptions:
+            async with self._delivery:
+                for subscription in subscriptions:
+                    await self._enqueue(subscription, message)
+        return True
+
+    async def _enqueue(self, subscription: _Subscription, message: Message) -> bool:
+        """放入订阅者的待投递队列（持有 _delivery 时调用），返回消息是否入队"""
+        if subscription.full() and subscription.deliverer is not asyncio.current_task():
+            if subscription.policy == "drop":
+                subscription.dropped += 1
+                return False
+            if subscription.policy == "disconnect":
+                self._disconnect(subscription, "待投递消息过多")
+                return False
+            if subscription.policy == "drop_oldest":
+                subscription.pending.popleft()
+                subscription.dropped += 1
+            else:
+                await self._delivery.wait_for(lambda: subscription.disconnected or not subscription.full())
+                if subscription.disconnected:
+                    return False
+        subscription.pending.append((time.monotonic(), message))
+        if not subscription.draining:
+            subscription.draining = True
+            drain = asyncio.create_task(self._drain(subscription))
+            self._drains.add(drain)
+            drain.add_done_callback(self._drains.discard)
+        return True
+
+    async def _drain(self, subscription: _Subscription) -> None:
+        """投递协程：逐条调用订阅者回调，直到待投递队列为空"""
+        while True:
+            async with self._delivery:
+                message = subscription.next()
+                self._delivery.notify_all()
+                if message is None:
+                    return
+            subscription.deliverer = asyncio.current_task()
+            try:
+                result = subscription.callback(message)
+                if inspect.isawaitable(result):
+                    await result
+                subscription.delivered += 1
+            except Exception as e:
+                subscription.failed += 1
+                self.logger.error(f"订阅者回调执行失败: {str(e)}")
+            finally:
+                subscription.deliverer = None
+
+    def _disconnect(self, subscription: _Subscription, reason: str) -> None:
+        subscription.disconnected = True
+        subscription.dropped += len(subscription.pending)
+        subscription.pending.clear()
+        self.subscribers.remove(subscription.topic, subscription)
+        self.logger.warning(f"订阅者已断开: {subscription.topic} - {reason}")
+
+    def subscribe(
+        self,
+        topic: str,
+        callback: AsyncCallback,
+        slow_consumer: Optional[str] = None,
+        max_pending: Optional[int] = None,
+    ) -> None:
+        """订阅指定主题，slow_consumer 和 max_pending 默认使用队列的设置
+
+        topic 可以包含通配符：* 匹配恰好一层，# 匹配零层或多层，
+        例如 "task.*.done" 或 "task.#"。订阅不会创建主题队列。
+        """
+        self.subscribers.add(topic, _Subscription(
+            topic,
+            callback,
+            slow_consumer or self.slow_consumer,
+            self.subscriber_queue_size if max_pending is None else max_pending,
+        ))
+        self.logger.info(f"新订阅者已添加到主题: {topic}")
+
+    async def unsubscribe(self, topic: str, callback: AsyncCallback) -> None:
+        """取消订阅，尚未投递的消息被丢弃"""
+        async with self._delivery:
+            for subscription in self.subscribers.get(topic):
+                if subscription.callback == callback:
+                    self._disconnect(subscription, "取消订阅")
+                    # 唤醒因该订阅者而等待的发布方
+                    self._delivery.notify_all()
+                    break
+
+    async def flush(self) -> None:
+        """等待已发布的消息全部投递给订阅者"""
+        async with self._delivery:
+            await self._delivery.wait_for(
+                lambda: not any(sub.draining for _, subs in self.subscribers.items() for sub in subs)
+            )
+
+    async def get(self, topic: str, timeout: Optional[float] = None) -> Optional[Message]:
+        """从指定主题获取消息，没有消息时等待（最多 timeout 秒），超时或队列关闭时返回 None"""
+        self.create_queue(topic, durable=False)
+        return await self.queues[topic].get(timeout)
+
+    def get_nowait(self, topic: str) -> Optional[Message]:
+        """立即从指定主题获取消息，没有消息时返回 None"""
+        queue = self.queues.get(topic)
+        return queue.get_nowait() if queue else None
+
+    async def iterate(self, topic: str) -> AsyncIterator[Message]:
+        """逐条消费主题中的消息，直到队列关闭"""
+        while True:
+            message = await self.get(topic)
+            if message is None:
+                return
+            yield message
+
+    async def close(self, topic: Optional[str] = None) -> None:
+        """关闭指定主题（默认全部），唤醒等待中的发布者和消费者；已入队的消息仍可取出"""
+        topics = [topic] if topic is not None else list(self.queues)
+        for name in topics:
+            if name in self.queues:
+                await self.queues[name].close()
+
+    def get_queue_size(self, topic: str) -> int:
+        """获取指定主题队列的当前大小"""
+        return len(self.queues[topic].messages) if topic in self.queues else 0
+
+    def clear_queue(self, topic: str) -> None:
+        """清空指定主题的队列"""
+        queue = self.queues.get(topic)
+        if queue is not None:
+            while queue.get_nowait() is not None:
+                pass
+            self.logger.info(f"队列已清空: {topic}")
+
+    def list_topics(self) -> List[str]:
+        """列出所有可用的主题"""
+        return list(self.queues.keys())
+
+    def get_subscriber_count(self, topic: str) -> int:
+        """获取指定主题（按订阅模式原样查找）的订阅者数量"""
+        return len(self.subscribers.get(topic))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "published": self.published,
+            "overflow": self.overflow,
+            "topics": {
+                topic: {"size": len(queue.messages), "dropped": queue.dropped}
+                for topic, queue in self.queues.items()
+            },
+            "subscribers": {
+                topic: [sub.stats() for sub in subs] for topic, subs in self.subscribers.items()
+            },
+        }
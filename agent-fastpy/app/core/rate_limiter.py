@@ -0,0 +1,20 @@
+from core_lab.llm.rate_limiter import (  # noqa: F401
+    AdaptiveConcurrency,
+    BackendLimiter,
+    ConcurrencyGate,
+    LimiterRegistry,
+    Permit,
+    TokenBucket,
+    estimate_tokens,
+    is_overload_error,
+)
+
+from .config import config
+
+# 单例限流器注册表
+limiters = LimiterRegistry(
+    max_concurrency=config.llm_max_concurrency,
+    rpm=config.llm_rpm,
+    tpm=config.llm_tpm,
+    adaptive_max=config.llm_adaptive_max_concurrency or None,
+)
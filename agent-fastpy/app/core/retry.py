@@ -0,0 +1,16 @@
+from core_lab.llm.retry import Hedger, HedgerRegistry, RetryPolicy, is_retryable  # noqa: F401
+
+from .config import config
+
+# 按后端/模型划分的对冲器
+hedgers = HedgerRegistry(percentile=config.hedge_percentile, min_samples=config.hedge_min_samples)
+get_hedger = hedgers.get
+hedger_stats = hedgers.stats
+
+# 模型调用默认使用的重试策略
+retry_policy = RetryPolicy(
+    max_attempts=config.max_retries,
+    base_delay=config.retry_base_delay,
+    max_delay=config.retry_max_delay,
+    deadline=config.retry_deadline or None,
+)
@@ -0,0 +1,4 @@
+from core_lab.llm.singleflight import SingleFlight
+
+# 单例合并器实例，所有智能体共享
+singleflight = SingleFlight()
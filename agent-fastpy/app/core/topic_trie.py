@@ -0,0 +1,120 @@
+from typing import Dict, Generic, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# 主题按 "." 分成若干层，* 匹配恰好一层，# 匹配零层或多层
+TOPIC_SEPARATOR = "."
+SINGLE_WILDCARD = "*"
+MULTI_WILDCARD = "#"
+
+
+def split_topic(topic: str) -> List[str]:
+    return topic.split(TOPIC_SEPARATOR)
+
+
+def validate_pattern(pattern: str) -> List[str]:
+    """拆分订阅模式，通配符必须单独占一层"""
+    words = split_topic(pattern)
+    for word in words:
+        if word not in (SINGLE_WILDCARD, MULTI_WILDCARD) and (
+            SINGLE_WILDCARD in word or MULTI_WILDCARD in word
+        ):
+            raise ValueError(f"通配符必须单独占一层: {pattern}")
+    return words
+
+
+class _Node(Generic[T]):
+    __slots__ = ("children", "values")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node[T]"] = {}
+        self.values: List[T] = []
+
+
+class TopicTrie(Generic[T]):
+    """按主题层级组织的订阅前缀树，类似 AMQP 的 topic exchange
+
+    匹配时沿主题逐层向下，只进入同名、* 和 # 三种子节点，
+    开销取决于主题层数和通配符数量，与订阅总数无关。
+    """
+
+    def __init__(self):
+        self._root: _Node[T] = _Node()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, pattern: str, value: T) -> None:
+        node = self._root
+        for word in validate_pattern(pattern):
+            child = node.children.get(word)
+            if child is None:
+                child = node.children[word] = _Node()
+            node = child
+        node.values.append(value)
+        self._size += 1
+
+    def remove(self, pattern: str, value: T) -> bool:
+        """移除订阅并清理不再使用的节点，返回是否找到该订阅"""
+        path: List[Tuple[_Node[T], str]] = []
+        node: Optional[_Node[T]] = self._root
+        for word in split_topic(pattern):
+            path.append((node, word))
+            node = node.children.get(word)
+            if node is None:
+                return False
+        if value not in node.values:
+            return False
+        node.values.remove(value)
+        self._size -= 1
+        for parent, word in reversed(path):
+            child = parent.children[word]
+            if child.values or child.children:
+                break
+            del parent.children[word]
+        return True
+
+    def get(self, pattern: str) -> List[T]:
+        """按订阅模式原样查找（不做通配符匹配）"""
+        node: Optional[_Node[T]] = self._root
+        for word in split_topic(pattern):
+            node = node.children.get(word)
+            if node is None:
+                return []
+        return list(node.values)
+
+    def match(self, topic: str) -> List[T]:
+        """返回所有订阅模式与 topic 匹配的值，同一个值只返回一次"""
+        words = split_topic(topic)
+        matched: Dict[int, T] = {}
+
+        def walk(node: _Node[T], index: int) -> None:
+            multi = node.children.get(MULTI_WILDCARD)
+            if multi is not None:
+                # # 依次尝试吞掉零层、一层……直到剩余的全部层
+                for end in range(index, len(words) + 1):
+                    walk(multi, end)
+            if index == len(words):
+                for value in node.values:
+                    matched.setdefault(id(value), value)
+                return
+            child = node.children.get(words[index])
+            if child is not None:
+                walk(child, index + 1)
+            single = node.children.get(SINGLE_WILDCARD)
+            if single is not None:
+                walk(single, index + 1)
+
+        walk(self._root, 0)
+        return list(matched.values())
+
+    def items(self) -> Iterator[Tuple[str, List[T]]]:
+        """遍历所有订阅模式及其值"""
+        stack: List[Tuple[_Node[T], List[str]]] = [(self._root, [])]
+        while stack:
+            node, words = stack.pop()
+            if node.values:
+                yield TOPIC_SEPARATOR.join(words), list(node.values)
+            for word, child in node.children.items():
+                stack.append((child, words + [word]))
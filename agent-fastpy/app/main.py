@@ -1,8 +1,9 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from .models import Base, engine
-from .routes import tasks
+from .routes import metrics, tasks
 from .services.agent import agent_service
+from .services.task_runs import task_runs
 from .services.websocket import websocket_manager
 
 # 创建数据库表
@@ -22,10 +23,11 @@ app.add_middleware(
 
 # 注册路由
 app.include_router(tasks.router, prefix="/api")
+app.include_router(metrics.router, prefix="/api")
 
 # WebSocket连接处理
 @app.websocket("/ws/tasks/{task_id}")
-async def websocket_endpoint(websocket: WebSocket, task_id: int):
+async def websocket_endpoint(websocket: WebSocket, task_id: str):
     try:
         await websocket_manager.connect(websocket, task_id)
         while True:
@@ -45,4 +47,5 @@ async def startup_event():
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await task_runs.cancel_all()
     await agent_service.close()
\ No newline at end of file
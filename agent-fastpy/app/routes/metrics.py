@@ -0,0 +1,23 @@
+from fastapi import APIRouter
+
+from ..core.cache import response_cache
+from ..core.circuit_breaker import breakers
+from ..core.rate_limiter import limiters
+from ..core.retry import hedger_stats
+from ..core.singleflight import singleflight
+from ..services.task_runs import task_runs
+
+router = APIRouter()
+
+
+@router.get("/metrics/llm")
+async def llm_metrics():
+    """模型调用相关的运行指标"""
+    return {
+        "cache": await response_cache.stats() if response_cache else None,
+        "singleflight": singleflight.stats(),
+        "limiters": limiters.stats(),
+        "hedging": hedger_stats(),
+        "breakers": breakers.stats(),
+        "task_runs": task_runs.stats(),
+    }
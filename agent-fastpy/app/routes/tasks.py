@@ -9,6 +9,7 @@ from ..models.task import Interaction, Task
 from ..schemas import Task as TaskSchema
 from ..schemas import TaskCreate
 from ..services.agent import agent_service
+from ..services.task_runs import task_runs
 
 router = APIRouter()
 
@@ -77,7 +78,7 @@ async def create_task(task: TaskCreate, db: Session = Depends(get_db)):
 # Define state transitions
 ALLOWED_TRANSITIONS = {
     'created': ['pending'],
-    'pending': ['running'],
+    'pending': ['running', 'stopped'],
     'running': ['completed', 'error', 'stopped'],
     'completed': [],
     'error': ['pending'],
@@ -119,14 +120,18 @@ async def start_task(task_id: str, db: Session = Depends(get_db)):
         agent_service.add_agent(
             "代码审查", "高级代码审查员", task_str_id, task.name, task.description)
 
-        # 启动任务并广播给智能体
-        responses = await agent_service.broadcast_task(
-            task_id,
-            "前端开发",
-            task_message
+        # 启动任务并广播给智能体，广播登记到任务下以便停止时取消
+        broadcast = task_runs.start(
+            task_str_id,
+            agent_service.broadcast_task(task_id, "前端开发", task_message)
         )
+        await asyncio.wait({broadcast})
+        if broadcast.cancelled():
+            return {"status": "success", "message": "Task stopped"}
+        responses = broadcast.result()
 
         try:
+            db.refresh(task)
             # Validate and set running state
             if not can_transition(task.status, "running"):
                 raise HTTPException(
@@ -157,7 +162,7 @@ async def start_task(task_id: str, db: Session = Depends(get_db)):
                 status_code=500, detail=f"Failed to start task: {str(e)}")
 
         # Start task processing in the background
-        asyncio.create_task(process_task(task_id, task_message))
+        task_runs.start(task_str_id, process_task(task_id, task_message))
 
         return {"status": "success", "message": "Task started successfully"}
     except Exception as e:
@@ -200,7 +205,10 @@ async def stop_task(task_id: str, db: Session = Depends(get_db)):
 
     task.status = "stopped"
     db.commit()
-    return {"status": "success", "message": "Task stopped"}
+
+    # 取消广播和后台处理，进行中的模型请求随之中断
+    cancelled = await task_runs.cancel(str(task_id))
+    return {"status": "success", "message": "Task stopped", "cancelled": cancelled}
 
 
 @router.get("/tasks/{task_id}/history")
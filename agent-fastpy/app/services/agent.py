@@ -1,8 +1,9 @@
 from typing import Dict, List, Optional
 from app.core.async_agent import AsyncAgent
 from app.core.async_environment import AsyncEnvironment
+from app.core.config import config
 from app.core.monitor import monitor
-from .websocket import websocket_manager
+from .websocket import StreamCoalescer, websocket_manager
 
 class AgentService:
     def __init__(self):
@@ -27,8 +28,8 @@ class AgentService:
             self._environment.add_agent(agent)
         return agent
 
-    async def broadcast_task(self, task_id: int, sender: str, message: str) -> Dict[str, str]:
-        """广播任务给所有智能体"""
+    async def broadcast_task(self, task_id: str, sender: str, message: str) -> Dict[str, str]:
+        """广播任务给所有智能体，有WebSocket客户端订阅时在生成过程中实时推送增量"""
         if not self._environment:
             raise RuntimeError("Environment not initialized")
 
@@ -36,8 +37,13 @@ class AgentService:
         monitor.log_event("task_start", f"开始任务: {message}")
         monitor.add_artifact("task_description", f"# 任务描述\n\n{message}")
 
-        # 广播消息
-        responses = await self._environment.broadcast(sender, message)
+        # 有客户端订阅任务时以流式广播，增量按间隔合并后推送
+        if websocket_manager.has_connections(task_id):
+            interval = config.stream_flush_interval_ms / 1000
+            async with StreamCoalescer(websocket_manager, task_id, interval) as stream:
+                responses = await self._environment.broadcast(sender, message, on_delta=stream.push)
+        else:
+            responses = await self._environment.broadcast(sender, message)
 
         # 记录智能体响应
         for agent_name, response in responses.items():
@@ -0,0 +1,66 @@
+import asyncio
+from typing import Any, Awaitable, Dict, Set
+
+from app.core.logger import Logger
+
+
+class TaskRunRegistry:
+    """记录每个任务正在运行的协程，停止任务时取消它们
+
+    取消会沿 await 链传递到进行中的模型请求：HTTP 连接被关闭，
+    限流器和熔断器的名额在各自的 async with 退出时归还。
+    """
+
+    def __init__(self, cancel_timeout: float = 1.0):
+        self.cancel_timeout = cancel_timeout
+        self._runs: Dict[str, Set["asyncio.Task[Any]"]] = {}
+        self.started = 0
+        self.cancelled = 0
+        self.logger = Logger("TaskRuns")
+
+    def start(self, task_id: str, coro: Awaitable[Any]) -> "asyncio.Task[Any]":
+        """在后台运行协程并登记到任务下"""
+        run = asyncio.ensure_future(coro)
+        runs = self._runs.setdefault(task_id, set())
+        runs.add(run)
+        run.add_done_callback(lambda done: self._finish(task_id, done))
+        self.started += 1
+        return run
+
+    def _finish(self, task_id: str, run: "asyncio.Task[Any]") -> None:
+        runs = self._runs.get(task_id)
+        if runs is not None:
+            runs.discard(run)
+            if not runs:
+                del self._runs[task_id]
+        if not run.cancelled() and run.exception() is not None:
+            self.logger.error(f"任务 {task_id} 后台执行出错: {run.exception()}")
+
+    def is_running(self, task_id: str) -> bool:
+        return bool(self._runs.get(task_id))
+
+    async def cancel(self, task_id: str) -> int:
+        """取消任务的所有协程并等待它们退出，返回取消的数量"""
+        runs = list(self._runs.get(task_id, ()))
+        for run in runs:
+            run.cancel()
+        if runs:
+            _, pending = await asyncio.wait(runs, timeout=self.cancel_timeout)
+            if pending:
+                self.logger.warning(f"任务 {task_id} 有 {len(pending)} 个协程未能及时退出")
+        self.cancelled += len(runs)
+        return len(runs)
+
+    async def cancel_all(self) -> None:
+        for task_id in list(self._runs):
+            await self.cancel(task_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": {task_id: len(runs) for task_id, runs in self._runs.items()},
+            "started": self.started,
+            "cancelled": self.cancelled,
+        }
+
+
+task_runs = TaskRunRegistry()
@@ -1,29 +1,91 @@
-from typing import Dict, List
+import asyncio
+from typing import Dict, List, Optional
 from fastapi import WebSocket
 from ..models.task import Task
 
 class WebSocketManager:
     def __init__(self):
-        self.active_connections: Dict[int, List[WebSocket]] = {}
+        self.active_connections: Dict[str, List[WebSocket]] = {}
 
-    async def connect(self, websocket: WebSocket, task_id: int):
+    async def connect(self, websocket: WebSocket, task_id: str):
         await websocket.accept()
         if task_id not in self.active_connections:
             self.active_connections[task_id] = []
         self.active_connections[task_id].append(websocket)
 
-    def disconnect(self, websocket: WebSocket, task_id: int):
+    def disconnect(self, websocket: WebSocket, task_id: str):
         if task_id in self.active_connections:
-            self.active_connections[task_id].remove(websocket)
+            if websocket in self.active_connections[task_id]:
+                self.active_connections[task_id].remove(websocket)
             if not self.active_connections[task_id]:
                 del self.active_connections[task_id]
 
-    async def broadcast_to_task(self, task_id: int, message: dict):
+    def has_connections(self, task_id: str) -> bool:
+        return bool(self.active_connections.get(task_id))
+
+    async def broadcast_to_task(self, task_id: str, message: dict):
         if task_id in self.active_connections:
-            for connection in self.active_connections[task_id]:
+            # 发送过程中可能断开连接，遍历副本
+            for connection in list(self.active_connections[task_id]):
                 try:
                     await connection.send_json(message)
-                except:
-                    await self.disconnect(connection, task_id)
+                except Exception:
+                    self.disconnect(connection, task_id)
+
+
+class StreamCoalescer:
+    """合并智能体的流式增量，按固定间隔批量推送到任务的 WebSocket
+
+    每个智能体的第一段增量立即推送，以缩短首字节时间；之后的增量在
+    interval 秒内合并为一帧。
+    """
+
+    def __init__(self, manager: WebSocketManager, task_id: str, interval: float):
+        self.manager = manager
+        self.task_id = task_id
+        self.interval = interval
+        self._buffers: Dict[str, List[str]] = {}
+        self._started: set = set()
+        self._flusher: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> "StreamCoalescer":
+        self._flusher = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if self._flusher:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush()
+
+    async def push(self, agent: str, delta: str) -> None:
+        """缓存一段增量"""
+        self._buffers.setdefault(agent, []).append(delta)
+        if agent not in self._started:
+            self._started.add(agent)
+            await self.flush()
+
+    async def flush(self) -> None:
+        """推送所有已缓存的增量"""
+        pending, self._buffers = self._buffers, {}
+        for agent, parts in pending.items():
+            await self.manager.broadcast_to_task(
+                self.task_id,
+                {
+                    "type": "agent_delta",
+                    "agent": agent,
+                    "delta": "".join(parts),
+                },
+            )
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            if self._buffers:
+                await self.flush()
 
-websocket_manager = WebSocketManager()
\ No newline at end of file
+websocket_manager = WebSocketManager()
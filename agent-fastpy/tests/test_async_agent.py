@@ -3,6 +3,8 @@ import asyncio
 import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# 未安装 core_lab 时直接使用仓库根目录下的源码
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'src')))
 
 from async_agent import AsyncAgent, PromptTemplate
 from logger import Logger
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# 未安装 core_lab 时直接使用仓库根目录下的源码
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+
+from app.core.backends import FakeBackend, FakeBackendError, LatencyDistribution, create_backend
+
+
+class TestFakeBackend(unittest.TestCase):
+    def make_backend(self, **kwargs) -> FakeBackend:
+        params = {
+            "latency": LatencyDistribution.parse("fixed:0"),
+            "responses": ["第一条回应", "第二条回应", "第三条回应"],
+            "chunk_interval": 0,
+            "seed": 1,
+        }
+        params.update(kwargs)
+        return FakeBackend(**params)
+
+    async def async_test_deterministic_chat(self):
+        backend = self.make_backend()
+        messages = [{"role": "user", "content": "分析需求"}]
+        first = await backend.chat("fake", messages)
+        second = await backend.chat("fake", messages)
+        self.assertEqual(first.text, second.text)
+        self.assertIn(first.text, backend.responses)
+        self.assertGreater(first.usage["output_tokens"], 0)
+
+        # 流式输出拼接后与非流式结果一致，最后一段带结束原因和用量
+        parts = [part async for part in backend.stream("fake", messages)]
+        self.assertGreater(len(parts), 2)
+        self.assertEqual("".join(part.text for part in parts), first.text)
+        self.assertEqual(parts[-1].finish_reason, "stop")
+        self.assertEqual(parts[-1].usage, first.usage)
+
+        # max_tokens 截断回应
+        truncated = await backend.chat("fake", messages, max_tokens=3)
+        self.assertEqual(truncated.text, first.text[:3])
+        self.assertEqual(truncated.finish_reason, "length")
+
+    def test_deterministic_chat(self):
+        """测试相同输入得到相同输出"""
+        asyncio.run(self.async_test_deterministic_chat())
+
+    async def async_test_error_rate(self):
+        backend = self.make_backend(error_rate=1.0)
+        with self.assertRaises(FakeBackendError) as ctx:
+            await backend.chat("fake", [{"role": "user", "content": "你好"}])
+        self.assertEqual(ctx.exception.status, 503)
+
+    def test_error_rate(self):
+        """测试按错误率注入故障"""
+        asyncio.run(self.async_test_error_rate())
+
+    async def async_test_embed(self):
+        backend = self.make_backend()
+        vectors = await backend.embed("fake", ["甲", "乙", "甲"])
+        self.assertEqual(len(vectors), 3)
+        self.assertEqual(len(vectors[0]), backend.embedding_dim)
+        self.assertEqual(vectors[0], vectors[2])
+        self.assertNotEqual(vectors[0], vectors[1])
+
+    def test_embed(self):
+        """测试向量确定且归一化"""
+        asyncio.run(self.async_test_embed())
+
+    def test_latency_distributions(self):
+        """测试解析延迟分布"""
+        rng = random.Random(0)
+        self.assertEqual(LatencyDistribution.parse("fixed:0.2").sample(rng), 0.2)
+        for spec in ("uniform:0.1,0.3", "normal:0.2,0.05", "lognormal:0.2,0.5", "exponential:0.2"):
+            self.assertGreaterEqual(LatencyDistribution.parse(spec).sample(rng), 0.0)
+        value = LatencyDistribution.parse("uniform:0.1,0.3").sample(rng)
+        self.assertTrue(0.1 <= value <= 0.3)
+        with self.assertRaises(ValueError):
+            LatencyDistribution.parse("zipf:1")
+
+    def test_create_backend(self):
+        """测试按名称创建后端"""
+        self.assertIsInstance(create_backend("fake", None), FakeBackend)
+        with self.assertRaises(ValueError):
+            create_backend("unknown", None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# 未安装 core_lab 时直接使用仓库根目录下的源码
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+
+from app.core.cache import MemoryCacheTier, ResponseCache, SQLiteCacheTier, make_cache_key
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "cache.db")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_cache_key(self):
+        """测试缓存键对参数敏感且与字典顺序无关"""
+        messages = [{"role": "user", "content": "你好"}]
+        key = make_cache_key("dashscope", "qwen-turbo", messages, {"a": 1, "b": 2})
+        self.assertEqual(key, make_cache_key("dashscope", "qwen-turbo", messages, {"b": 2, "a": 1}))
+        self.assertNotEqual(key, make_cache_key("ollama", "qwen-turbo", messages, {"a": 1, "b": 2}))
+        self.assertNotEqual(key, make_cache_key("dashscope", "qwen-turbo", messages, {"a": 2, "b": 2}))
+
+    async def async_test_memory_lru(self):
+        tier = MemoryCacheTier(max_size=2)
+        await tier.set("a", 1)
+        await tier.set("b", 2)
+        await tier.get("a")
+        await tier.set("c", 3)
+        self.assertEqual(await tier.get("a"), 1)
+        self.assertIsNone(await tier.get("b"))
+        self.assertEqual(tier.evictions, 1)
+
+    def test_memory_lru(self):
+        """测试内存层按最近使用淘汰"""
+        asyncio.run(self.async_test_memory_lru())
+
+    async def async_test_sqlite_eviction(self):
+        tier = SQLiteCacheTier(self.db_path, ttl=0, max_entries=2)
+        await tier.set("a", {"text": "1"})
+        await tier.set("b", {"text": "2"})
+        await tier.set("c", {"text": "3"})
+        self.assertIsNone(await tier.get("a"))
+        self.assertEqual(await tier.get("c"), {"text": "3"})
+
+        expired = SQLiteCacheTier(self.db_path, ttl=1e-9, max_entries=10)
+        self.assertIsNone(await expired.get("c"))
+
+    def test_sqlite_eviction(self):
+        """测试磁盘层的条目上限和过期"""
+        asyncio.run(self.async_test_sqlite_eviction())
+
+    async def async_test_tiered_lookup(self):
+        disk = SQLiteCacheTier(self.db_path)
+        await ResponseCache([MemoryCacheTier(), disk]).set("key", "value")
+
+        # 新进程只剩磁盘层的数据
+        cache = ResponseCache([MemoryCacheTier(), disk])
+        self.assertEqual(await cache.get("key"), "value")
+        self.assertEqual(await cache.get("key"), "value")
+        self.assertIsNone(await cache.get("missing"))
+
+        stats = await cache.stats()
+        self.assertEqual(stats["hits"], {"memory": 1, "sqlite": 1})
+        self.assertEqual(stats["misses"], 1)
+
+    def test_tiered_lookup(self):
+        """测试下层命中后回填上层并统计命中"""
+        asyncio.run(self.async_test_tiered_lookup())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# 未安装 core_lab 时直接使用仓库根目录下的源码
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+
+from app.core.backends import DashScopeError
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError, parse_failover_chain
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    async def call(self, breaker: CircuitBreaker, error: Exception = None):
+        async with breaker.guard():
+            if error:
+                raise error
+
+    async def async_test_open_and_recover(self):
+        breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=0.05)
+        for _ in range(2):
+            with self.assertRaises(asyncio.TimeoutError):
+                await self.call(breaker, asyncio.TimeoutError())
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        # 打开期间直接拒绝，不调用后端
+        with self.assertRaises(CircuitOpenError):
+            await self.call(breaker)
+        self.assertEqual(breaker.rejected, 1)
+
+        # 超过恢复时间后放行探测请求，成功则关闭
+        await asyncio.sleep(0.06)
+        self.assertTrue(breaker.allows_request())
+        await self.call(breaker)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_open_and_recover(self):
+        """测试连续失败后打开、恢复时间后探测关闭"""
+        asyncio.run(self.async_test_open_and_recover())
+
+    async def async_test_half_open_failure(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=0.05)
+        with self.assertRaises(ConnectionError):
+            await self.call(breaker, ConnectionError())
+        await asyncio.sleep(0.06)
+
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def probe():
+            async with breaker.guard():
+                started.set()
+                await release.wait()
+                raise ConnectionError()
+
+        task = asyncio.create_task(probe())
+        await started.wait()
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        # 半开状态只放行一个探测请求
+        with self.assertRaises(CircuitOpenError):
+            await self.call(breaker)
+
+        release.set()
+        with self.assertRaises(ConnectionError):
+            await task
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(breaker.times_opened, 2)
+
+    def test_half_open_failure(self):
+        """测试探测失败后重新打开"""
+        asyncio.run(self.async_test_half_open_failure())
+
+    async def async_test_client_error_not_counted(self):
+        breaker = CircuitBreaker("test", failure_threshold=1)
+        with self.assertRaises(DashScopeError):
+            await self.call(breaker, DashScopeError(400, "InvalidParameter", "参数错误"))
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(breaker.total_failures, 0)
+
+    def test_client_error_not_counted(self):
+        """测试请求参数错误不计入失败"""
+        asyncio.run(self.async_test_client_error_not_counted())
+
+    def test_parse_failover_chain(self):
+        """测试解析故障转移链"""
+        self.assertEqual(
+            parse_failover_chain("dashscope:qwen-turbo, ollama:qwen2.5-coder:1.5b"),
+            [("dashscope", "qwen-turbo"), ("ollama", "qwen2.5-coder:1.5b")],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
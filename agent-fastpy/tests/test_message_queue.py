@@ -0,0 +1,330 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core.message_queue import AsyncMessageQueue, Message, MessageQueue
+
+
+def make_message(content, topic="task.1"):
+    return Message(topic=topic, content=content, sender="tester")
+
+
+class TestAsyncMessageQueue(unittest.TestCase):
+    async def async_test_backpressure(self):
+        queue = AsyncMessageQueue("test_backpressure", max_size=1, overflow="block")
+        queue.create_queue("task.1")
+        self.assertTrue(await queue.publish(make_message(1)))
+
+        # 队列满时发布方等待，消费后继续
+        publish = asyncio.create_task(queue.publish(make_message(2)))
+        await asyncio.sleep(0.01)
+        self.assertFalse(publish.done())
+        self.assertEqual((await queue.get("task.1")).content, 1)
+        self.assertTrue(await publish)
+        self.assertEqual(queue.get_queue_size("task.1"), 1)
+
+        # 等待超时时放弃发布
+        begin = time.perf_counter()
+        self.assertFalse(await queue.publish(make_message(3), timeout=0.05))
+        self.assertLess(time.perf_counter() - begin, 0.5)
+        self.assertEqual(queue.stats()["topics"]["task.1"]["dropped"], 1)
+
+    def test_backpressure(self):
+        """测试队列满时发布方等待消费"""
+        asyncio.run(self.async_test_backpressure())
+
+    async def async_test_drop_policies(self):
+        drop_new = AsyncMessageQueue("test_drop_new", max_size=2, overflow="drop_new")
+        drop_oldest = AsyncMessageQueue("test_drop_oldest", max_size=2, overflow="drop_oldest")
+        drop_new.create_queue("task.1")
+        drop_oldest.create_queue("task.1")
+        for content in range(4):
+            await drop_new.publish(make_message(content))
+            await drop_oldest.publish(make_message(content))
+
+        self.assertEqual([drop_new.get_nowait("task.1").content for _ in range(2)], [0, 1])
+        self.assertEqual([drop_oldest.get_nowait("task.1").content for _ in range(2)], [2, 3])
+        self.assertIsNone(drop_new.get_nowait("task.1"))
+
+        with self.assertRaises(ValueError):
+            AsyncMessageQueue("test_invalid", overflow="unknown")
+
+    def test_drop_policies(self):
+        """测试丢弃最新和丢弃最早两种溢出策略"""
+        asyncio.run(self.async_test_drop_policies())
+
+    async def async_test_iterate(self):
+        queue = AsyncMessageQueue("test_iterate", max_size=4)
+        received = []
+        ticks = 0
+
+        async def consume():
+            async for message in queue.iterate("task.1"):
+                received.append(message.content)
+
+        async def tick():
+            # 消费者等待消息时事件循环仍在运行
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.001)
+
+        consumer = asyncio.create_task(consume())
+        ticker = asyncio.create_task(tick())
+        self.assertIsNone(await queue.get("task.2", timeout=0.02))
+        for content in range(10):
+            await queue.publish(make_message(content))
+        await queue.close()
+        await asyncio.wait_for(consumer, 1)
+        ticker.cancel()
+
+        self.assertEqual(received, list(range(10)))
+        self.assertGreater(ticks, 5)
+        self.assertFalse(await queue.publish(make_message(10)))
+
+    def test_iterate(self):
+        """测试异步迭代主题消息直到队列关闭"""
+        asyncio.run(self.async_test_iterate())
+
+    async def async_test_slow_subscriber(self):
+        queue = AsyncMessageQueue("test_async_dispatch", max_size=0, slow_consumer="drop")
+        fast, slow = [], []
+        release = asyncio.Event()
+
+        async def slow_callback(message):
+            await release.wait()
+            slow.append(message.content)
+
+        queue.subscribe("task.1", lambda message: fast.append(message.content))
+        queue.subscribe("task.1", slow_callback, max_pending=2)
+
+        # 发布不等待回调执行，慢订阅者的待投递队列满后丢弃消息
+        begin = time.perf_counter()
+        for content in range(10):
+            self.assertTrue(await queue.publish(make_message(content)))
+            await asyncio.sleep(0)
+        self.assertLess(time.perf_counter() - begin, 0.1)
+        await asyncio.sleep(0.01)
+        self.assertEqual(fast, list(range(10)))
+
+        fast_stats, slow_stats = queue.stats()["subscribers"]["task.1"]
+        self.assertEqual(fast_stats["pending"], 0)
+        self.assertEqual(slow_stats["pending"], 2)
+        self.assertEqual(slow_stats["dropped"], 7)
+        self.assertGreater(slow_stats["lag"], 0)
+
+        release.set()
+        await queue.flush()
+        # 投递中的一条加上待投递队列中的两条
+        self.assertEqual(slow, [0, 1, 2])
+
+    def test_slow_subscriber(self):
+        """测试慢订阅者不拖慢发布方和其他订阅者"""
+        asyncio.run(self.async_test_slow_subscriber())
+
+    async def async_test_subscriber_only_topic(self):
+        queue = AsyncMessageQueue("test_subscriber_only", max_size=5, overflow="block")
+        received = []
+        queue.subscribe("task.#", lambda message: received.append(message.content))
+
+        # 没有消费者的主题不保留消息，超过队列容量也不会阻塞发布方
+        for content in range(12):
+            self.assertTrue(await asyncio.wait_for(queue.publish(make_message(content)), 1))
+        await queue.flush()
+        self.assertEqual(received, list(range(12)))
+        self.assertEqual(queue.list_topics(), [])
+
+        # 出现消费者之后的消息才放入队列
+        self.assertIsNone(queue.get_nowait("task.1"))
+        self.assertIsNone(await queue.get("task.1", timeout=0.01))
+        await queue.publish(make_message(12))
+        self.assertEqual(queue.get_nowait("task.1").content, 12)
+
+    def test_subscriber_only_topic(self):
+        """测试只有订阅者的主题发布超过队列容量的消息"""
+        asyncio.run(self.async_test_subscriber_only_topic())
+
+    async def async_test_idle_queues(self):
+        queue = AsyncMessageQueue("test_idle_queues", max_size=2, queue_idle_ttl=0.5)
+        queue.create_queue("task.durable")
+        for task_id in range(100):
+            await queue.get(f"task.{task_id}", timeout=0.001)
+            await queue.publish(make_message(task_id, f"task.{task_id}"))
+        self.assertEqual(len(queue.list_topics()), 101)
+
+        # 一直有消费者等待的队列不会被清理
+        waiting = asyncio.create_task(queue.get("task.waiting"))
+        await asyncio.sleep(0.6)
+        await queue.publish(make_message("new", "task.other"))
+        self.assertEqual(sorted(queue.list_topics()), ["task.durable", "task.waiting"])
+        await queue.publish(make_message("done", "task.waiting"))
+        self.assertEqual((await waiting).content, "done")
+
+    def test_idle_queues(self):
+        """测试长时间没有读取的自动创建的队列被清理"""
+        asyncio.run(self.async_test_idle_queues())
+
+
+class TestMessageQueueDispatch(unittest.TestCase):
+    def setUp(self):
+        self.queue = MessageQueue("test_dispatch", subscriber_queue_size=2)
+
+    def tearDown(self):
+        self.queue.close()
+
+    def test_slow_consumer_policies(self):
+        """测试回调在投递线程中执行，以及 block、drop、disconnect 三种策略"""
+        release = threading.Event()
+        received = {"block": [], "drop": [], "disconnect": []}
+        started = {policy: threading.Event() for policy in received}
+
+        def make_callback(policy):
+            def callback(message):
+                started[policy].set()
+                release.wait(5)
+                received[policy].append(message.content)
+            return callback
+
+        for policy in received:
+            self.queue.subscribe(f"task.{policy}", make_callback(policy), slow_consumer=policy)
+
+        for policy in ("drop", "disconnect"):
+            begin = time.perf_counter()
+            self.assertTrue(self.queue.publish(make_message(0, f"task.{policy}")))
+            # 等第一条消息进入回调，之后的消息留在待投递队列
+            self.assertTrue(started[policy].wait(5))
+            for content in range(1, 5):
+                self.assertTrue(self.queue.publish(make_message(content, f"task.{policy}")))
+            self.assertLess(time.perf_counter() - begin, 0.5)
+        self.assertEqual(self.queue.get_subscriber_count("task.disconnect"), 0)
+
+        # block 策略在待投递队列满时让发布方等待
+        publisher = threading.Thread(
+            target=lambda: [self.queue.publish(make_message(content, "task.block")) for content in range(5)]
+        )
+        publisher.start()
+        publisher.join(0.2)
+        self.assertTrue(publisher.is_alive())
+
+        release.set()
+        publisher.join(5)
+        self.assertTrue(self.queue.flush(5))
+        self.assertEqual(received["block"], list(range(5)))
+        # 投递中的一条加上待投递队列中的两条
+        self.assertEqual(received["drop"], [0, 1, 2])
+        self.assertEqual(received["disconnect"], [0])
+        stats = self.queue.subscriber_stats()
+        self.assertEqual(stats["task.drop"][0]["dropped"], 2)
+        self.assertEqual(stats["task.block"][0]["delivered"], 5)
+
+    def test_subscriber_only_topics(self):
+        """测试只有订阅者的主题不创建队列，队列已满时仍然投递给订阅者"""
+        queue = MessageQueue("test_subscriber_only", max_size=5, queue_idle_ttl=0.05)
+        received = []
+        queue.subscribe("task.#", lambda message: received.append(message.topic))
+        try:
+            for task_id in range(200):
+                self.assertTrue(queue.publish(make_message(task_id, f"task.{task_id}")))
+            self.assertEqual(queue.list_topics(), [])
+
+            # 消费者的队列已满时 publish 返回 False，但订阅者照常收到消息
+            self.assertIsNone(queue.get_message("task.consumed"))
+            results = [queue.publish(make_message(content, "task.consumed")) for content in range(10)]
+            self.assertEqual(results, [True] * 5 + [False] * 5)
+            self.assertTrue(queue.flush(5))
+            self.assertEqual(received.count("task.consumed"), 10)
+            self.assertEqual(queue.get_queue_size("task.consumed"), 5)
+
+            # 超过 queue_idle_ttl 没有读取的队列被清理，显式创建的队列保留
+            queue.create_queue("task.durable")
+            time.sleep(0.06)
+            queue.publish(make_message("new", "task.other"))
+            self.assertEqual(queue.list_topics(), ["task.durable"])
+        finally:
+            queue.close()
+
+    def test_blocked_publisher(self):
+        """测试发布方等待 block 订阅者时不影响其他订阅者，回调向自己的主题发布不会死锁"""
+        release = threading.Event()
+        fast, slow, oldest = [], [], []
+
+        def slow_callback(message):
+            release.wait(5)
+            slow.append(message.content)
+
+        self.queue.subscribe("task.1", slow_callback, slow_consumer="block")
+        self.queue.subscribe("task.1", lambda message: fast.append(message.content), max_pending=0)
+        self.queue.subscribe("task.#", lambda message: (release.wait(5), oldest.append(message.content)),
+                             slow_consumer="drop_oldest")
+
+        publisher = threading.Thread(
+            target=lambda: [self.queue.publish(make_message(content)) for content in range(6)]
+        )
+        publisher.start()
+        # 发布方等待 slow 时，其他订阅者照常收到已发布的消息，其他发布方也不被阻塞
+        deadline = time.monotonic() + 5
+        while len(fast) < 4 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(publisher.is_alive())
+        self.assertGreaterEqual(len(fast), 4)
+        self.assertEqual(fast, list(range(len(fast))))
+        begin = time.perf_counter()
+        self.assertTrue(self.queue.publish(make_message("other", "task.2")))
+        self.assertLess(time.perf_counter() - begin, 0.1)
+
+        release.set()
+        publisher.join(5)
+        self.assertTrue(self.queue.flush(5))
+        self.assertEqual(slow, list(range(6)))
+        self.assertEqual(fast, list(range(6)))
+        # drop_oldest 丢弃较早的消息，保留最新的两条
+        self.assertEqual(oldest[-2:], [4, 5])
+        self.assertGreater(self.queue.subscriber_stats()["task.#"][0]["dropped"], 0)
+
+        # 回调向自己已满的订阅发布消息时直接入队
+        echoed = []
+
+        def echo(message):
+            echoed.append(message.content)
+            if message.content < 5:
+                for _ in range(3):
+                    self.queue.publish(make_message(message.content + 1, "task.echo"))
+
+        self.queue.subscribe("task.echo", echo, slow_consumer="block", max_pending=1)
+        self.queue.publish(make_message(4, "task.echo"))
+        self.assertTrue(self.queue.flush(5))
+        self.assertEqual(echoed, [4, 5, 5, 5])
+
+    def test_fair_dispatch(self):
+        """测试积压的订阅者每轮只投递一批消息，不会一直占住投递线程"""
+        queue = MessageQueue("test_fair_dispatch", dispatch_workers=1, dispatch_batch=2)
+        received = []
+        release = threading.Event()
+
+        def busy(message):
+            release.wait(5)
+            received.append(("busy", message.content))
+
+        queue.subscribe("task.busy", busy)
+        queue.subscribe("task.quiet", lambda message: received.append(("quiet", message.content)))
+        try:
+            for content in range(10):
+                queue.publish(make_message(content, "task.busy"))
+            queue.publish(make_message(0, "task.quiet"))
+            release.set()
+            self.assertTrue(queue.flush(5))
+        finally:
+            queue.close()
+
+        self.assertEqual([content for name, content in received if name == "busy"], list(range(10)))
+        # 唯一的投递线程在 busy 投递完一批后轮到 quiet
+        self.assertLessEqual(received.index(("quiet", 0)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import asyncio
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# 未安装 core_lab 时直接使用仓库根目录下的源码
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+
+from app.core.rate_limiter import AdaptiveConcurrency, BackendLimiter, ConcurrencyGate, TokenBucket
+
+
+class _Overloaded(Exception):
+    status = 503
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_token_bucket(self):
+        """测试令牌桶的等待时间"""
+        bucket = TokenBucket(per_minute=60)
+        self.assertEqual(bucket.wait_time(60), 0.0)
+        bucket.consume(60)
+        self.assertAlmostEqual(bucket.wait_time(1), 1.0, places=1)
+        # 超过容量的请求只需等到桶满
+        self.assertLessEqual(bucket.wait_time(1000), 60.0)
+
+    async def async_test_concurrency_fifo(self):
+        limiter = BackendLimiter("test", max_concurrency=2)
+        running = 0
+        peak = 0
+        order = []
+
+        async def call(index):
+            nonlocal running, peak
+            async with limiter.acquire():
+                order.append(index)
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(call(i) for i in range(6)))
+        self.assertEqual(peak, 2)
+        self.assertEqual(order, list(range(6)))
+        stats = limiter.stats()
+        self.assertEqual(stats["queue_wait"]["count"], 6)
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertGreater(stats["queue_wait"]["max"], 0)
+
+    def test_concurrency_fifo(self):
+        """测试并发上限和先来先服务"""
+        asyncio.run(self.async_test_concurrency_fifo())
+
+    async def async_test_rpm(self):
+        limiter = BackendLimiter("test", max_concurrency=10, rpm=600)
+        limiter.rpm_bucket.tokens = 1
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for _ in range(2):
+            async with limiter.acquire():
+                pass
+        # 第二个请求需要等待约 0.1 秒补充令牌
+        self.assertGreaterEqual(loop.time() - started, 0.08)
+
+    def test_rpm(self):
+        """测试每分钟请求数限制"""
+        asyncio.run(self.async_test_rpm())
+
+    async def async_test_gate_cancellation(self):
+        gate = ConcurrencyGate(1)
+        await gate.acquire()
+        waiter = asyncio.create_task(gate.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+        gate.release()
+        self.assertEqual(gate.in_flight, 0)
+        self.assertEqual(gate.waiting, 0)
+
+    def test_gate_cancellation(self):
+        """测试排队时取消不会占用名额"""
+        asyncio.run(self.async_test_gate_cancellation())
+
+    def test_adaptive_probe_and_backoff(self):
+        """测试自适应并发在延迟平稳时上探、过载时回退"""
+        gate = ConcurrencyGate(4)
+        adaptive = AdaptiveConcurrency(gate, max_limit=16)
+        for _ in range(40):
+            gate.in_flight = gate.limit
+            adaptive.on_sample(0.1)
+        self.assertGreater(gate.limit, 4)
+        probed = gate.limit
+
+        adaptive.on_sample(0.1, _Overloaded())
+        self.assertEqual(gate.limit, probed // 2)
+        self.assertEqual(adaptive.history[-1]["reason"], "overload")
+
+        # 普通错误不影响上限
+        adaptive._last_decrease = 0
+        adaptive.on_sample(0.1, ValueError("bad request"))
+        self.assertEqual(gate.limit, probed // 2)
+
+    def test_adaptive_latency_inflation(self):
+        """测试延迟膨胀时停止上探但不降低并发上限"""
+        gate = ConcurrencyGate(10)
+        adaptive = AdaptiveConcurrency(gate, max_limit=16)
+        gate.in_flight = gate.limit
+        adaptive.on_sample(0.1)
+        for _ in range(10):
+            adaptive.on_sample(1.0)
+        self.assertEqual(gate.limit, 10)
+        self.assertEqual(list(adaptive.history), [])
+
+    def test_adaptive_lognormal_latency(self):
+        """测试健康后端的长尾延迟不会把并发上限压低"""
+        rng = random.Random(7)
+        gate = ConcurrencyGate(8)
+        adaptive = AdaptiveConcurrency(gate, max_limit=16)
+        for _ in range(500):
+            gate.in_flight = gate.limit
+            # 生成长度差异很大，单令牌延迟平稳
+            tokens = int(rng.lognormvariate(5, 1)) + 1
+            adaptive.on_sample(tokens * 0.02 * rng.uniform(0.9, 1.1), tokens=tokens)
+        self.assertGreaterEqual(gate.limit, 8)
+        self.assertNotIn("latency", [entry["reason"] for entry in adaptive.history])
+
+if __name__ == "__main__":
+    unittest.main()
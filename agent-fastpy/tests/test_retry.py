@@ -0,0 +1,189 @@
+import asyncio
+import os
+import random
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# 未安装 core_lab 时直接使用仓库根目录下的源码
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+
+from app.core.retry import Hedger, RetryPolicy, is_retryable
+
+
+class _StatusError(Exception):
+    def __init__(self, status: int):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_full_jitter_bounds(self):
+        """测试退避时间落在 [0, min(max_delay, base * 2^(n-1))] 之间"""
+        random.seed(3)
+        policy = RetryPolicy(base_delay=0.5, max_delay=3.0)
+        for attempt, cap in ((1, 0.5), (2, 1.0), (3, 2.0), (4, 3.0), (10, 3.0)):
+            delays = [policy.backoff(attempt) for _ in range(500)]
+            self.assertGreaterEqual(min(delays), 0)
+            self.assertLessEqual(max(delays), cap)
+            # 抖动覆盖整个区间，而不是集中在上限附近
+            self.assertLess(min(delays), cap * 0.1)
+            self.assertGreater(max(delays), cap * 0.9)
+
+    async def async_test_retry_on_filter(self):
+        policy = RetryPolicy(max_attempts=4, base_delay=0.001, max_delay=0.001)
+        calls = 0
+        retries = []
+
+        async def flaky():
+            nonlocal calls
+            calls += 1
+            if calls < 3:
+                raise _StatusError(503)
+            return "ok"
+
+        result = await policy.call(flaky, on_retry=lambda attempt, exc, delay: retries.append(attempt))
+        self.assertEqual(result, "ok")
+        self.assertEqual(calls, 3)
+        self.assertEqual(retries, [1, 2])
+
+        # 请求本身有误时不重试
+        calls = 0
+
+        async def bad_request():
+            nonlocal calls
+            calls += 1
+            raise _StatusError(400)
+
+        with self.assertRaises(_StatusError):
+            await policy.call(bad_request)
+        self.assertEqual(calls, 1)
+
+        # 自定义 retry_on 只重试指定的异常
+        calls = 0
+        custom = RetryPolicy(max_attempts=4, base_delay=0.001, retry_on=lambda exc: isinstance(exc, KeyError))
+
+        async def missing():
+            nonlocal calls
+            calls += 1
+            raise KeyError("key")
+
+        with self.assertRaises(KeyError):
+            await custom.call(missing)
+        self.assertEqual(calls, 4)
+
+    def test_retry_on_filter(self):
+        """测试只有可重试的异常才会重试，且次数不超过上限"""
+        asyncio.run(self.async_test_retry_on_filter())
+
+    async def async_test_deadline(self):
+        # 单次调用超过剩余时间时被打断
+        policy = RetryPolicy(max_attempts=5, base_delay=0.001, deadline=0.1)
+        begin = time.perf_counter()
+        with self.assertRaises(asyncio.TimeoutError):
+            await policy.call(lambda: asyncio.sleep(10))
+        self.assertLess(time.perf_counter() - begin, 0.5)
+
+        # 退避会越过截止时间时直接抛出最后一次的异常，不再等待
+        policy = RetryPolicy(max_attempts=5, deadline=0.2)
+        policy.backoff = lambda attempt: 1.0
+        calls = 0
+
+        async def unavailable():
+            nonlocal calls
+            calls += 1
+            raise _StatusError(502)
+
+        begin = time.perf_counter()
+        with self.assertRaises(_StatusError):
+            await policy.call(unavailable)
+        self.assertLess(time.perf_counter() - begin, 0.5)
+        self.assertEqual(calls, 1)
+
+    def test_deadline(self):
+        """测试超过总截止时间后停止重试"""
+        asyncio.run(self.async_test_deadline())
+
+    def test_is_retryable(self):
+        """测试超时、连接错误、429 和 5xx 可以重试"""
+        self.assertTrue(is_retryable(asyncio.TimeoutError()))
+        self.assertTrue(is_retryable(ConnectionResetError()))
+        self.assertTrue(is_retryable(_StatusError(429)))
+        self.assertTrue(is_retryable(_StatusError(500)))
+        self.assertFalse(is_retryable(_StatusError(404)))
+        self.assertFalse(is_retryable(ValueError()))
+
+
+class TestHedger(unittest.TestCase):
+    async def async_test_hedge_cancels_loser(self):
+        hedger = Hedger(percentile=0.5, min_samples=3)
+        hedger.latencies.extend([0.02] * 3)
+        calls = 0
+        cancelled = asyncio.Event()
+
+        async def request():
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                # 第一个请求卡住，对冲请求先返回
+                try:
+                    await asyncio.sleep(10)
+                except asyncio.CancelledError:
+                    cancelled.set()
+                    raise
+                return "primary"
+            await asyncio.sleep(0.01)
+            return "hedge"
+
+        begin = time.perf_counter()
+        self.assertEqual(await hedger.call(request), "hedge")
+        self.assertLess(time.perf_counter() - begin, 0.5)
+        await asyncio.wait_for(cancelled.wait(), 1)
+        self.assertEqual(calls, 2)
+        self.assertEqual(hedger.stats()["hedged"], 1)
+        self.assertEqual(hedger.stats()["hedge_wins"], 1)
+
+    def test_hedge_cancels_loser(self):
+        """测试对冲请求先完成时取消落后的请求"""
+        asyncio.run(self.async_test_hedge_cancels_loser())
+
+    async def async_test_no_hedge_without_samples(self):
+        hedger = Hedger(min_samples=20)
+        calls = 0
+
+        async def request():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "ok"
+
+        self.assertIsNone(hedger.delay())
+        self.assertEqual(await hedger.call(request), "ok")
+        self.assertEqual(calls, 1)
+        self.assertEqual(hedger.stats()["samples"], 1)
+
+    def test_no_hedge_without_samples(self):
+        """测试样本不足时不发对冲请求"""
+        asyncio.run(self.async_test_no_hedge_without_samples())
+
+    async def async_test_hedge_failure(self):
+        hedger = Hedger(percentile=0.5, min_samples=1)
+        hedger.latencies.append(0.01)
+
+        async def fail():
+            await asyncio.sleep(0.02)
+            raise _StatusError(500)
+
+        # 两个请求都失败时抛出异常
+        with self.assertRaises(_StatusError):
+            await hedger.call(fail)
+        self.assertEqual(hedger.stats()["hedged"], 1)
+
+    def test_hedge_failure(self):
+        """测试主请求和对冲请求都失败时抛出异常"""
+        asyncio.run(self.async_test_hedge_failure())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# 未安装 core_lab 时直接使用仓库根目录下的源码
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+
+from app.core.singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    async def async_test_shared_result(self):
+        flight = SingleFlight()
+        calls = 0
+
+        async def generate():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "回应"
+
+        results = await asyncio.gather(*(flight.do("key", generate) for _ in range(5)))
+        self.assertEqual(results, ["回应"] * 5)
+        self.assertEqual(calls, 1)
+        self.assertEqual(flight.stats(), {"in_flight": 0, "executed": 1, "shared": 4})
+
+        # 上一次调用结束后应重新执行
+        await flight.do("key", generate)
+        self.assertEqual(calls, 2)
+
+    def test_shared_result(self):
+        """测试并发的相同调用只执行一次"""
+        asyncio.run(self.async_test_shared_result())
+
+    async def async_test_error_propagation(self):
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("模型错误")
+
+        results = await asyncio.gather(
+            *(flight.do("key", fail) for _ in range(3)), return_exceptions=True
+        )
+        self.assertEqual(len(results), 3)
+        for result in results:
+            self.assertIsInstance(result, RuntimeError)
+
+    def test_error_propagation(self):
+        """测试异常传递给所有等待者"""
+        asyncio.run(self.async_test_error_propagation())
+
+    async def async_test_cancellation(self):
+        flight = SingleFlight()
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def slow():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return "done"
+
+        first = asyncio.create_task(flight.do("key", slow))
+        second = asyncio.create_task(flight.do("key", slow))
+        await started.wait()
+
+        # 取消一个等待者不影响共享调用
+        first.cancel()
+        await asyncio.sleep(0)
+        self.assertFalse(cancelled.is_set())
+
+        # 最后一个等待者取消时底层调用也被取消
+        second.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await second
+        await asyncio.wait_for(cancelled.wait(), 1)
+        self.assertEqual(flight.in_flight(), 0)
+
+    def test_cancellation(self):
+        """测试取消的传播"""
+        asyncio.run(self.async_test_cancellation())
+
+
+if __name__ == "__main__":
+    unittest.main()
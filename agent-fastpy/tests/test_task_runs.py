@@ -0,0 +1,63 @@
+import asyncio
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# 未安装 core_lab 时直接使用仓库根目录下的源码
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+
+from app.core.rate_limiter import BackendLimiter
+from app.services.task_runs import TaskRunRegistry
+
+
+class TestTaskRunRegistry(unittest.TestCase):
+    async def async_test_cancel_releases_slots(self):
+        registry = TaskRunRegistry()
+        limiter = BackendLimiter("test", max_concurrency=1)
+        started = asyncio.Event()
+
+        async def generate():
+            async with limiter.acquire():
+                started.set()
+                await asyncio.sleep(60)
+
+        registry.start("1", generate())
+        # 排队等待名额的调用同样要被取消
+        registry.start("1", generate())
+        await started.wait()
+        self.assertTrue(registry.is_running("1"))
+        self.assertEqual(limiter.gate.in_flight, 1)
+
+        begin = time.perf_counter()
+        cancelled = await registry.cancel("1")
+        self.assertEqual(cancelled, 2)
+        self.assertLess(time.perf_counter() - begin, 0.1)
+        self.assertEqual(limiter.gate.in_flight, 0)
+        self.assertEqual(limiter.queued, 0)
+        self.assertFalse(registry.is_running("1"))
+
+    def test_cancel_releases_slots(self):
+        """测试停止任务时取消协程并归还限流名额"""
+        asyncio.run(self.async_test_cancel_releases_slots())
+
+    async def async_test_finished_runs(self):
+        registry = TaskRunRegistry()
+
+        async def fail():
+            raise RuntimeError("处理失败")
+
+        await asyncio.gather(registry.start("1", asyncio.sleep(0)), registry.start("2", fail()), return_exceptions=True)
+        await asyncio.sleep(0)
+        # 已结束的协程自动移出登记，停止时没有需要取消的协程
+        self.assertEqual(registry.stats()["running"], {})
+        self.assertEqual(await registry.cancel("1"), 0)
+
+    def test_finished_runs(self):
+        """测试结束的协程自动注销"""
+        asyncio.run(self.async_test_finished_runs())
+
+
+if __name__ == "__main__":
+    unittest.main()
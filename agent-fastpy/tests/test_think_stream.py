@@ -0,0 +1,106 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# 未安装 core_lab 时直接使用仓库根目录下的源码
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+from unittest import mock
+
+from app.core import async_agent
+from app.core.async_agent import AsyncAgent
+from app.core.backends import FakeBackendError, GenerationResult
+from app.core.config import config
+from app.core.monitor import monitor
+from app.core.singleflight import singleflight
+
+
+class TestThinkStream(unittest.TestCase):
+    def setUp(self):
+        # config 在导入时读取环境变量，其他测试可能先导入了它，这里直接改用模拟后端
+        patcher = mock.patch.multiple(
+            config, llm_failover_chain="fake:fake", fake_latency="fixed:0.01", fake_chunk_interval_ms=5
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def make_agent(self) -> AsyncAgent:
+        monitor.initialize_task("test_think_stream", "流式思考", "流式思考测试")
+        agent = AsyncAgent("streamer", "测试助手")
+        agent.cache = None
+        await agent.initialize()
+        return agent
+
+    async def collect(self, agent: AsyncAgent, context: str):
+        return [delta async for delta in agent.think_stream(context)]
+
+    async def async_test_shared_stream(self):
+        agent = await self.make_agent()
+        try:
+            executed = singleflight.executed
+            first, second = await asyncio.gather(self.collect(agent, "分析需求"), self.collect(agent, "分析需求"))
+            # 相同请求只生成一次，两个调用方收到相同的增量
+            self.assertGreater(len(first), 1)
+            self.assertEqual(first, second)
+            self.assertEqual(singleflight.executed - executed, 1)
+
+            # 唯一的读取方离开后取消生成
+            reader = asyncio.create_task(self.collect(agent, "另一个需求"))
+            await asyncio.sleep(0.02)
+            reader.cancel()
+            await asyncio.sleep(0.01)
+            self.assertEqual(async_agent._shared_streams, {})
+            self.assertEqual(singleflight.in_flight(), 0)
+        finally:
+            await agent.close()
+
+    def test_shared_stream(self):
+        """测试相同的流式请求合并为一次生成"""
+        asyncio.run(self.async_test_shared_stream())
+
+    async def async_test_retry_before_first_delta(self):
+        agent = await self.make_agent()
+        backend = agent.backends["fake"]
+        stream = backend.stream
+        calls = 0
+
+        def fail_first(model, messages, **params):
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                raise FakeBackendError()
+            return stream(model, messages, **params)
+
+        async def fail_midway(model, messages, **params):
+            nonlocal calls
+            calls += 1
+            yield GenerationResult(text="部分")
+            raise FakeBackendError()
+
+        try:
+            # 输出增量之前失败时重试
+            backend.stream = fail_first
+            expected = (await backend.chat("fake", agent._build_messages("重试"))).text
+            self.assertEqual("".join(await self.collect(agent, "重试")), expected)
+            self.assertEqual(calls, 2)
+
+            # 已经输出增量后失败时不再重试
+            calls = 0
+            backend.stream = fail_midway
+            received = []
+            with self.assertRaises(FakeBackendError):
+                async for delta in agent.think_stream("中途失败"):
+                    received.append(delta)
+            self.assertEqual(received, ["部分"])
+            self.assertEqual(calls, 1)
+        finally:
+            await agent.close()
+
+    def test_retry_before_first_delta(self):
+        """测试流式请求在输出增量之前失败时重试"""
+        asyncio.run(self.async_test_retry_before_first_delta())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import asyncio
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core.message_queue import AsyncMessageQueue, Message
+from app.core.topic_trie import TopicTrie
+
+
+class TestTopicTrie(unittest.TestCase):
+    def setUp(self):
+        self.trie = TopicTrie()
+        for pattern in ("task.1.done", "task.*.done", "task.#", "#", "task.*", "task.#.done", "agent.*"):
+            self.trie.add(pattern, pattern)
+
+    def test_wildcards(self):
+        """测试 * 匹配一层、# 匹配零层或多层"""
+        self.assertEqual(
+            sorted(self.trie.match("task.1.done")),
+            ["#", "task.#", "task.#.done", "task.*.done", "task.1.done"],
+        )
+        self.assertEqual(sorted(self.trie.match("task.1")), ["#", "task.#", "task.*"])
+        # # 可以匹配零层
+        self.assertEqual(sorted(self.trie.match("task")), ["#", "task.#"])
+        self.assertEqual(sorted(self.trie.match("task.done")), ["#", "task.#", "task.#.done", "task.*"])
+        self.assertEqual(sorted(self.trie.match("agent.a.b")), ["#"])
+
+        with self.assertRaises(ValueError):
+            self.trie.add("task.a*", "invalid")
+
+    def test_remove(self):
+        """测试移除订阅后清理空节点"""
+        self.assertTrue(self.trie.remove("task.*.done", "task.*.done"))
+        self.assertFalse(self.trie.remove("task.*.done", "task.*.done"))
+        self.assertFalse(self.trie.remove("task.2.done", "task.1.done"))
+        self.assertNotIn("task.*.done", self.trie.match("task.1.done"))
+        self.assertEqual(len(self.trie), 6)
+        self.assertEqual(self.trie.get("task.*.done"), [])
+        self.trie.add("deep.a.b", "deep")
+        self.trie.remove("deep.a.b", "deep")
+        self.assertNotIn("deep", self.trie._root.children)
+
+    def test_many_subscriptions(self):
+        """测试订阅数量增加时匹配开销不随之增长"""
+        trie = TopicTrie()
+        for task_id in range(20000):
+            trie.add(f"task.{task_id}.*", task_id)
+        trie.add("task.#", "all")
+
+        begin = time.perf_counter()
+        for _ in range(1000):
+            matched = trie.match("task.123.done")
+        self.assertLess(time.perf_counter() - begin, 0.5)
+        self.assertEqual(matched, ["all", 123])
+
+
+class TestWildcardSubscription(unittest.TestCase):
+    async def async_test_wildcard_delivery(self):
+        queue = AsyncMessageQueue("test_wildcard", max_size=0)
+        received = []
+        queue.subscribe("task.*.done", lambda message: received.append(("done", message.topic)))
+        queue.subscribe("task.#", lambda message: received.append(("all", message.topic)))
+
+        for topic in ("task.1.start", "task.1.done", "agent.1"):
+            await queue.publish(Message(topic=topic, content=None, sender="tester"))
+        await queue.flush()
+
+        self.assertEqual(
+            sorted(received), [("all", "task.1.done"), ("all", "task.1.start"), ("done", "task.1.done")]
+        )
+        # 只有订阅者的主题不创建消息队列
+        self.assertEqual(queue.list_topics(), [])
+
+        await queue.unsubscribe("task.#", queue.subscribers.get("task.#")[0].callback)
+        self.assertEqual(queue.get_subscriber_count("task.#"), 0)
+
+    def test_wildcard_delivery(self):
+        """测试通配符订阅收到匹配主题的消息"""
+        asyncio.run(self.async_test_wildcard_delivery())
+
+
+if __name__ == "__main__":
+    unittest.main()
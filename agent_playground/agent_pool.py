@@ -0,0 +1,67 @@
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from agents.base import AgentBase
+from models.agent import AgentStatus
+
+
+class AgentPool:
+    """
+    按角色索引的 Agent 池。
+    每个角色维护一个空闲队列，调度器在有空闲 Agent 时通过 try_acquire 取用，
+    等待执行的步骤由调度器按角色排队，Agent 池本身不维护等待者。
+    """
+
+    def __init__(self):
+        self.agents: Dict[str, AgentBase] = {}  # agent_id -> Agent
+        self._idle: Dict[str, Deque[AgentBase]] = {}
+        self._counts: Dict[str, int] = {}  # 每个角色注册的 Agent 数
+
+    def register(self, agent: AgentBase):
+        """注册 Agent，空闲的 Agent 立即可以被获取"""
+        if agent.agent_id in self.agents:
+            return
+        self.agents[agent.agent_id] = agent
+        self._counts[agent.role] = self._counts.get(agent.role, 0) + 1
+        if agent.status == AgentStatus.IDLE:
+            self._hand_over(agent)
+
+    def unregister(self, agent: AgentBase):
+        """注销 Agent（例如远程 Worker 断开），正在执行的 Agent 归还时不再放回池中"""
+        if self.agents.pop(agent.agent_id, None) is None:
+            return
+        self._counts[agent.role] -= 1
+        idle = self._idle.get(agent.role)
+        if idle and agent in idle:
+            idle.remove(agent)
+
+    def has_role(self, role: str) -> bool:
+        return self._counts.get(role, 0) > 0
+
+    def try_acquire(self, role: str) -> Optional[AgentBase]:
+        """立即获取一个空闲 Agent，没有时返回 None"""
+        idle = self._idle.get(role)
+        if idle:
+            agent = idle.popleft()
+            agent.status = AgentStatus.BUSY
+            return agent
+        return None
+
+    def release(self, agent: AgentBase):
+        """归还 Agent，放回空闲队列"""
+        if agent.agent_id not in self.agents:
+            return
+        self._hand_over(agent)
+
+    def _hand_over(self, agent: AgentBase):
+        agent.status = AgentStatus.IDLE
+        self._idle.setdefault(agent.role, deque()).append(agent)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            role: {
+                "agents": count,
+                "idle": len(self._idle.get(role, ())),
+            }
+            for role, count in self._counts.items()
+        }
@@ -1,7 +1,7 @@
 # agents/__init__.py
 from .base import AgentBase
 from .devops_engineer import DevOpsEngineer
-from .llm_integration import OllamaClientWrapper
+from .llm_integration import ChatStream, OllamaClientWrapper
 from .programmer import Programmer
 from .requirement_analyst import RequirementAnalyst
 from .system_architect import SystemArchitect
@@ -15,4 +15,5 @@ __all__ = [
     "RequirementAnalyst",
     "SystemArchitect",
     "OllamaClientWrapper",
+    "ChatStream",
 ]
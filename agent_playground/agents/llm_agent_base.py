@@ -1,6 +1,6 @@
 # agents/llm_agent_base.py
 from abc import ABC
-from typing import Any, Dict, List, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
 from agents.base import AgentBase
 from agents.llm_integration import OllamaClientWrapper
@@ -17,12 +17,19 @@ class LLMAgentBase(AgentBase, ABC):
         model: Optional[str] = None,
         messages: Optional[List[Dict[str, str]]] = None,
         prompt: Optional[str] = None,
+        stream: bool = False,
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None,
     ) -> Optional[Dict[str, Any]]:
-        """封装 LLM 调用逻辑"""
+        """封装 LLM 调用逻辑，stream 为 True 时逐段把生成内容交给 on_delta"""
         model_to_use = model if model else self.default_llm_model
         messages_to_use = messages if messages else []
         if prompt:
             messages_to_use.append(self.llm_client.create_message("user", prompt))
         if not messages_to_use:
             raise ValueError("No messages or prompt provided for LLM call.")
-        return await self.llm_client.chat(model=model_to_use, messages=messages_to_use)
+        return await self.llm_client.chat(
+            model=model_to_use,
+            messages=messages_to_use,
+            stream=stream,
+            on_delta=on_delta,
+        )
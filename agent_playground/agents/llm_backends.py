@@ -0,0 +1,94 @@
+# agents/llm_backends.py
+import os
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from core_lab.llm.backends import (  # noqa: F401
+    DashScopeBackend,
+    DashScopeError,
+    FakeBackend,
+    FakeBackendError,
+    GenerationResult,
+    LatencyDistribution,
+    LLMBackend,
+    OllamaBackend,
+    OllamaError,
+)
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "ollama")  # ollama / dashscope / fake
+DASHSCOPE_API_KEY = os.getenv("DASHSCOPE_API_KEY")
+DASHSCOPE_BASE_URL = os.getenv("DASHSCOPE_BASE_URL", "https://dashscope.aliyuncs.com/api/v1")
+DASHSCOPE_EMBEDDING_MODEL = os.getenv("DASHSCOPE_EMBEDDING_MODEL", "text-embedding-v2")
+OLLAMA_EMBEDDING_MODEL = os.getenv("OLLAMA_EMBEDDING_MODEL", "nomic-embed-text")
+FAKE_LATENCY = os.getenv("FAKE_LATENCY", "lognormal:0.5,0.3")  # 首字延迟分布（秒），格式为 "分布:参数"
+FAKE_CHUNK_SIZE = int(os.getenv("FAKE_CHUNK_SIZE", "4"))  # 每个流式片段的字数
+FAKE_CHUNK_INTERVAL_MS = float(os.getenv("FAKE_CHUNK_INTERVAL_MS", "10"))  # 流式片段间隔（毫秒）
+FAKE_ERROR_RATE = float(os.getenv("FAKE_ERROR_RATE", "0"))  # 注入故障的概率
+FAKE_RESPONSES_PATH = os.getenv("FAKE_RESPONSES_PATH")  # 预设回应的 JSON 列表文件
+FAKE_SEED = int(os.getenv("FAKE_SEED", "0"))
+
+
+def to_ollama_response(model: str, result: GenerationResult) -> Dict[str, Any]:
+    """把 GenerationResult 转换为 Ollama 格式的响应"""
+    response = {
+        "model": model,
+        "message": {"role": "assistant", "content": result.text},
+        "done": result.finish_reason is not None,
+        "done_reason": result.finish_reason,
+        **result.extra,
+    }
+    if result.usage:
+        response["prompt_eval_count"] = result.usage.get("input_tokens", 0)
+        response["eval_count"] = result.usage.get("output_tokens", 0)
+    return response
+
+
+class OllamaFormatBackend:
+    """
+    把 core_lab 的模型后端包装成返回 Ollama 格式字典的接口，
+    Agent 的对话历史和流式聚合都按这个格式处理。
+    """
+
+    def __init__(self, backend: LLMBackend):
+        self.backend = backend
+        self.name = backend.name
+        self.default_embedding_model = backend.default_embedding_model
+
+    async def chat(
+        self, model: str, messages: List[Dict[str, str]], max_tokens: Optional[int] = None
+    ) -> Dict[str, Any]:
+        return to_ollama_response(model, await self.backend.chat(model, messages, max_tokens))
+
+    async def stream(
+        self, model: str, messages: List[Dict[str, str]], max_tokens: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        async for part in self.backend.stream(model, messages, max_tokens):
+            yield to_ollama_response(model, part)
+
+    async def embed(self, model: str, texts: List[str]) -> List[List[float]]:
+        return await self.backend.embed(model, texts)
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+
+BACKENDS: Dict[str, Callable[[Optional[str]], LLMBackend]] = {
+    "ollama": lambda base_url: OllamaBackend(base_url, embedding_model=OLLAMA_EMBEDDING_MODEL),
+    "dashscope": lambda base_url: DashScopeBackend(
+        DASHSCOPE_API_KEY, base_url or DASHSCOPE_BASE_URL, embedding_model=DASHSCOPE_EMBEDDING_MODEL
+    ),
+    "fake": lambda base_url: FakeBackend(
+        latency=LatencyDistribution.parse(FAKE_LATENCY),
+        responses=FakeBackend.load_responses(FAKE_RESPONSES_PATH),
+        chunk_size=FAKE_CHUNK_SIZE,
+        chunk_interval=FAKE_CHUNK_INTERVAL_MS / 1000,
+        error_rate=FAKE_ERROR_RATE,
+        seed=FAKE_SEED,
+    ),
+}
+
+
+def create_backend(name: str = LLM_BACKEND, base_url: Optional[str] = None) -> LLMBackend:
+    """按名称创建模型后端"""
+    if name not in BACKENDS:
+        raise ValueError(f"未知的模型后端: {name}")
+    return BACKENDS[name](base_url)
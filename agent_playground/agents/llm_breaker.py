@@ -0,0 +1,30 @@
+# agents/llm_breaker.py
+import os
+from typing import List
+
+from core_lab.llm.circuit_breaker import BreakerRegistry, CircuitBreaker, CircuitOpenError  # noqa: F401
+from deadline import BudgetExhaustedError
+
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))  # 连续失败多少次后熔断
+LLM_BREAKER_RECOVERY_TIMEOUT = float(os.getenv("LLM_BREAKER_RECOVERY_TIMEOUT", "30"))  # 熔断后多久开始探测（秒）
+LLM_BREAKER_HALF_OPEN_MAX_CALLS = int(os.getenv("LLM_BREAKER_HALF_OPEN_MAX_CALLS", "1"))  # 半开状态放行的探测数
+LLM_FALLBACK_MODELS = os.getenv("LLM_FALLBACK_MODELS", "")  # 主模型不可用时依次尝试的模型，逗号分隔
+
+
+def fallback_models(model: str) -> List[str]:
+    """主模型及其后备模型，按尝试顺序排列"""
+    chain = [model]
+    for item in LLM_FALLBACK_MODELS.split(","):
+        item = item.strip()
+        if item and item not in chain:
+            chain.append(item)
+    return chain
+
+
+# 单例熔断器注册表；调用方预算用完不代表后端状态
+breakers = BreakerRegistry(
+    failure_threshold=LLM_BREAKER_FAILURE_THRESHOLD,
+    recovery_timeout=LLM_BREAKER_RECOVERY_TIMEOUT,
+    half_open_max_calls=LLM_BREAKER_HALF_OPEN_MAX_CALLS,
+    ignore=(BudgetExhaustedError,),
+)
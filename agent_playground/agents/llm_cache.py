@@ -0,0 +1,26 @@
+# agents/llm_cache.py
+import os
+
+from core_lab.llm.cache import (  # noqa: F401
+    CacheTier,
+    MemoryCacheTier,
+    ResponseCache,
+    SQLiteCacheTier,
+    build_response_cache,
+    make_cache_key,
+)
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_MEMORY_SIZE = int(os.getenv("LLM_CACHE_MEMORY_SIZE", "256"))  # 内存层最大条目数
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.db")  # 为空时不启用磁盘层
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))  # 磁盘层过期时间（秒）
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))  # 磁盘层最大条目数
+
+# 默认响应缓存实例
+response_cache = build_response_cache(
+    enabled=LLM_CACHE_ENABLED,
+    memory_size=LLM_CACHE_MEMORY_SIZE,
+    path=LLM_CACHE_PATH or None,
+    ttl=LLM_CACHE_TTL,
+    max_entries=LLM_CACHE_MAX_ENTRIES,
+)
@@ -1,37 +1,142 @@
 # llm_integration.py
-from typing import Any, Dict, List, Optional
+import asyncio
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
 
+from agents.llm_backends import LLMBackend, OllamaFormatBackend, create_backend
+from agents.llm_breaker import BreakerRegistry, CircuitOpenError, breakers, fallback_models
+from agents.llm_cache import ResponseCache, make_cache_key, response_cache
+from agents.llm_limiter import LimiterRegistry, estimate_tokens, limiters
+from agents.llm_singleflight import singleflight
+from deadline import BudgetExhaustedError, generation_limit, within_budget
 from monitoring import log_event
-from ollama import AsyncClient
+from retry_policy import (
+    LLM_HEDGING_ENABLED,
+    RetryPolicy,
+    get_hedger,
+    hedger_stats,
+    is_retryable,
+    llm_retry_policy,
+)
+
+# 预算用完、超时和取消由调用方处理，不属于后端故障
+CALLER_ERRORS = (BudgetExhaustedError, asyncio.TimeoutError, asyncio.CancelledError)
+
+
+class ChatStream:
+    """
+    流式对话结果。异步迭代得到每个增量片段，迭代结束后 result 为聚合后的完整响应，
+    其中 stats 包含首字延迟和生成速度。
+    """
+
+    def __init__(self, chunks: AsyncIterator[Any], model: str):
+        self.model = model
+        self.result: Optional[Dict[str, Any]] = None
+        self._chunks = chunks
+        self._parts: List[str] = []
+        self._started_at = time.perf_counter()
+        self._first_token_at: Optional[float] = None
+
+    def __aiter__(self) -> AsyncIterator[Dict[str, Any]]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[Dict[str, Any]]:
+        last: Dict[str, Any] = {}
+        async for part in self._chunks:
+            chunk = part.model_dump() if hasattr(part, "model_dump") else dict(part)
+            content = (chunk.get("message") or {}).get("content") or ""
+            if content and self._first_token_at is None:
+                self._first_token_at = time.perf_counter()
+            self._parts.append(content)
+            last = chunk
+            yield chunk
+        self.result = self._aggregate(last)
+
+    def _aggregate(self, last: Dict[str, Any]) -> Dict[str, Any]:
+        """用最后一个片段（包含 eval_count 等统计）和拼接后的内容构造完整响应"""
+        finished_at = time.perf_counter()
+        result = dict(last)
+        result["message"] = {"role": "assistant", "content": "".join(self._parts)}
+
+        first_token_at = self._first_token_at or finished_at
+        eval_count = last.get("eval_count")
+        eval_duration = last.get("eval_duration")  # 纳秒
+        if eval_count and eval_duration:
+            tokens_per_sec = eval_count / (eval_duration / 1e9)
+        else:
+            generation_time = finished_at - first_token_at
+            tokens_per_sec = len(self._parts) / generation_time if generation_time > 0 else 0.0
+        result["stats"] = {
+            "time_to_first_token": first_token_at - self._started_at,
+            "total_time": finished_at - self._started_at,
+            "chunks": len(self._parts),
+            "tokens_per_sec": tokens_per_sec,
+        }
+        return result
+
+    async def collect(self) -> Dict[str, Any]:
+        """消费剩余片段并返回聚合结果"""
+        async for _ in self:
+            pass
+        return self.result
 
 
 class OllamaClientWrapper:
     """
-    封装 Ollama AsyncClient, 提供更便捷的接口和日志记录。
+    封装模型后端（默认 Ollama，可通过 LLM_BACKEND 切换）, 提供更便捷的接口和日志记录。
     """
 
-    def __init__(self, base_url: Optional[str] = None):
-        self.client = AsyncClient()
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        backend: Optional[LLMBackend] = None,
+        cache: Optional[ResponseCache] = None,
+        limiter_registry: Optional[LimiterRegistry] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        breaker_registry: Optional[BreakerRegistry] = None,
+    ):
+        # 后端返回 GenerationResult，这里统一转换为 Ollama 格式的字典
+        self.backend = OllamaFormatBackend(backend or create_backend(base_url=base_url))
+        self.cache = cache or response_cache
+        self.singleflight = singleflight
+        self.limiters = limiter_registry or limiters
+        self.retry_policy = retry_policy or llm_retry_policy
+        self.breakers = breaker_registry or breakers
 
     async def chat(
-        self, model: str, messages: List[Dict[str, str]], stream: bool = False
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        stream: bool = False,
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None,
     ) -> Optional[Dict[str, Any]]:
         """
-        与 Ollama 模型进行非流式对话。
+        与 Ollama 模型进行对话，返回完整响应。
+        stream 为 True 时以流式方式生成，每收到一段内容调用一次 on_delta，
+        返回的响应中 stats 字段包含首字延迟和生成速度。
+        在 deadline_scope 中调用时，按剩余预算限制生成长度和等待时间。
+        后端故障时记录日志并返回 None；预算用完、超时和取消照常抛出。
         """
         try:
-            # log_event(
-            #     "LLM Interaction", f"Calling model '{model}'", {"messages": messages}
-            # )
-            response = await self.client.chat(
-                model=model, messages=messages, stream=stream
+            max_tokens = generation_limit()
+            request_key = self._cache_key(model, messages, max_tokens)
+            if self.cache:
+                cached = await self.cache.get(request_key)
+                if cached is not None:
+                    log_event("LLM Cache Hit", f"模型 '{model}' 命中响应缓存")
+                    if stream and on_delta:
+                        await on_delta(cached["message"]["content"])
+                    return cached
+
+            if stream:
+                return await self._chat_streaming(model, messages, on_delta, max_tokens)
+
+            # 相同请求并发时只向模型发送一次
+            return await self.singleflight.do(
+                request_key, lambda: self._chat_once(model, messages, max_tokens)
             )
-            # log_event(
-            #     "LLM Response Received",
-            #     f"Response from '{model}'",
-            #     {"response": response.model_dump()},
-            # )
-            return response.model_dump()
+        except CALLER_ERRORS:
+            raise
         except Exception as e:
             log_event(
                 "LLM Interaction Error",
@@ -40,6 +145,153 @@ class OllamaClientWrapper:
             )
             return None
 
+    async def chat_stream(
+        self, model: str, messages: List[Dict[str, str]], max_tokens: Optional[int] = None
+    ) -> ChatStream:
+        """
+        发起流式对话，返回可异步迭代的 ChatStream。
+        与 chat 不同，迭代时出现的任何异常都直接抛给调用方。
+        """
+        return ChatStream(self.backend.stream(model, messages, max_tokens), model)
+
+    async def _chat_streaming(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        on_delta: Optional[Callable[[str], Awaitable[None]]],
+        max_tokens: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """消费流式响应并写入缓存，开始输出之前失败时转移到后备模型"""
+        chain = fallback_models(model)
+        started = False
+
+        async def consume(candidate: str) -> Dict[str, Any]:
+            nonlocal started
+            limiter = self.limiters.get(self.backend.name, candidate)
+            async with self.breakers.get(f"{self.backend.name}:{candidate}").guard():
+                async with limiter.acquire(self._estimate_tokens(messages)) as permit:
+                    chat_stream = await self.chat_stream(candidate, messages, max_tokens)
+                    async for chunk in chat_stream:
+                        content = chunk["message"]["content"] if chunk.get("message") else ""
+                        if content and on_delta:
+                            started = True
+                            await on_delta(content)
+                    self._record_usage(permit, chat_stream.result)
+                    return chat_stream.result
+
+        for index, candidate in enumerate(chain):
+            try:
+                result = await within_budget(consume(candidate))
+                break
+            except Exception as e:
+                if started or index == len(chain) - 1 or not self._should_failover(e):
+                    raise
+                self._log_failover(candidate, e)
+        log_event("LLM Stream Completed", f"模型 '{candidate}' 流式生成完成", result["stats"])
+        if self.cache:
+            await self.cache.set(self._cache_key(candidate, messages, max_tokens), result)
+        return result
+
+    async def _chat_once(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        max_tokens: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """向模型发送非流式请求并写入缓存，失败时按重试策略重试，仍失败则转移到后备模型"""
+        last_error: Optional[Exception] = None
+        for candidate in fallback_models(model):
+
+            async def request() -> Dict[str, Any]:
+                if LLM_HEDGING_ENABLED:
+                    hedger = get_hedger(f"{self.backend.name}:{candidate}")
+                    return await hedger.call(lambda: self._request(candidate, messages, max_tokens))
+                return await self._request(candidate, messages, max_tokens)
+
+            def log_retry(attempt: int, error: BaseException, delay: float):
+                log_event(
+                    "LLM Retry",
+                    f"模型 '{candidate}' 第 {attempt} 次调用失败，{delay:.2f} 秒后重试",
+                    {"error": str(error)},
+                )
+
+            try:
+                result = await self.retry_policy.call(request, on_retry=log_retry)
+            except Exception as e:
+                if not self._should_failover(e):
+                    raise
+                last_error = e
+                self._log_failover(candidate, e)
+                continue
+
+            if self.cache:
+                await self.cache.set(self._cache_key(candidate, messages, max_tokens), result)
+            return result
+
+        raise last_error
+
+    async def _request(
+        self, model: str, messages: List[Dict[str, str]], max_tokens: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """在熔断器和限流器许可下发送一次请求，不超过调用方的剩余预算"""
+        # log_event(
+        #     "LLM Interaction", f"Calling model '{model}'", {"messages": messages}
+        # )
+        limiter = self.limiters.get(self.backend.name, model)
+        async with self.breakers.get(f"{self.backend.name}:{model}").guard():
+            async with limiter.acquire(self._estimate_tokens(messages)) as permit:
+                result = await within_budget(self.backend.chat(model, messages, max_tokens))
+                # log_event(
+                #     "LLM Response Received",
+                #     f"Response from '{model}'",
+                #     {"response": result},
+                # )
+                self._record_usage(permit, result)
+        return result
+
+    def _should_failover(self, error: BaseException) -> bool:
+        """熔断或模型故障时转移到后备模型，请求本身有误时直接报错"""
+        return isinstance(error, CircuitOpenError) or is_retryable(error)
+
+    def _log_failover(self, model: str, error: BaseException):
+        log_event(
+            "LLM Failover",
+            f"模型 '{model}' 不可用，尝试后备模型",
+            {"error": str(error)},
+        )
+
+    async def embed(
+        self, texts: List[str], model: Optional[str] = None
+    ) -> List[List[float]]:
+        """计算文本向量，未指定模型时使用后端的默认向量模型"""
+        return await self.backend.embed(model or self.backend.default_embedding_model, texts)
+
+    def _cache_key(self, model: str, messages: List[Dict[str, str]], max_tokens: Optional[int]) -> str:
+        """响应缓存的键；写入时使用实际回应的模型，后备模型的结果不会记在主模型名下"""
+        params = {"max_tokens": max_tokens} if max_tokens else None
+        return make_cache_key(self.backend.name, model, messages, params)
+
+    def _estimate_tokens(self, messages: List[Dict[str, str]]) -> int:
+        """估算一次调用的令牌数，用于每分钟令牌数限流"""
+        return sum(estimate_tokens(message["content"]) for message in messages)
+
+    def _record_usage(self, permit: Any, result: Dict[str, Any]):
+        """用后端返回的实际令牌数修正限流器"""
+        generated = result.get("eval_count") or 0
+        used = (result.get("prompt_eval_count") or 0) + generated
+        if used:
+            permit.record_tokens(used, generated)
+
+    async def stats(self) -> Dict[str, Any]:
+        """LLM 调用相关的运行指标"""
+        return {
+            "cache": await self.cache.stats() if self.cache else None,
+            "singleflight": self.singleflight.stats(),
+            "limiters": self.limiters.stats(),
+            "hedging": hedger_stats(),
+            "breakers": self.breakers.stats(),
+        }
+
     def create_message(self, role: str, content: str) -> Dict[str, str]:
         """
         创建符合 Ollama 消息格式的消息。
@@ -0,0 +1,26 @@
+# agents/llm_limiter.py
+import os
+
+from core_lab.llm.rate_limiter import (  # noqa: F401
+    AdaptiveConcurrency,
+    BackendLimiter,
+    ConcurrencyGate,
+    LimiterRegistry,
+    Permit,
+    TokenBucket,
+    estimate_tokens,
+    is_overload_error,
+)
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "2"))  # 每个模型的初始并发数
+LLM_RPM = float(os.getenv("LLM_RPM", "0"))  # 每分钟请求数，0 表示不限制
+LLM_TPM = float(os.getenv("LLM_TPM", "0"))  # 每分钟令牌数，0 表示不限制
+LLM_ADAPTIVE_MAX_CONCURRENCY = int(os.getenv("LLM_ADAPTIVE_MAX_CONCURRENCY", "0"))  # 自适应并发上限，默认 0 即固定并发
+
+# 默认限流器注册表，所有 Agent 共享
+limiters = LimiterRegistry(
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    rpm=LLM_RPM,
+    tpm=LLM_TPM,
+    adaptive_max=LLM_ADAPTIVE_MAX_CONCURRENCY or None,
+)
@@ -0,0 +1,5 @@
+# agents/llm_singleflight.py
+from core_lab.llm.singleflight import SingleFlight
+
+# 默认合并器实例，所有 Agent 共享
+singleflight = SingleFlight()
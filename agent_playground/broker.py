@@ -0,0 +1,266 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import TYPE_CHECKING, Any, Dict, List, Mapping, Optional, Set, Tuple
+
+from pydantic import Field, PrivateAttr
+
+from agents.base import AgentBase
+from deadline import remaining
+from models.task import TaskStep
+from monitoring import log_event
+
+if TYPE_CHECKING:
+    from task_manager import TaskManager
+
+BROKER_ENABLED = os.getenv("BROKER_ENABLED", "false").lower() == "true"  # 是否启动 Broker 接受远程 Worker
+BROKER_ADDRESS = os.getenv("BROKER_ADDRESS", "tcp://127.0.0.1:8765")  # tcp://主机:端口 或 unix:///路径
+BROKER_HEARTBEAT_INTERVAL = float(os.getenv("BROKER_HEARTBEAT_INTERVAL", "5"))  # Worker 发送心跳的间隔（秒）
+BROKER_HEARTBEAT_TIMEOUT = float(os.getenv("BROKER_HEARTBEAT_TIMEOUT", "15"))  # 超过该时间没有心跳视为 Worker 失联
+
+
+class WorkerLostError(Exception):
+    """执行步骤的 Worker 断开或心跳超时，步骤需要重新排队"""
+
+
+def parse_address(address: str) -> Tuple[str, Any]:
+    """解析 tcp://主机:端口 或 unix:///路径 格式的地址"""
+    if address.startswith("unix://"):
+        return "unix", address[len("unix://"):]
+    if address.startswith("tcp://"):
+        host, _, port = address[len("tcp://"):].rpartition(":")
+        return "tcp", (host or "127.0.0.1", int(port))
+    raise ValueError(f"不支持的地址: {address}")
+
+
+async def send_message(writer: asyncio.StreamWriter, message: Dict[str, Any]):
+    """发送一条 JSON 行消息"""
+    writer.write(json.dumps(message, ensure_ascii=False, default=str).encode("utf-8") + b"\n")
+    await writer.drain()
+
+
+async def read_message(reader: asyncio.StreamReader) -> Optional[Dict[str, Any]]:
+    """读取一条 JSON 行消息，连接关闭时返回 None"""
+    line = await reader.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+class RemoteAgent(AgentBase):
+    """
+    远程 Worker 上某个角色的代理，在本地 Agent 池中代表该 Worker 接收步骤。
+    fingerprint 为 Worker 上报的本地 Agent 指纹（模型、系统提示词等），StepMemo 用它代替代理本身的字段。
+    """
+
+    worker_id: str
+    fingerprint: Dict[str, Any] = Field(default_factory=dict)
+    _worker: Any = PrivateAttr(default=None)
+
+    async def execute_task(
+        self, task_step: TaskStep, context: Optional[Dict[str, Any]] = None
+    ) -> Any:
+        return await self._worker.execute(self, task_step, context)
+
+
+class WorkerConnection:
+    """Broker 一侧的 Worker 连接"""
+
+    def __init__(
+        self,
+        worker_id: str,
+        name: str,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ):
+        self.worker_id = worker_id
+        self.name = name
+        self.reader = reader
+        self.writer = writer
+        self.agents: List[RemoteAgent] = []
+        # (step_id, attempt) -> 结果；同一步骤重试时 attempt 不同，早先执行的迟到结果不会被当成重试的结果
+        self.pending: Dict[Tuple[str, str], asyncio.Future] = {}
+        self.last_heartbeat = time.monotonic()
+        self.alive = True
+        self._write_lock = asyncio.Lock()
+        self._cancels: Set[asyncio.Task] = set()
+
+    async def send(self, message: Dict[str, Any]):
+        async with self._write_lock:
+            await send_message(self.writer, message)
+
+    async def execute(
+        self, agent: RemoteAgent, step: TaskStep, context: Optional[Mapping[str, Any]]
+    ) -> Any:
+        """把步骤发给 Worker 并等待结果，超时或被取消时通知 Worker 停止执行"""
+        if not self.alive:
+            raise WorkerLostError(f"Worker {self.name} 已断开")
+        key = (step.step_id, uuid.uuid4().hex)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[key] = future
+        try:
+            await self.send(
+                {
+                    "type": "assign",
+                    "role": agent.role,
+                    "step": step.model_dump(mode="json"),
+                    "attempt": key[1],
+                    "context": dict(context or {}),
+                    "timeout": remaining(),
+                }
+            )
+            return await future
+        except asyncio.CancelledError:
+            self._cancel_remote(key)
+            raise
+        except (ConnectionError, OSError) as e:
+            raise WorkerLostError(f"Worker {self.name} 连接异常: {e}") from e
+        finally:
+            self.pending.pop(key, None)
+
+    def _cancel_remote(self, key: Tuple[str, str]):
+        """在后台发送 cancel 消息，当前任务已被取消，不能再等待发送完成"""
+        if not self.alive:
+            return
+
+        async def cancel():
+            try:
+                await self.send({"type": "cancel", "step_id": key[0], "attempt": key[1]})
+            except (ConnectionError, OSError):
+                pass
+
+        task = asyncio.create_task(cancel())
+        self._cancels.add(task)
+        task.add_done_callback(self._cancels.discard)
+
+    def fail_pending(self, reason: str):
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(WorkerLostError(reason))
+
+
+class StepBroker:
+    """
+    步骤分发 Broker，运行在 TaskManager 所在进程。
+    Worker 通过 TCP 或 Unix 套接字连接并声明自己能承担的角色，Broker 为每个角色在 Agent 池中
+    注册一个 RemoteAgent，调度器像使用本地 Agent 一样把步骤派给它。步骤结果回传后仍由
+    TaskManager 写入 ContextManager，上下文只有一个写入方。Worker 心跳超时或断开时，
+    它正在执行的步骤以 WorkerLostError 结束并重新排队。
+    """
+
+    def __init__(
+        self,
+        manager: "TaskManager",
+        heartbeat_timeout: float = BROKER_HEARTBEAT_TIMEOUT,
+    ):
+        self.manager = manager
+        self.heartbeat_timeout = heartbeat_timeout
+        self.workers: Dict[str, WorkerConnection] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._monitor_task: Optional[asyncio.Task] = None
+
+    async def start(self, address: str = BROKER_ADDRESS):
+        kind, target = parse_address(address)
+        if kind == "unix":
+            self._server = await asyncio.start_unix_server(self._handle, path=target)
+        else:
+            self._server = await asyncio.start_server(self._handle, *target)
+        self._monitor_task = asyncio.create_task(self._monitor())
+        log_event("Broker Started", f"Broker 正在监听 {address}")
+
+    async def stop(self):
+        if self._monitor_task:
+            self._monitor_task.cancel()
+        for worker in list(self.workers.values()):
+            self._drop(worker, "Broker 停止")
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            hello = await read_message(reader)
+        except (ConnectionError, ValueError) as e:
+            log_event("Worker Rejected", "Worker 握手消息无效", {"error": str(e)})
+            writer.close()
+            return
+        if not isinstance(hello, dict) or hello.get("type") != "hello":
+            log_event("Worker Rejected", "Worker 未发送 hello 消息", {"message": hello})
+            writer.close()
+            return
+
+        worker = WorkerConnection(
+            hello.get("worker_id") or str(uuid.uuid4()), hello.get("name", ""), reader, writer
+        )
+        self.workers[worker.worker_id] = worker
+        fingerprints = hello.get("fingerprints") or {}
+        for role in hello.get("roles", []):
+            agent = RemoteAgent(
+                name=f"{worker.name}/{role}",
+                role=role,
+                worker_id=worker.worker_id,
+                fingerprint=fingerprints.get(role) or {},
+            )
+            agent._worker = worker
+            worker.agents.append(agent)
+            self.manager.register_agent(agent)
+        log_event(
+            "Worker Connected",
+            f"Worker {worker.name} 已连接",
+            {"worker_id": worker.worker_id, "roles": hello.get("roles", [])},
+        )
+
+        try:
+            while True:
+                message = await read_message(reader)
+                if message is None:
+                    break
+                worker.last_heartbeat = time.monotonic()
+                self._on_message(worker, message)
+        except (ConnectionError, ValueError) as e:
+            log_event("Worker Error", f"Worker {worker.name} 连接异常", {"error": str(e)})
+        finally:
+            self._drop(worker, f"Worker {worker.name} 已断开")
+
+    def _on_message(self, worker: WorkerConnection, message: Dict[str, Any]):
+        kind = message.get("type")
+        future = worker.pending.get((message.get("step_id"), message.get("attempt")))
+        if kind == "result" and future and not future.done():
+            future.set_result(message.get("result"))
+        elif kind == "error" and future and not future.done():
+            future.set_exception(RuntimeError(message.get("error", "Worker 执行失败")))
+
+    async def _monitor(self):
+        """定期检查心跳，超时的 Worker 视为失联"""
+        while True:
+            await asyncio.sleep(self.heartbeat_timeout / 3)
+            now = time.monotonic()
+            for worker in list(self.workers.values()):
+                if now - worker.last_heartbeat > self.heartbeat_timeout:
+                    self._drop(worker, f"Worker {worker.name} 心跳超时")
+
+    def _drop(self, worker: WorkerConnection, reason: str):
+        """移除 Worker：注销它的 Agent，正在执行的步骤重新排队"""
+        if not worker.alive:
+            return
+        worker.alive = False
+        self.workers.pop(worker.worker_id, None)
+        for agent in worker.agents:
+            self.manager.agent_pool.unregister(agent)
+        worker.fail_pending(reason)
+        worker.writer.close()
+        log_event("Worker Lost", reason, {"requeued": len(worker.pending)})
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            worker.worker_id: {
+                "name": worker.name,
+                "roles": [agent.role for agent in worker.agents],
+                "in_flight": len(worker.pending),
+                "last_heartbeat": now - worker.last_heartbeat,
+            }
+            for worker in self.workers.values()
+        }
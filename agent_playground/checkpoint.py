@@ -0,0 +1,190 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from context_manager import ContextSnapshot
+from models.task import Task, TaskStatus, TaskStep
+from monitoring import log_event
+
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", "checkpoints.db")  # 为空时不保存检查点
+CHECKPOINT_SNAPSHOT_INTERVAL = int(os.getenv("CHECKPOINT_SNAPSHOT_INTERVAL", "10"))  # 每多少条日志合并一次快照
+CHECKPOINT_KEEP_FAILED = os.getenv("CHECKPOINT_KEEP_FAILED", "true").lower() == "true"  # 是否保留失败任务的检查点，便于手动重新处理
+
+
+class TaskCheckpoint:
+    """
+    任务检查点，保存在 SQLite 文件中。
+    每个任务有一份快照（任务、步骤和上下文），之后完成的步骤以追加日志的形式记录，
+    日志达到一定条数时重新生成快照并清空该任务的日志。写入在后台按提交顺序批量执行，
+    序列化也在写入线程中完成，调用方不需要等待磁盘 IO；进程退出后可以用快照加日志恢复任务，
+    只重新执行未完成的步骤。任务完成后删除它的快照和日志，失败的任务按 keep_failed 决定是否保留。
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = CHECKPOINT_PATH,
+        snapshot_interval: int = CHECKPOINT_SNAPSHOT_INTERVAL,
+        keep_failed: bool = CHECKPOINT_KEEP_FAILED,
+    ):
+        self.path = path
+        self.snapshot_interval = snapshot_interval
+        self.keep_failed = keep_failed
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[str, str, Any]] = []  # (操作, 任务 ID, 数据)
+        self._journal_size: Dict[str, int] = {}  # 每个任务自上次快照以来的日志条数
+        self._writer: Optional[asyncio.Task] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS task_snapshots ("
+                "task_id TEXT PRIMARY KEY, status TEXT NOT NULL, "
+                "task TEXT NOT NULL, context TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS task_journal ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, task_id TEXT NOT NULL, step TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_task_journal_task ON task_journal (task_id, seq)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _write(self, batch: List[Tuple[str, str, Any]]):
+        with self._lock:
+            conn = self._connect()
+            for op, task_id, data in batch:
+                if op == "snapshot":
+                    task, context = data
+                    # 转存到磁盘的上下文值在这里才加载
+                    snapshot = {"version": getattr(context, "version", 0), "data": dict(context)}
+                    conn.execute(
+                        "INSERT OR REPLACE INTO task_snapshots (task_id, status, task, context) "
+                        "VALUES (?, ?, ?, ?)",
+                        (task_id, task.status.value, json.dumps(task.model_dump(mode="json"), ensure_ascii=False),
+                         json.dumps(snapshot, ensure_ascii=False, default=str)),
+                    )
+                    conn.execute("DELETE FROM task_journal WHERE task_id = ?", (task_id,))
+                elif op == "step":
+                    conn.execute(
+                        "INSERT INTO task_journal (task_id, step) VALUES (?, ?)",
+                        (task_id, json.dumps(data.model_dump(mode="json"), ensure_ascii=False, default=str)),
+                    )
+                elif op == "status":
+                    conn.execute(
+                        "UPDATE task_snapshots SET status = ? WHERE task_id = ?", (data, task_id)
+                    )
+                elif op == "prune":
+                    conn.execute("DELETE FROM task_snapshots WHERE task_id = ?", (task_id,))
+                    conn.execute("DELETE FROM task_journal WHERE task_id = ?", (task_id,))
+            conn.commit()
+
+    def _submit(self, op: str, task_id: str, data: Any):
+        if not self.path:
+            return
+        self._pending.append((op, task_id, data))
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._drain())
+
+    async def _drain(self):
+        """后台写入：每次取出当前积压的所有操作，在线程中一次提交"""
+        while self._pending:
+            batch, self._pending = self._pending, []
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except (sqlite3.Error, OSError) as e:
+                log_event("Checkpoint Failed", f"写入检查点失败: {self.path}", {"error": str(e)})
+
+    def _copy_task(self, task: Task) -> Task:
+        """
+        任务和步骤的浅复制，之后事件循环中对它们的修改不会进入待写入的快照。
+        步骤结果不会被原地修改，直接共享引用，真正的序列化留给写入线程。
+        """
+        steps = {step_id: step.model_copy() for step_id, step in task.steps.items()}
+        return task.model_copy(update={"steps": steps})
+
+    def save_task(self, task: Task, context: Mapping[str, Any]):
+        """保存任务的完整快照；context 应为不可变的 ContextSnapshot，在写入线程中读取"""
+        if not self.path:
+            return
+        self._journal_size[task.task_id] = 0
+        self._submit("snapshot", task.task_id, (self._copy_task(task), context))
+
+    def record_step(self, task: Task, step: TaskStep, context: Mapping[str, Any]):
+        """记录一个步骤的结束状态，日志过长时改为保存快照"""
+        if not self.path:
+            return
+        size = self._journal_size.get(task.task_id, 0) + 1
+        if size >= self.snapshot_interval:
+            self.save_task(task, context)
+            return
+        self._journal_size[task.task_id] = size
+        self._submit("step", task.task_id, step.model_copy())
+
+    def record_status(self, task: Task):
+        """记录任务状态；任务完成（或失败且不保留）时删除它的检查点"""
+        terminal = task.status == TaskStatus.COMPLETED or (
+            task.status == TaskStatus.FAILED and not self.keep_failed
+        )
+        if terminal:
+            self._journal_size.pop(task.task_id, None)
+            self._submit("prune", task.task_id, None)
+        else:
+            self._submit("status", task.task_id, task.status.value)
+
+    async def flush(self):
+        """等待已提交的检查点全部写入"""
+        while self._writer is not None and not self._writer.done():
+            await asyncio.shield(self._writer)
+
+    def _load(self, task_id: str) -> Optional[Tuple[Task, ContextSnapshot]]:
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT status, task, context FROM task_snapshots WHERE task_id = ?", (task_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            steps = conn.execute(
+                "SELECT step FROM task_journal WHERE task_id = ? ORDER BY seq", (task_id,)
+            ).fetchall()
+
+        task = Task(**json.loads(row[1]))
+        task.status = TaskStatus(row[0])
+        saved = json.loads(row[2])
+        context = ContextSnapshot(saved["data"], saved["version"])
+        # 按顺序重放快照之后的步骤，完成步骤的结果与执行时一样合并进上下文，每次合并产生一个新版本
+        for (raw,) in steps:
+            step = TaskStep(**json.loads(raw))
+            task.steps[step.step_id] = step
+            if isinstance(step.result, dict):
+                context = context.evolve(step.result)
+        return task, context
+
+    async def load(self, task_id: str) -> Optional[Tuple[Task, ContextSnapshot]]:
+        """读取任务快照并重放日志，返回任务和上下文"""
+        await self.flush()
+        if not self.path or not os.path.exists(self.path):
+            return None
+        return await asyncio.to_thread(self._load, task_id)
+
+    def _unfinished(self) -> List[str]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT task_id FROM task_snapshots WHERE status IN (?, ?)",
+                (TaskStatus.PENDING.value, TaskStatus.IN_PROGRESS.value),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    async def unfinished(self) -> List[str]:
+        """等待执行或进行中（进程退出时被中断）的任务 ID，已失败的任务不会自动恢复"""
+        await self.flush()
+        if not self.path or not os.path.exists(self.path):
+            return []
+        return await asyncio.to_thread(self._unfinished)
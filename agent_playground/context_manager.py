@@ -1,35 +1,308 @@
 import asyncio
+import os
+import time
 import uuid
-from typing import Any, Dict, Optional
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Iterable, Iterator, Mapping, Optional
+
+from context_store import (
+    CONTEXT_MAX_FINISHED,
+    CONTEXT_MEMORY_BUDGET,
+    CONTEXT_SPILL_THRESHOLD,
+    CONTEXT_TTL,
+    BlobStore,
+    SpilledValue,
+    value_size,
+)
+from monitoring import log_event
+
+CONTEXT_HISTORY_SIZE = int(os.getenv("CONTEXT_HISTORY_SIZE", "8"))  # 每个上下文保留的历史版本数
+
+
+class ContextSnapshot(Mapping):
+    """
+    上下文的一个不可变版本。
+    读取方直接持有快照，不需要加锁或复制；写入时生成新版本，
+    新旧版本共享未修改的值，只复制键到值的引用。
+    较大的值可能已转存到磁盘，读取时透明加载，对读取方而言内容不变。
+    加载过的值缓存在快照上，同一个读取方重复读取时不再访问磁盘。
+    """
+
+    __slots__ = ("version", "_data", "_loaded")
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None, version: int = 0):
+        self.version = version
+        self._data: Dict[str, Any] = data if data is not None else {}
+        self._loaded: Dict[str, Any] = {}
+
+    def __getitem__(self, key: str) -> Any:
+        value = self._data[key]
+        if isinstance(value, SpilledValue):
+            if key not in self._loaded:
+                self._loaded[key] = value.load()
+            return self._loaded[key]
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        # 值可能是完整的代码或文档，只展示键
+        return f"ContextSnapshot(version={self.version}, keys={list(self._data)})"
+
+    def evolve(self, updates: Mapping[str, Any]) -> "ContextSnapshot":
+        """基于当前版本生成合并了 updates 的下一个版本"""
+        data = dict(self._data)
+        data.update(updates)
+        return ContextSnapshot(data, self.version + 1)
+
+    def view(self) -> "ContextSnapshot":
+        """交给读取方的同一版本，与当前快照共享数据，但有自己的加载缓存，读取方释放后缓存随之释放"""
+        return ContextSnapshot(self._data, self.version)
+
+
+def resident_size(snapshots: Iterable[ContextSnapshot]) -> int:
+    """一组快照中仍在内存中的值占用的字节数，多个版本共享的值只计算一次"""
+    values = {id(value): value for snapshot in snapshots for value in snapshot._data.values()}
+    return sum(value_size(value) for value in values.values())
+
+
+EMPTY_CONTEXT = ContextSnapshot()
 
 
 class ContextManager:
-    """管理任务的上下文信息，允许不同 Agent 共享数据"""
+    """
+    管理任务的上下文信息，允许不同 Agent 共享数据。
+    每个上下文是一串不可变的版本快照：读取直接返回当前快照，写入在该上下文自己的锁内
+    生成新版本，不同任务的写入互不阻塞。最近的若干版本保留在历史中，便于按版本复现步骤输入。
+
+    内存占用有上限：超过 spill_threshold 的值写入时直接转存到磁盘；所有上下文驻留内存的值
+    超过 memory_budget 时，按最近最少使用的顺序把其他上下文的值转存到磁盘。
+    任务结束后上下文进入淘汰队列，超过 ttl 未被访问或数量超过 max_finished 时删除，长时间运行时内存保持平稳。
+    """
+
+    def __init__(
+        self,
+        history_size: int = CONTEXT_HISTORY_SIZE,
+        store: Optional[BlobStore] = None,
+        spill_threshold: int = CONTEXT_SPILL_THRESHOLD,
+        memory_budget: int = CONTEXT_MEMORY_BUDGET,
+        ttl: float = CONTEXT_TTL,
+        max_finished: int = CONTEXT_MAX_FINISHED,
+    ):
+        self.contexts: Dict[str, ContextSnapshot] = {}  # 上下文 ID -> 当前版本
+        self.history_size = history_size
+        self.store = store or BlobStore()
+        self.spill_threshold = spill_threshold
+        self.memory_budget = memory_budget
+        self.ttl = ttl
+        self.max_finished = max_finished
+        self._history: Dict[str, Deque[ContextSnapshot]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}  # 每个上下文一把写锁
+        self._resident: Dict[str, int] = {}  # 上下文 ID -> 驻留内存的字节数
+        self._blobs: Dict[str, Dict[str, SpilledValue]] = {}  # 上下文 ID -> 引用的磁盘 blob
+        self._recent: "OrderedDict[str, None]" = OrderedDict()  # 按最近使用排序
+        self._finished: "OrderedDict[str, float]" = OrderedDict()  # 已结束的上下文 -> 结束时间
+        self.spilled_values = 0
+        self.evicted_contexts = 0
+
+    def _publish(self, context_id: str, snapshot: ContextSnapshot):
+        self.contexts[context_id] = snapshot
+        history = self._history.get(context_id)
+        if history is None:
+            history = self._history[context_id] = deque(maxlen=max(1, self.history_size))
+        history.append(snapshot)
+        # 历史版本同样驻留内存
+        self._resident[context_id] = resident_size(history)
+        self._touch(context_id)
+
+    def _touch(self, context_id: str):
+        self._recent[context_id] = None
+        self._recent.move_to_end(context_id)
+        if context_id in self._finished:
+            # 已结束的上下文从最后一次访问开始计算保留时间
+            self._finished[context_id] = time.monotonic()
+            self._finished.move_to_end(context_id)
+
+    def _track(self, context_id: str, handles: Iterable[SpilledValue]):
+        """记录上下文引用的 blob，每个上下文对同一个 blob 只持有一个引用"""
+        blobs = self._blobs.setdefault(context_id, {})
+        for spilled in handles:
+            if spilled.digest in blobs:
+                self.store.release(spilled)
+            else:
+                blobs[spilled.digest] = spilled
+
+    async def _spill_large(self, context_id: str, data: Mapping[str, Any]) -> Dict[str, Any]:
+        """把超过阈值的值写入磁盘，返回用磁盘句柄替换后的数据"""
+        large = {key: value for key, value in data.items() if value_size(value) > self.spill_threshold}
+        if not large:
+            return dict(data)
+        spilled = await asyncio.to_thread(lambda: {key: self.store.write(value) for key, value in large.items()})
+        if context_id not in self._locks:
+            # 写入期间上下文已被删除，归还刚取得的引用
+            for handle in spilled.values():
+                self.store.release(handle)
+            return dict(data)
+        self._track(context_id, spilled.values())
+        self.spilled_values += len(spilled)
+        return {**data, **spilled}
+
+    async def _spill_context(self, context_id: str):
+        """
+        把一个上下文所有驻留内存的值转存到磁盘，各历史版本中同一个值替换为同一个句柄。
+        快照不可变，转存后重新发布同版本号的快照；读取方已持有的旧快照不受影响，释放后其中的值随之回收。
+        """
+        lock = self._locks.get(context_id)
+        if lock is None:
+            return
+        async with lock:
+            history = self._history.get(context_id, ())
+            values = {}
+            for snapshot in history:
+                for value in snapshot._data.values():
+                    if value_size(value):
+                        values[id(value)] = value
+            if not values:
+                return
+            spilled = await asyncio.to_thread(
+                lambda: {key: self.store.write(value) for key, value in values.items()}
+            )
+            if context_id not in self.contexts:
+                # 写入期间上下文已被删除，归还刚取得的引用
+                for handle in spilled.values():
+                    self.store.release(handle)
+                return
+            self._track(context_id, spilled.values())
+            replaced = [
+                ContextSnapshot(
+                    {key: spilled.get(id(value), value) for key, value in snapshot._data.items()},
+                    snapshot.version,
+                )
+                for snapshot in history
+            ]
+            self._history[context_id] = deque(replaced, maxlen=history.maxlen)
+            self.contexts[context_id] = replaced[-1]
+            self.spilled_values += len(spilled)
+            self._resident[context_id] = 0
 
-    def __init__(self):
-        self.contexts: Dict[str, Dict[str, Any]] = {}  # 任务 ID -> 上下文数据
-        self.lock = asyncio.Lock()  # 保护并发访问上下文数据
+    async def _enforce_budget(self, keep: Optional[str] = None):
+        """驻留内存超过预算时，从最久未使用的上下文开始转存"""
+        if sum(self._resident.values()) <= self.memory_budget:
+            return
+        for context_id in list(self._recent):
+            if context_id == keep or not self._resident.get(context_id):
+                continue
+            await self._spill_context(context_id)
+            if sum(self._resident.values()) <= self.memory_budget:
+                return
+        # 其他上下文都已转存，仍超出预算时转存当前上下文
+        if keep is not None:
+            await self._spill_context(keep)
+
+    def _evict_finished(self):
+        """删除超过保留时间或超出数量上限的已结束上下文"""
+        now = time.monotonic()
+        evicted = 0
+        while self._finished:
+            context_id, finished_at = next(iter(self._finished.items()))
+            if now - finished_at < self.ttl and len(self._finished) <= self.max_finished:
+                break
+            self._drop(context_id)
+            evicted += 1
+        if evicted:
+            self.evicted_contexts += evicted
+            log_event("Context Evicted", f"删除 {evicted} 个已结束任务的上下文", self.store.stats())
+
+    def _drop(self, context_id: str):
+        self.contexts.pop(context_id, None)
+        self._history.pop(context_id, None)
+        self._locks.pop(context_id, None)
+        self._resident.pop(context_id, None)
+        self._recent.pop(context_id, None)
+        self._finished.pop(context_id, None)
+        for spilled in self._blobs.pop(context_id, {}).values():
+            self.store.release(spilled)
 
     async def create_context(self) -> str:
         """创建一个新的上下文"""
+        self._evict_finished()
         context_id = str(uuid.uuid4())
-        async with self.lock:
-            self.contexts[context_id] = {}
+        self._locks[context_id] = asyncio.Lock()
+        self._publish(context_id, EMPTY_CONTEXT)
         return context_id
 
-    async def get_context(self, context_id: str) -> Optional[Dict[str, Any]]:
-        """获取上下文数据"""
-        async with self.lock:
-            return self.contexts.get(context_id, {}).copy()
+    async def restore_context(self, context_id: str, data: Mapping[str, Any], version: int = 0):
+        """用检查点中的数据恢复上下文"""
+        self._evict_finished()
+        self._drop(context_id)
+        self._locks[context_id] = asyncio.Lock()
+        data = await self._spill_large(context_id, data)
+        self._publish(context_id, ContextSnapshot(data, version))
+        await self._enforce_budget(keep=context_id)
+
+    def has_context(self, context_id: str) -> bool:
+        return context_id in self.contexts
+
+    async def get_context(
+        self, context_id: str, version: Optional[int] = None
+    ) -> Optional[ContextSnapshot]:
+        """获取上下文的当前快照，指定 version 时从历史中查找该版本（已淘汰时返回 None）"""
+        if version is None:
+            snapshot = self.contexts.get(context_id)
+            if snapshot is None:
+                return EMPTY_CONTEXT
+            self._touch(context_id)
+            return snapshot.view()
+        for snapshot in self._history.get(context_id, ()):
+            if snapshot.version == version:
+                return snapshot.view()
+        return None
 
-    async def update_context(self, context_id: str, data: Dict[str, Any]):
-        """更新上下文数据"""
-        async with self.lock:
-            if context_id in self.contexts:
-                self.contexts[context_id].update(data)
+    async def update_context(self, context_id: str, data: Dict[str, Any]) -> Optional[int]:
+        """更新上下文数据，返回新版本号"""
+        lock = self._locks.get(context_id)
+        if lock is None:
+            return None
+        async with lock:
+            current = self.contexts.get(context_id)
+            if current is None:
+                return None
+            data = await self._spill_large(context_id, data)
+            if context_id not in self.contexts:
+                return None
+            snapshot = current.evolve(data)
+            self._publish(context_id, snapshot)
+        await self._enforce_budget(keep=context_id)
+        return snapshot.version
+
+    async def release_context(self, context_id: str):
+        """任务结束，上下文进入淘汰队列；保留期间仍可读取，重新处理任务时调用 reopen_context"""
+        if context_id not in self.contexts:
+            return
+        self._finished[context_id] = time.monotonic()
+        self._finished.move_to_end(context_id)
+        self._evict_finished()
+
+    async def reopen_context(self, context_id: str) -> bool:
+        """把上下文移出淘汰队列，返回上下文是否仍然存在"""
+        self._finished.pop(context_id, None)
+        return context_id in self.contexts
 
     async def delete_context(self, context_id: str):
         """删除上下文"""
-        async with self.lock:
-            if context_id in self.contexts:
-                del self.contexts[context_id]
+        self._drop(context_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "contexts": len(self.contexts),
+            "finished": len(self._finished),
+            "resident_bytes": sum(self._resident.values()),
+            "memory_budget": self.memory_budget,
+            "spilled_values": self.spilled_values,
+            "evicted_contexts": self.evicted_contexts,
+            **self.store.stats(),
+        }
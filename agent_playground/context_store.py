@@ -0,0 +1,99 @@
+import atexit
+import hashlib
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+CONTEXT_SPILL_DIR = os.getenv("CONTEXT_SPILL_DIR", "")  # 为空时使用临时目录，进程退出时删除
+CONTEXT_SPILL_THRESHOLD = int(os.getenv("CONTEXT_SPILL_THRESHOLD", str(32 * 1024)))  # 超过该大小（字节）的值写入磁盘
+CONTEXT_MEMORY_BUDGET = int(os.getenv("CONTEXT_MEMORY_BUDGET", str(64 * 1024 * 1024)))  # 所有上下文驻留内存的上限（字节）
+CONTEXT_TTL = float(os.getenv("CONTEXT_TTL", "3600"))  # 已结束任务的上下文在最后一次访问后保留的时间（秒）
+CONTEXT_MAX_FINISHED = int(os.getenv("CONTEXT_MAX_FINISHED", "1000"))  # 最多保留多少个已结束任务的上下文
+
+
+def value_size(value: Any) -> int:
+    """可转存的值（字符串和字节串）按长度估算的大小，其他类型和空值返回 0"""
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    return 0
+
+
+class SpilledValue:
+    """已转存到磁盘的上下文值，读取时通过内存映射按需加载"""
+
+    __slots__ = ("digest", "path", "is_text", "size")
+
+    def __init__(self, digest: str, path: str, is_text: bool, size: int):
+        self.digest = digest
+        self.path = path
+        self.is_text = is_text
+        self.size = size
+
+    def load(self) -> Any:
+        if self.size == 0:
+            # 空文件不能做内存映射
+            return "" if self.is_text else b""
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            if self.is_text:
+                return str(m, "utf-8")
+            return bytes(m)
+
+    def __repr__(self) -> str:
+        return f"SpilledValue({self.digest[:12]}, {self.size} bytes)"
+
+
+class BlobStore:
+    """
+    按内容寻址的磁盘 blob 存储，相同内容只写一次。
+    每个 blob 记录引用数，引用归零时删除文件。写入在线程中执行，引用计数和文件的创建、删除
+    在同一把锁内完成，并发写入相同内容时不会拿到一个刚被删除的文件。
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        if directory or CONTEXT_SPILL_DIR:
+            self.directory = directory or CONTEXT_SPILL_DIR
+            os.makedirs(self.directory, exist_ok=True)
+        else:
+            self.directory = tempfile.mkdtemp(prefix="context_blobs_")
+            atexit.register(shutil.rmtree, self.directory, True)
+        self._refs: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.bytes_on_disk = 0
+
+    def write(self, value: Any) -> SpilledValue:
+        """写入一个字符串或字节串，返回持有一个引用的磁盘句柄（在线程中调用）"""
+        is_text = isinstance(value, str)
+        data = value.encode("utf-8") if is_text else value
+        digest = hashlib.sha256(data).hexdigest()
+        path = os.path.join(self.directory, digest)
+        with self._lock:
+            refs = self._refs.get(digest, 0)
+            if refs == 0:
+                if not os.path.exists(path):
+                    tmp_path = f"{path}.tmp"
+                    with open(tmp_path, "wb") as f:
+                        f.write(data)
+                    os.replace(tmp_path, path)
+                self.bytes_on_disk += len(data)
+            self._refs[digest] = refs + 1
+        return SpilledValue(digest, path, is_text, len(data))
+
+    def release(self, spilled: SpilledValue):
+        """释放一个引用，最后一个引用释放时删除文件"""
+        with self._lock:
+            refs = self._refs.get(spilled.digest, 0) - 1
+            if refs > 0:
+                self._refs[spilled.digest] = refs
+                return
+            self._refs.pop(spilled.digest, None)
+            self.bytes_on_disk -= spilled.size
+            try:
+                os.remove(spilled.path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"directory": self.directory, "blobs": len(self._refs), "bytes_on_disk": self.bytes_on_disk}
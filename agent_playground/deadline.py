@@ -0,0 +1,95 @@
+# deadline.py
+import asyncio
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Iterator, Optional, TypeVar
+
+STEP_TIMEOUT = float(os.getenv("STEP_TIMEOUT", "300"))  # 单次执行任务步骤的超时（秒），0 表示不限制
+TASK_DEADLINE = float(os.getenv("TASK_DEADLINE", "0"))  # 整个任务的截止时间（秒），0 表示不限制
+LLM_TOKENS_PER_SECOND = float(os.getenv("LLM_TOKENS_PER_SECOND", "20"))  # 估算生成速度，用于把剩余时间换算为令牌数
+LLM_MIN_GENERATION_TOKENS = int(os.getenv("LLM_MIN_GENERATION_TOKENS", "64"))  # 生成长度下限，同时作为取整单位
+LLM_MAX_GENERATION_TOKENS = int(os.getenv("LLM_MAX_GENERATION_TOKENS", "2048"))  # 超过该长度时不限制生成
+
+T = TypeVar("T")
+
+
+class BudgetExhaustedError(Exception):
+    """时间预算已用完。不代表后端故障，不重试也不计入熔断"""
+
+
+class Budget:
+    """一次执行的时间预算，limited 表示是否因为预算不足缩短过生成长度"""
+
+    def __init__(self, deadline: float):
+        self.deadline = deadline
+        self.limited = False
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+
+_current_budget: contextvars.ContextVar[Optional[Budget]] = contextvars.ContextVar(
+    "current_budget", default=None
+)
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[Optional[Budget]]:
+    """
+    在当前上下文中设置剩余时间预算，嵌套时取更早的截止时间。
+    预算随 contextvars 传递到其中发起的 LLM 调用；seconds 为 None 时沿用外层预算。
+    """
+    parent = _current_budget.get()
+    if seconds is None:
+        yield parent
+        return
+    deadline = time.monotonic() + seconds
+    if parent is not None:
+        deadline = min(deadline, parent.deadline)
+    budget = Budget(deadline)
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+
+
+async def within_budget(awaitable: Awaitable[T]) -> T:
+    """在剩余预算内等待，预算用完时抛出 BudgetExhaustedError"""
+    timeout = remaining()
+    if timeout is None:
+        return await awaitable
+    if timeout <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise BudgetExhaustedError("执行预算已用完")
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        if remaining() > 0:
+            raise
+        raise BudgetExhaustedError(f"执行预算已用完（{timeout:.1f} 秒）") from None
+
+
+def remaining() -> Optional[float]:
+    """当前预算的剩余秒数，没有预算时返回 None"""
+    budget = _current_budget.get()
+    return budget.remaining() if budget is not None else None
+
+
+def generation_limit() -> Optional[int]:
+    """
+    按剩余时间估算本次调用最多生成多少令牌，预算充足或没有预算时返回 None。
+    结果按 LLM_MIN_GENERATION_TOKENS 向下取整，相近的预算得到相同的限制，便于命中缓存。
+    """
+    budget = _current_budget.get()
+    if budget is None:
+        return None
+    tokens = int(budget.remaining() * LLM_TOKENS_PER_SECOND)
+    if tokens >= LLM_MAX_GENERATION_TOKENS:
+        return None
+    budget.limited = True
+    unit = max(1, LLM_MIN_GENERATION_TOKENS)
+    return max(unit, tokens // unit * unit)
@@ -0,0 +1,78 @@
+import asyncio
+import json
+import os
+from typing import Dict, Optional
+
+from monitoring import log_event
+
+STEP_DURATION_PATH = os.getenv("STEP_DURATION_PATH", "step_durations.json")  # 为空时不持久化
+STEP_DURATION_SMOOTHING = float(os.getenv("STEP_DURATION_SMOOTHING", "0.3"))  # 新样本的权重
+STEP_DURATION_DEFAULT = float(os.getenv("STEP_DURATION_DEFAULT", "10"))  # 没有历史时的估计（秒）
+
+
+class DurationEstimator:
+    """
+    按角色估计任务步骤耗时。
+    用指数加权平均学习已完成步骤的实际耗时，并持久化到 JSON 文件，下次运行继续使用。
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = STEP_DURATION_PATH,
+        smoothing: float = STEP_DURATION_SMOOTHING,
+        default: float = STEP_DURATION_DEFAULT,
+    ):
+        self.path = path
+        self.smoothing = smoothing
+        self.default = default
+        self.durations: Dict[str, float] = {}
+        self.samples: Dict[str, int] = {}
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            log_event("Duration Load Failed", f"读取步骤耗时记录失败: {self.path}", {"error": str(e)})
+            return
+        for role, entry in data.items():
+            self.durations[role] = float(entry["duration"])
+            self.samples[role] = int(entry.get("samples", 0))
+
+    def estimate(self, role: str) -> float:
+        """角色的预计耗时，没有历史时使用已知角色的平均值或默认值"""
+        if role in self.durations:
+            return self.durations[role]
+        if self.durations:
+            return sum(self.durations.values()) / len(self.durations)
+        return self.default
+
+    def record(self, role: str, seconds: float):
+        """记录一次步骤的实际耗时"""
+        if role in self.durations:
+            self.durations[role] += self.smoothing * (seconds - self.durations[role])
+        else:
+            self.durations[role] = seconds
+        self.samples[role] = self.samples.get(role, 0) + 1
+        self._dirty = True
+
+    def _save(self, data: Dict[str, Dict[str, float]]):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    async def save(self):
+        """把有变化的估计写入文件，在线程中执行不阻塞事件循环"""
+        if not self.path or not self._dirty:
+            return
+        self._dirty = False
+        data = {
+            role: {"duration": duration, "samples": self.samples.get(role, 0)}
+            for role, duration in self.durations.items()
+        }
+        await asyncio.to_thread(self._save, data)
@@ -294,13 +294,12 @@ from agents.programmer import Programmer
 from agents.requirement_analyst import RequirementAnalyst
 from agents.system_architect import SystemArchitect
 from agents.tester import Tester
+from broker import BROKER_ADDRESS, BROKER_ENABLED, StepBroker
 from models.task import TaskStep
 from task_manager import TaskManager
 
 
-async def test_complex_task():
-    manager = TaskManager()
-
+async def test_complex_task(manager: TaskManager):
     # 注册 Agents
     analyst = RequirementAnalyst(name="Alice", role="RequirementAnalyst")
     architect = SystemArchitect(name="Bob", role="SystemArchitect")
@@ -316,6 +315,11 @@ async def test_complex_task():
     manager.register_agent(tester)
     manager.register_agent(devops)
 
+    # 上次运行中断的任务从检查点继续，只执行未完成的步骤，之后再处理本次的新任务
+    for task in await manager.resume_unfinished():
+        analyst.append_task_info(task.name)
+        await manager.process_task(task.task_id)
+
     # 创建更复杂的任务步骤
     step_req_analysis = TaskStep(
         name="分析用户故事", required_role="RequirementAnalyst"
@@ -387,5 +391,17 @@ async def test_complex_task():
     await manager.process_task(task.task_id)
 
 
+async def main():
+    manager = TaskManager()
+    # 开启 BROKER_ENABLED 后远程 Worker 可以连接进来，调度器像使用本地 Agent 一样把步骤派给它们
+    broker = StepBroker(manager)
+    if BROKER_ENABLED:
+        await broker.start(BROKER_ADDRESS)
+    try:
+        await test_complex_task(manager)
+    finally:
+        await broker.stop()
+
+
 if __name__ == "__main__":
-    asyncio.run(test_complex_task())
+    asyncio.run(main())
@@ -32,6 +32,8 @@ class TaskStep(BaseModel):
     dependencies: List[str] = []  # 依赖的任务步骤 ID
     result: Optional[Any] = None  # 执行结果
     assigned_agent_id: Optional[str] = None  # 执行该步骤的 Agent ID
+    timeout: Optional[float] = None  # 单次执行的超时（秒），为空时使用 STEP_TIMEOUT
+    context_version: Optional[int] = None  # 执行时读取的上下文版本
 
 
 # 任务模型
@@ -0,0 +1,25 @@
+# retry_policy.py
+import os
+
+from core_lab.llm.retry import Hedger, HedgerRegistry, RetryPolicy, is_retryable  # noqa: F401
+
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))  # 模型调用的总尝试次数
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))  # 退避基数（秒）
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "10"))  # 单次退避上限（秒）
+LLM_RETRY_DEADLINE = float(os.getenv("LLM_RETRY_DEADLINE", "600"))  # 总截止时间（秒），0 表示不限制
+LLM_HEDGING_ENABLED = os.getenv("LLM_HEDGING_ENABLED", "false").lower() == "true"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+
+# 按后端/模型划分的对冲器
+hedgers = HedgerRegistry(percentile=HEDGE_PERCENTILE, min_samples=HEDGE_MIN_SAMPLES)
+get_hedger = hedgers.get
+hedger_stats = hedgers.stats
+
+# 模型调用默认使用的重试策略
+llm_retry_policy = RetryPolicy(
+    max_attempts=LLM_MAX_RETRIES,
+    base_delay=LLM_RETRY_BASE_DELAY,
+    max_delay=LLM_RETRY_MAX_DELAY,
+    deadline=LLM_RETRY_DEADLINE or None,
+)
@@ -0,0 +1,210 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
+
+from agents.base import AgentBase
+from broker import WorkerLostError
+from models.task import Task, TaskStep, TaskStepStatus
+from monitoring import log_event
+from task_plan import TaskPlan
+
+if TYPE_CHECKING:
+    from task_manager import TaskManager
+
+
+class StepRetryError(Exception):
+    """步骤本次执行失败但还可以重试，调度器归还 Agent 并在 delay 秒后把步骤重新排队"""
+
+    def __init__(self, delay: float):
+        super().__init__(f"{delay:.2f} 秒后重试")
+        self.delay = delay
+
+
+class TaskRun:
+    """一个正在执行的任务在调度器中的状态"""
+
+    def __init__(self, task: Task, plan: TaskPlan, weight: float, priorities: Dict[str, float]):
+        self.task = task
+        self.plan = plan
+        self.weight = weight
+        self.priorities = priorities  # 步骤的剩余关键路径长度
+        self.finish_tag = 0.0  # 加权公平队列的虚拟完成时间
+        # 每个角色一个 (-优先级, 序号, step_id) 的堆
+        self.queues: Dict[str, List[Tuple[float, int, str]]] = {}
+        self.queued = 0
+        self.running = 0
+        self.delayed = 0  # 等待退避结束后重新排队的步骤数
+        self.done: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    @property
+    def finished(self) -> bool:
+        return self.queued == 0 and self.running == 0 and self.delayed == 0
+
+
+class Scheduler:
+    """
+    全局调度器：一个循环为所有进行中的任务分配 Agent。
+    同一角色有多个任务在等待时按加权公平队列（start-time fair queuing）选择任务，
+    每派发一个步骤，任务的虚拟时间增加 预计耗时 / 权重，虚拟时间最小的任务先得到 Agent；
+    任务内部按剩余关键路径长度选择步骤。大任务无法饿死小任务，吞吐随 Agent 数量扩展。
+    """
+
+    def __init__(self, manager: "TaskManager"):
+        self.manager = manager
+        self.runs: Dict[str, TaskRun] = {}
+        self.virtual_time = 0.0
+        self._sequence = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop_task: Optional[asyncio.Task] = None
+        self._step_tasks: Set[asyncio.Task] = set()
+
+    def wake(self):
+        """有新的可执行步骤或空闲 Agent 时唤醒调度循环"""
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def run_task(self, task: Task, plan: TaskPlan, weight: float = 1.0):
+        """提交任务并等待它的所有步骤执行结束"""
+        estimator = self.manager.duration_estimator
+        priorities = plan.critical_path(lambda step: estimator.estimate(step.required_role))
+        run = TaskRun(task, plan, weight, priorities)
+        # 新任务从当前虚拟时间开始，不会因为之前没有排队而获得额外份额
+        run.finish_tag = self.virtual_time
+        self.runs[task.task_id] = run
+        self._enqueue_ready(run)
+        if run.finished:
+            self.runs.pop(task.task_id, None)
+            return
+
+        if self._loop_task is None or self._loop_task.done():
+            self._wakeup = asyncio.Event()
+            self._loop_task = asyncio.create_task(self._loop())
+        self.wake()
+        try:
+            await run.done
+        finally:
+            self.runs.pop(task.task_id, None)
+            self.wake()
+
+    def _enqueue_ready(self, run: TaskRun):
+        """把依赖已完成的步骤放入任务的角色队列"""
+        pool = self.manager.agent_pool
+        while run.plan.ready:
+            step = run.task.steps[run.plan.ready.popleft()]
+            if not pool.has_role(step.required_role):
+                log_event(
+                    "Agent Not Found",
+                    f"没有找到合适的 Agent 执行 {step.name}，等待 {step.required_role} 注册",
+                )
+            heapq.heappush(
+                run.queues.setdefault(step.required_role, []),
+                (-run.priorities[step.step_id], next(self._sequence), step.step_id),
+            )
+            run.queued += 1
+
+    async def _loop(self):
+        while self.runs:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            self._dispatch()
+
+    def _dispatch(self):
+        """为每个有空闲 Agent 的角色派发步骤"""
+        pool = self.manager.agent_pool
+        roles = {role for run in self.runs.values() for role, queue in run.queues.items() if queue}
+        for role in roles:
+            while True:
+                candidates = [run for run in self.runs.values() if run.queues.get(role)]
+                if not candidates:
+                    break
+                agent = pool.try_acquire(role)
+                if agent is None:
+                    break
+                run = min(candidates, key=lambda run: max(run.finish_tag, self.virtual_time))
+                _, _, step_id = heapq.heappop(run.queues[role])
+                run.queued -= 1
+                run.running += 1
+
+                start_tag = max(run.finish_tag, self.virtual_time)
+                self.virtual_time = start_tag
+                run.finish_tag = start_tag + self.manager.duration_estimator.estimate(role) / run.weight
+
+                step_task = asyncio.create_task(self._execute(run, run.task.steps[step_id], agent))
+                self._step_tasks.add(step_task)
+                step_task.add_done_callback(self._step_tasks.discard)
+
+    async def _execute(self, run: TaskRun, step: TaskStep, agent: AgentBase):
+        """执行一个步骤，结束后归还 Agent、释放后继步骤并记录耗时"""
+        step.status = TaskStepStatus.ASSIGNED
+        step.assigned_agent_id = agent.agent_id
+        started_at = time.perf_counter()
+        try:
+            try:
+                executed = await self.manager.execute_task_step(run.task, step, agent)
+            except WorkerLostError as e:
+                # 执行该步骤的远程 Worker 已失联，步骤放回队列交给其他 Agent
+                self._requeue(run, step)
+                log_event("TaskStep Requeued", f"任务步骤 {step.name} 重新排队", {"error": str(e)})
+                return
+            except StepRetryError as e:
+                # Agent 已经归还，退避结束后步骤重新排队，期间 Agent 可以执行其他步骤
+                run.delayed += 1
+                asyncio.get_running_loop().call_later(e.delay, self._retry, run, step)
+                return
+            finally:
+                self.manager.agent_pool.release(agent)
+                run.running -= 1
+                self.wake()
+
+            if step.status == TaskStepStatus.COMPLETED:
+                if executed:
+                    # 复用历史结果的步骤不计入耗时估计
+                    self.manager.duration_estimator.record(step.required_role, time.perf_counter() - started_at)
+                run.plan.complete(step.step_id)
+                self._enqueue_ready(run)
+            else:
+                blocked = run.plan.descendants(step.step_id)
+                if blocked:
+                    log_event(
+                        "TaskStep Blocked",
+                        f"任务步骤 {step.name} 失败，{len(blocked)} 个后续步骤无法执行",
+                    )
+        except Exception as e:
+            # 意外的异常只让这个步骤失败，不能让等待任务结束的 process_task 永远挂起
+            step.status = TaskStepStatus.FAILED
+            log_event("TaskStep Error", f"任务步骤 {step.name} 执行出错", {"error": str(e)})
+        finally:
+            if run.finished and not run.done.done():
+                run.done.set_result(None)
+
+    def _requeue(self, run: TaskRun, step: TaskStep):
+        step.status = TaskStepStatus.PENDING
+        step.assigned_agent_id = None
+        heapq.heappush(
+            run.queues.setdefault(step.required_role, []),
+            (-run.priorities[step.step_id], next(self._sequence), step.step_id),
+        )
+        run.queued += 1
+
+    def _retry(self, run: TaskRun, step: TaskStep):
+        run.delayed -= 1
+        self._requeue(run, step)
+        self.wake()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "virtual_time": self.virtual_time,
+            "tasks": {
+                task_id: {
+                    "weight": run.weight,
+                    "queued": run.queued,
+                    "running": run.running,
+                    "delayed": run.delayed,
+                    "finish_tag": run.finish_tag,
+                }
+                for task_id, run in self.runs.items()
+            },
+            "agents": self.manager.agent_pool.stats(),
+        }
@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from agents.base import AgentBase
+from models.task import TaskStep
+from monitoring import log_event
+
+STEP_MEMO_ENABLED = os.getenv("STEP_MEMO_ENABLED", "true").lower() == "true"
+STEP_MEMO_PATH = os.getenv("STEP_MEMO_PATH", "step_memo.db")  # 为空时不复用步骤结果
+STEP_MEMO_CANDIDATES = int(os.getenv("STEP_MEMO_CANDIDATES", "8"))  # 每个步骤比对的历史记录数
+
+# 不影响步骤输出的 Agent 字段；worker_id 和 fingerprint 属于 broker.RemoteAgent
+AGENT_RUNTIME_FIELDS = {"agent_id", "name", "status", "worker_id", "fingerprint"}
+
+
+def _digest(value: Any) -> str:
+    raw = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def agent_fingerprint(agent: AgentBase) -> Dict[str, Any]:
+    """
+    Agent 影响输出的配置：角色、系统提示词、模型、需求描述等可序列化字段，
+    以及使用的 LLM 后端。名称、ID 和状态不参与计算。
+    远程 Agent 使用 Worker 上报的指纹，与同样配置的本地 Agent 一致。
+    """
+    reported = getattr(agent, "fingerprint", None)
+    if reported:
+        return dict(reported)
+    fingerprint: Dict[str, Any] = {"class": type(agent).__name__}
+    for field in type(agent).model_fields:
+        if field in AGENT_RUNTIME_FIELDS:
+            continue
+        value = getattr(agent, field)
+        if value is None or isinstance(value, (str, int, float, bool, list, dict)):
+            fingerprint[field] = value
+    backend = getattr(getattr(agent, "llm_client", None), "backend", None)
+    if backend is not None:
+        fingerprint["backend"] = backend.name
+    return fingerprint
+
+
+class RecordingContext(Mapping):
+    """包装上下文快照并记录 Agent 读取了哪些键；遍历整个上下文时视为全部读取"""
+
+    def __init__(self, data: Mapping[str, Any]):
+        self.data = data
+        self.reads: set = set()
+        self.read_all = False
+
+    def __getitem__(self, key):
+        self.reads.add(key)
+        return self.data[key]
+
+    def __contains__(self, key):
+        self.reads.add(key)
+        return key in self.data
+
+    def __iter__(self):
+        self.read_all = True
+        return iter(self.data)
+
+    def __len__(self):
+        self.read_all = True
+        return len(self.data)
+
+    def read_keys(self) -> Optional[List[str]]:
+        """读取的键，None 表示读取了整个上下文"""
+        return None if self.read_all else sorted(self.reads, key=str)
+
+
+class StepMemo:
+    """
+    按内容寻址的步骤结果存储，类似构建系统的增量编译。
+    步骤的输入由两部分组成：角色、步骤名和 Agent 配置组成的静态键，以及步骤实际读取的上下文键的值。
+    读取哪些键只有执行后才知道，因此每条记录同时保存读取的键列表，查找时按列表重新计算输入哈希。
+    上游步骤结果不变时下游命中缓存，上游结果变化时读取它的下游步骤自然失效。
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = STEP_MEMO_PATH,
+        enabled: bool = STEP_MEMO_ENABLED,
+        candidates: int = STEP_MEMO_CANDIDATES,
+    ):
+        self.path = path if enabled else None
+        self.candidates = candidates
+        self.hits = 0
+        self.misses = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def static_key(self, step: TaskStep, agent: AgentBase) -> str:
+        return _digest({"role": step.required_role, "step": step.name, "agent": agent_fingerprint(agent)})
+
+    @staticmethod
+    def input_key(static_key: str, context: Mapping[str, Any], reads: Optional[Iterable[str]]) -> str:
+        if reads is None:
+            values = dict(context)
+        else:
+            # 缺失的键同样参与计算，之后出现该键时输入随之变化
+            values = {key: context.get(key) for key in reads}
+            values["__missing__"] = sorted(key for key in reads if key not in context)
+        return _digest({"static": static_key, "context": values})
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS step_memo ("
+                "input_key TEXT PRIMARY KEY, static_key TEXT NOT NULL, "
+                "reads TEXT, result TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_step_memo_static ON step_memo (static_key, created_at)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _lookup(self, static_key: str, context: Mapping[str, Any]) -> Tuple[bool, Any]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT input_key, reads, result FROM step_memo WHERE static_key = ? "
+                "ORDER BY created_at DESC LIMIT ?",
+                (static_key, self.candidates),
+            ).fetchall()
+        for input_key, reads, result in rows:
+            if self.input_key(static_key, context, json.loads(reads)) == input_key:
+                return True, json.loads(result)
+        return False, None
+
+    def _store(self, static_key: str, input_key: str, reads: Optional[List[str]], result: Any):
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO step_memo (input_key, static_key, reads, result, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (input_key, static_key, json.dumps(reads), json.dumps(result, ensure_ascii=False, default=str),
+                 time.time()),
+            )
+            conn.commit()
+
+    async def lookup(self, static_key: str, context: Mapping[str, Any]) -> Tuple[bool, Any]:
+        """查找输入相同的历史结果，返回 (是否命中, 结果)"""
+        if not self.enabled:
+            return False, None
+        try:
+            hit, result = await asyncio.to_thread(self._lookup, static_key, context)
+        except (sqlite3.Error, OSError, ValueError) as e:
+            log_event("Step Memo Failed", f"读取步骤结果失败: {self.path}", {"error": str(e)})
+            return False, None
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return hit, result
+
+    async def store(self, static_key: str, context: RecordingContext, result: Any):
+        """保存步骤结果以及它读取的上下文键"""
+        if not self.enabled or result is None:
+            return
+        reads = context.read_keys()
+        input_key = self.input_key(static_key, context.data, reads)
+        try:
+            await asyncio.to_thread(self._store, static_key, input_key, reads, result)
+        except (sqlite3.Error, OSError) as e:
+            log_event("Step Memo Failed", f"保存步骤结果失败: {self.path}", {"error": str(e)})
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": self.path, "hits": self.hits, "misses": self.misses}
@@ -1,14 +1,45 @@
-import asyncio
-from typing import Dict, Optional
+import time
+from typing import Dict, List, Optional
 
+from agent_pool import AgentPool
 from agents.base import AgentBase
+from broker import WorkerLostError
+from checkpoint import TaskCheckpoint
 from context_manager import ContextManager  # 引入 ContextManager
+from deadline import STEP_TIMEOUT, TASK_DEADLINE, deadline_scope, within_budget
+from duration_estimator import DurationEstimator
 from models.agent import Agent
 from models.task import Task, TaskStatus, TaskStep, TaskStepStatus
 from monitoring import log_event
+from retry_policy import RetryPolicy
+from scheduler import Scheduler, StepRetryError
+from step_memo import RecordingContext, StepMemo
+from task_plan import TaskPlan
 
 MAX_RETRIES = 3  # 最大重试次数
-RETRY_DELAY = 2  # 每次重试的间隔时间（秒）
+RETRY_DELAY = 2  # 重试退避的基数（秒），实际等待时间按指数增长并加入随机抖动
+
+# 步骤失败的原因多种多样（包括 LLM 返回空结果和超时），因此所有异常都重试；
+# 远程 Worker 失联时由调度器把步骤立即重新排队给其他 Agent，不计入重试次数
+STEP_RETRY_POLICY = RetryPolicy(
+    max_attempts=MAX_RETRIES,
+    base_delay=RETRY_DELAY,
+    max_delay=30,
+    retry_on=lambda exc: not isinstance(exc, WorkerLostError),
+)
+
+
+def step_retry_policy(deadline: Optional[float]) -> RetryPolicy:
+    """任务设置了截止时间时，重试不能超过剩余时间"""
+    if deadline is None:
+        return STEP_RETRY_POLICY
+    return RetryPolicy(
+        max_attempts=STEP_RETRY_POLICY.max_attempts,
+        base_delay=STEP_RETRY_POLICY.base_delay,
+        max_delay=STEP_RETRY_POLICY.max_delay,
+        deadline=deadline - time.monotonic(),
+        retry_on=STEP_RETRY_POLICY.retry_on,
+    )
 
 
 class TaskManager:
@@ -16,108 +47,199 @@ class TaskManager:
 
     def __init__(self):
         self.tasks: Dict[str, Task] = {}  # 存储所有任务
-        self.agents: Dict[str, AgentBase] = {}  # 存储所有注册的 Agent
+        self.agent_pool = AgentPool()  # 按角色索引的 Agent 池
+        self.agents: Dict[str, AgentBase] = self.agent_pool.agents  # 存储所有注册的 Agent
+        self.plans: Dict[str, TaskPlan] = {}  # 任务编译后的步骤依赖图
+        self.deadlines: Dict[str, float] = {}  # 任务 ID -> 截止时间（time.monotonic）
+        self.step_attempts: Dict[str, int] = {}  # 步骤 ID -> 已失败的执行次数
         self.context_manager = ContextManager()  # 添加上下文管理器
+        self.duration_estimator = DurationEstimator()  # 按角色估计步骤耗时
+        self.scheduler = Scheduler(self)  # 所有任务共用的调度器
+        self.checkpoint = TaskCheckpoint()  # 任务检查点，进程退出后可以恢复
+        self.step_memo = StepMemo()  # 输入未变化的步骤直接复用历史结果
 
     def register_agent(self, agent: AgentBase):
-        """注册 Agent"""
-        self.agents[agent.agent_id] = agent
+        """注册 Agent，等待该角色的步骤会立即被唤醒"""
+        self.agent_pool.register(agent)
+        self.scheduler.wake()
         log_event("Agent Registered", f"Agent {agent.name} ({agent.role}) 已注册")
 
     async def create_task(self, name: str, steps: Dict[str, TaskStep]) -> Task:
-        """创建任务，并分配上下文"""
+        """创建任务，并分配上下文；步骤依赖无效时抛出 TaskPlanError"""
+        plan = TaskPlan(steps)
         context_id = await self.context_manager.create_context()
         task = Task(name=name, steps=steps, context_id=context_id)
         self.tasks[task.task_id] = task
-        log_event("Task Created", f"任务 {task.name} (ID: {task.task_id}) 创建成功")
+        self.plans[task.task_id] = plan
+        self.checkpoint.save_task(task, {})
+        log_event(
+            "Task Created",
+            f"任务 {task.name} (ID: {task.task_id}) 创建成功",
+            {"steps": len(steps), "depth": plan.depth},
+        )
         return task
 
-    async def process_task(self, task_id: str):
-        """处理任务调度，确保任务步骤的依赖顺序"""
-        task = self.tasks.get(task_id)
+    async def resume_task(self, task_id: str) -> Optional[Task]:
+        """从检查点恢复任务和上下文，未完成的步骤重置为等待执行，之后用 process_task 继续"""
+        state = await self.checkpoint.load(task_id)
+        if state is None:
+            log_event("Task Not Found", f"没有找到任务 {task_id} 的检查点", {"task_id": task_id})
+            return None
+
+        task, context = state
+        for step in task.steps.values():
+            if step.status != TaskStepStatus.COMPLETED:
+                step.status = TaskStepStatus.PENDING
+                step.assigned_agent_id = None
+        await self.context_manager.restore_context(task.context_id, context, context.version)
+        self.tasks[task.task_id] = task
+        self.plans[task.task_id] = TaskPlan(task.steps)
+        completed = sum(1 for step in task.steps.values() if step.status == TaskStepStatus.COMPLETED)
+        log_event(
+            "Task Resumed",
+            f"任务 {task.name} (ID: {task.task_id}) 已从检查点恢复",
+            {"completed": completed, "steps": len(task.steps)},
+        )
+        return task
+
+    async def resume_unfinished(self) -> List[Task]:
+        """恢复检查点中所有未完成的任务"""
+        tasks = []
+        for task_id in await self.checkpoint.unfinished():
+            task = await self.resume_task(task_id)
+            if task:
+                tasks.append(task)
+        return tasks
+
+    async def process_task(self, task_id: str, weight: float = 1.0, deadline: Optional[float] = None):
+        """
+        处理任务直到所有步骤结束。步骤由全局调度器统一派发：依赖全部完成的步骤立即进入
+        对应角色的队列，多个任务并发处理时按 weight 加权公平地分享 Agent，
+        任务内部按剩余关键路径长度优先执行卡住后续步骤最久的链。
+        deadline 为整个任务的截止时间（秒），默认使用 TASK_DEADLINE，到期后未开始的步骤直接失败。
+        处理结束的任务不再常驻内存。完成的任务删除检查点，失败的任务按 CHECKPOINT_KEEP_FAILED
+        保留检查点，再次处理时从检查点恢复。
+        """
+        task = self.tasks.get(task_id) or await self.resume_task(task_id)
         if not task:
-            log_event("Task Not Found", f"任务 {task_id} 未找到", {"task_id": task_id})
             return
 
         log_event("Task Processing", f"开始处理任务: {task.name}")
-
-        while task.status in [TaskStatus.PENDING, TaskStatus.IN_PROGRESS]:
-            next_step = self._find_next_step(task)
-            if not next_step:
-                break  # 没有可执行的步骤，可能任务完成或被阻塞
-
-            agent = self._find_suitable_agent(next_step.required_role)
-            if agent:
-                await self.execute_task_step(task, next_step, agent)
-            else:
-                log_event(
-                    "Agent Not Found", f"没有找到合适的 Agent 执行 {next_step.name}"
-                )
-                await asyncio.sleep(2)  # 等待 Agent 空闲
-
-        log_event("Task Completed", f"任务 {task.name} 处理完成")
-
-    async def execute_task_step(self, task: Task, step: TaskStep, agent: AgentBase):
-        """分配任务步骤给 Agent 并执行，同时支持错误重试"""
+        await self.context_manager.reopen_context(task.context_id)
+        plan = self.plans.get(task_id)
+        if plan is None:
+            plan = self.plans[task_id] = TaskPlan(task.steps)
+        task.status = TaskStatus.IN_PROGRESS
+        self.checkpoint.record_status(task)
+        deadline = deadline or TASK_DEADLINE
+        if deadline:
+            self.deadlines[task_id] = time.monotonic() + deadline
+
+        try:
+            await self.scheduler.run_task(task, plan, weight)
+        finally:
+            self.deadlines.pop(task_id, None)
+
+        if all(step.status == TaskStepStatus.COMPLETED for step in task.steps.values()):
+            task.status = TaskStatus.COMPLETED
+        else:
+            task.status = TaskStatus.FAILED
+        self.checkpoint.record_status(task)
+        # 步骤结果引用的值和上下文相同，任务留在内存中时上下文转存到磁盘也释放不了内存
+        self.tasks.pop(task_id, None)
+        self.plans.pop(task_id, None)
+        await self.context_manager.release_context(task.context_id)
+        await self.duration_estimator.save()
+        await self.checkpoint.flush()
+        log_event("Task Completed", f"任务 {task.name} 处理完成", {"status": task.status})
+
+    async def _complete_step(self, task: Task, step: TaskStep, result):
+        step.result = result
+        step.status = TaskStepStatus.COMPLETED
+
+        # 更新上下文
+        if isinstance(result, dict):
+            await self.context_manager.update_context(task.context_id, result)
+        self.checkpoint.record_step(
+            task, step, await self.context_manager.get_context(task.context_id)
+        )
+
+    async def execute_task_step(self, task: Task, step: TaskStep, agent: AgentBase) -> bool:
+        """
+        分配任务步骤给 Agent 并执行一次。
+        执行不超过步骤超时和任务剩余时间，剩余时间通过 deadline_scope 传给 LLM 调用以缩短生成长度。
+        失败（包括超时）且按重试策略还可以重试时抛出 StepRetryError，由调度器归还 Agent、
+        等待退避时间后重新排队，退避期间不占用 Agent。
+        输入（角色、步骤名、Agent 配置和读取的上下文）与历史记录相同时直接复用结果，此时返回 False。
+        """
         step.status = TaskStepStatus.RUNNING
         step.assigned_agent_id = agent.agent_id
-        agent.status = "busy"
+
+        task_deadline = self.deadlines.get(task.task_id)
+        if task_deadline is not None and task_deadline <= time.monotonic():
+            step.status = TaskStepStatus.FAILED
+            self.step_attempts.pop(step.step_id, None)
+            log_event("TaskStep Deadline Exceeded", f"任务 {task.name} 已超过截止时间，跳过 {step.name}")
+            return False
 
         context = await self.context_manager.get_context(task.context_id)
+        step.context_version = context.version
+        memo_key = self.step_memo.static_key(step, agent)
+        hit, result = await self.step_memo.lookup(memo_key, context)
+        if hit:
+            self.step_attempts.pop(step.step_id, None)
+            await self._complete_step(task, step, result)
+            log_event("TaskStep Reused", f"任务步骤 {step.name} 输入未变化，复用历史结果")
+            return False
+
+        context = RecordingContext(context)
+        attempt = self.step_attempts.get(step.step_id, 0) + 1
         log_event("TaskStep Started", f"Agent {agent.name} 开始执行 {step.name}")
 
-        for attempt in range(1, MAX_RETRIES + 1):
-            try:
-                result = await agent.execute_task(step, context)
-                step.result = result
-                step.status = TaskStepStatus.COMPLETED
-
-                # 更新上下文
-                if isinstance(result, dict):
-                    await self.context_manager.update_context(task.context_id, result)
-
+        limits = []
+        if step.timeout or STEP_TIMEOUT:
+            limits.append(step.timeout or STEP_TIMEOUT)
+        if task_deadline is not None:
+            limits.append(task_deadline - time.monotonic())
+        try:
+            with deadline_scope(min(limits) if limits else None) as budget:
+                result = await within_budget(agent.execute_task(step, context))
+        except WorkerLostError:
+            step.status = TaskStepStatus.PENDING
+            raise
+        except Exception as e:
+            log_event(
+                "TaskStep Failed",
+                f"任务步骤 {step.name} 第 {attempt} 次执行失败",
+                {"error": str(e)},
+            )
+            delay = step_retry_policy(task_deadline).next_delay(attempt, e)
+            if delay is not None:
+                self.step_attempts[step.step_id] = attempt
+                step.status = TaskStepStatus.PENDING
                 log_event(
-                    "TaskStep Completed",
-                    f"任务步骤 {step.name} 执行完成",
-                    {"result": result},
+                    "TaskStep Retry",
+                    f"任务步骤 {step.name} 将在 {delay:.2f} 秒后重试 ({attempt}/{MAX_RETRIES})",
                 )
-                break  # 执行成功，跳出循环
-
-            except Exception as e:
-                log_event(
-                    "TaskStep Failed",
-                    f"任务步骤 {step.name} 第 {attempt} 次执行失败",
-                    {"error": str(e)},
-                )
-                if attempt < MAX_RETRIES:
-                    log_event(
-                        "TaskStep Retry",
-                        f"任务步骤 {step.name} 将在 {RETRY_DELAY} 秒后重试 ({attempt}/{MAX_RETRIES})",
-                    )
-                    await asyncio.sleep(RETRY_DELAY)
-                else:
-                    step.status = TaskStepStatus.FAILED
-                    log_event(
-                        "TaskStep Gave Up", f"任务步骤 {step.name} 多次失败，放弃执行"
-                    )
-
-        agent.status = "idle"
-
-    def _find_next_step(self, task: Task) -> Optional[TaskStep]:
-        """查找下一个可执行的任务步骤（确保所有依赖已完成）"""
-        for step in task.steps.values():
-            if step.status == TaskStepStatus.PENDING:
-                # 检查所有依赖步骤是否都已完成
-                if all(
-                    task.steps[dep].status == TaskStepStatus.COMPLETED
-                    for dep in step.dependencies
-                ):
-                    return step
-        return None
-
-    def _find_suitable_agent(self, required_role: str) -> Optional[AgentBase]:
-        """查找一个合适的 Agent"""
-        for agent in self.agents.values():
-            if agent.role == required_role and agent.status == "idle":
-                return agent
-        return None
+                raise StepRetryError(delay) from e
+            self.step_attempts.pop(step.step_id, None)
+            step.status = TaskStepStatus.FAILED
+            log_event(
+                "TaskStep Gave Up",
+                f"任务步骤 {step.name} 多次失败，放弃执行",
+                {"error": str(e)},
+            )
+            return True
+
+        self.step_attempts.pop(step.step_id, None)
+        await self._complete_step(task, step, result)
+        if not (budget and budget.limited):
+            # 因预算不足缩短过生成长度的结果不完整，不作为历史结果复用
+            await self.step_memo.store(memo_key, context, result)
+
+        log_event(
+            "TaskStep Completed",
+            f"任务步骤 {step.name} 执行完成",
+            {"result": result},
+        )
+        return True
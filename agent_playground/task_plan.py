@@ -0,0 +1,109 @@
+from collections import deque
+from typing import Callable, Deque, Dict, List
+
+from models.task import TaskStep, TaskStepStatus
+
+
+class TaskPlanError(ValueError):
+    """任务步骤依赖图无效：依赖不存在或存在环"""
+
+
+class TaskPlan:
+    """
+    编译后的任务步骤依赖图。
+    创建任务时校验一次依赖并计算拓扑层级，执行过程中用入度计数器维护可执行步骤，
+    完成一个步骤只需要遍历它的后继，调度开销与步骤总数无关。
+    """
+
+    def __init__(self, steps: Dict[str, TaskStep]):
+        self.steps = steps
+        self.dependents: Dict[str, List[str]] = {step_id: [] for step_id in steps}
+        self.indegree: Dict[str, int] = {}  # 尚未完成的依赖数
+        self.ready: Deque[str] = deque()  # 依赖已全部完成、等待执行的步骤
+
+        for step_id, step in steps.items():
+            dependencies = list(dict.fromkeys(step.dependencies))  # 去重并保持顺序
+            for dep in dependencies:
+                if dep not in steps:
+                    raise TaskPlanError(f"步骤 {step.name} 依赖的步骤 {dep} 不存在")
+                if dep == step_id:
+                    raise TaskPlanError(f"步骤 {step.name} 依赖自身")
+                self.dependents[dep].append(step_id)
+            self.indegree[step_id] = sum(
+                1 for dep in dependencies if steps[dep].status != TaskStepStatus.COMPLETED
+            )
+
+        self.order: List[str] = []  # 拓扑序
+        self.levels = self._compute_levels()
+        for step_id, step in steps.items():
+            if step.status == TaskStepStatus.PENDING and self.indegree[step_id] == 0:
+                self.ready.append(step_id)
+
+    def _compute_levels(self) -> Dict[str, int]:
+        """按 Kahn 算法计算拓扑层级，无依赖的步骤为第 0 层"""
+        remaining = {step_id: len(set(step.dependencies)) for step_id, step in self.steps.items()}
+        levels = {step_id: 0 for step_id in self.steps}
+        queue = deque(step_id for step_id, count in remaining.items() if count == 0)
+        visited = 0
+        while queue:
+            step_id = queue.popleft()
+            self.order.append(step_id)
+            visited += 1
+            for dependent in self.dependents[step_id]:
+                levels[dependent] = max(levels[dependent], levels[step_id] + 1)
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    queue.append(dependent)
+
+        if visited < len(self.steps):
+            cycle = self._find_cycle({step_id for step_id, count in remaining.items() if count > 0})
+            names = " -> ".join(self.steps[step_id].name for step_id in cycle)
+            raise TaskPlanError(f"任务步骤存在循环依赖: {names}")
+        return levels
+
+    def _find_cycle(self, remaining: set) -> List[str]:
+        """在未能排序的步骤中找出一个环：沿着未完成的依赖回溯，直到遇到走过的步骤"""
+        path: List[str] = []
+        position: Dict[str, int] = {}
+        step_id = next(iter(remaining))
+        while step_id not in position:
+            position[step_id] = len(path)
+            path.append(step_id)
+            step_id = next(dep for dep in self.steps[step_id].dependencies if dep in remaining)
+        cycle = path[position[step_id]:]
+        cycle.reverse()  # 按执行顺序展示
+        return cycle + [cycle[0]]
+
+    @property
+    def depth(self) -> int:
+        """拓扑层数，即关键路径上的步骤数"""
+        return max(self.levels.values(), default=-1) + 1
+
+    def critical_path(self, duration: Callable[[TaskStep], float]) -> Dict[str, float]:
+        """每个步骤到终点的最长剩余耗时（含自身），越大越应该优先执行"""
+        remaining: Dict[str, float] = {}
+        for step_id in reversed(self.order):
+            tail = max((remaining[dependent] for dependent in self.dependents[step_id]), default=0.0)
+            remaining[step_id] = duration(self.steps[step_id]) + tail
+        return remaining
+
+    def complete(self, step_id: str) -> List[str]:
+        """标记步骤完成，返回因此变为可执行的后继步骤"""
+        released = []
+        for dependent in self.dependents[step_id]:
+            self.indegree[dependent] -= 1
+            if self.indegree[dependent] == 0 and self.steps[dependent].status == TaskStepStatus.PENDING:
+                self.ready.append(dependent)
+                released.append(dependent)
+        return released
+
+    def descendants(self, step_id: str) -> List[str]:
+        """所有直接或间接依赖该步骤的步骤"""
+        seen = set()
+        stack = list(self.dependents[step_id])
+        while stack:
+            current = stack.pop()
+            if current not in seen:
+                seen.add(current)
+                stack.extend(self.dependents[current])
+        return list(seen)
@@ -0,0 +1,62 @@
+import os
+import sys
+import unittest
+from typing import Any, Dict, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# 未安装 core_lab 时直接使用仓库根目录下的源码
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+
+from agent_pool import AgentPool
+from agents.base import AgentBase
+from models.agent import AgentStatus
+from models.task import TaskStep
+
+
+class _IdleAgent(AgentBase):
+    async def execute_task(self, task_step: TaskStep, context: Optional[Dict[str, Any]] = None) -> Any:
+        return None
+
+
+class TestAgentPool(unittest.TestCase):
+    def test_checkout_by_role(self):
+        """测试按角色取用和归还 Agent"""
+        pool = AgentPool()
+        first = _IdleAgent(name="p1", role="Programmer")
+        second = _IdleAgent(name="p2", role="Programmer")
+        tester = _IdleAgent(name="t1", role="Tester")
+        for agent in (first, second, tester):
+            pool.register(agent)
+        pool.register(first)  # 重复注册不会多出一个空闲 Agent
+
+        # 同一角色按注册顺序取用，取完后返回 None，不影响其他角色
+        self.assertIs(pool.try_acquire("Programmer"), first)
+        self.assertIs(pool.try_acquire("Programmer"), second)
+        self.assertIsNone(pool.try_acquire("Programmer"))
+        self.assertEqual(first.status, AgentStatus.BUSY)
+        self.assertIs(pool.try_acquire("Tester"), tester)
+        self.assertIsNone(pool.try_acquire("Architect"))
+
+        pool.release(second)
+        self.assertEqual(second.status, AgentStatus.IDLE)
+        self.assertEqual(pool.stats()["Programmer"], {"agents": 2, "idle": 1})
+        self.assertIs(pool.try_acquire("Programmer"), second)
+
+    def test_unregister(self):
+        """测试注销的 Agent 不再被取用，执行中注销的 Agent 归还时不放回池中"""
+        pool = AgentPool()
+        idle = _IdleAgent(name="idle", role="Programmer")
+        busy = _IdleAgent(name="busy", role="Programmer")
+        pool.register(busy)
+        pool.register(idle)
+        self.assertIs(pool.try_acquire("Programmer"), busy)
+
+        pool.unregister(idle)
+        pool.unregister(busy)
+        pool.release(busy)
+        self.assertFalse(pool.has_role("Programmer"))
+        self.assertIsNone(pool.try_acquire("Programmer"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+from typing import Any, Dict, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# 未安装 core_lab 时直接使用仓库根目录下的源码
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+
+from pydantic import PrivateAttr
+
+from agent_pool import AgentPool
+from agents.base import AgentBase
+from broker import RemoteAgent, StepBroker, WorkerLostError
+from models.task import TaskStep
+from step_memo import StepMemo, agent_fingerprint
+from worker import Worker
+
+
+class _Manager:
+    """只提供 Broker 用到的 Agent 池"""
+
+    def __init__(self):
+        self.agent_pool = AgentPool()
+
+    def register_agent(self, agent: AgentBase):
+        self.agent_pool.register(agent)
+
+
+class _EchoAgent(AgentBase):
+    """名为 slow 的步骤一直等待直到被取消，其余步骤回显上下文"""
+
+    _cancelled: Any = PrivateAttr(default_factory=asyncio.Event)
+
+    async def execute_task(self, task_step: TaskStep, context: Optional[Dict[str, Any]] = None) -> Any:
+        if task_step.name == "slow":
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                self._cancelled.set()
+                raise
+        return {"echo": (context or {}).get("x")}
+
+
+class TestStepBroker(unittest.TestCase):
+    async def start(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.address = f"unix://{os.path.join(self.tmpdir.name, 'broker.sock')}"
+        self.manager = _Manager()
+        self.broker = StepBroker(self.manager)
+        await self.broker.start(self.address)
+        self.agent = _EchoAgent(name="local", role="Programmer")
+        self.worker_task = asyncio.create_task(Worker([self.agent], name="node", address=self.address).run())
+        for _ in range(200):
+            if self.manager.agent_pool.has_role("Programmer"):
+                break
+            await asyncio.sleep(0.01)
+        remote = self.manager.agent_pool.try_acquire("Programmer")
+        self.assertIsInstance(remote, RemoteAgent)
+        return remote
+
+    async def stop(self):
+        self.worker_task.cancel()
+        await self.broker.stop()
+        self.tmpdir.cleanup()
+
+    async def async_test_execute_and_cancel(self):
+        remote = await self.start()
+        try:
+            step = TaskStep(name="fast", required_role="Programmer")
+            self.assertEqual(await remote.execute_task(step, {"x": 1}), {"echo": 1})
+
+            # Broker 一侧超时后 Worker 上的执行被取消
+            slow = TaskStep(name="slow", required_role="Programmer")
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(remote.execute_task(slow, {}), 0.05)
+            await asyncio.wait_for(self.agent._cancelled.wait(), 1)
+
+            # 早先一次执行的迟到结果不会被当成本次执行的结果
+            self.agent._cancelled.clear()
+            retry = asyncio.create_task(remote.execute_task(slow, {}))
+            await asyncio.sleep(0.05)
+            connection = next(iter(self.broker.workers.values()))
+            self.assertEqual(len(connection.pending), 1)
+            self.broker._on_message(
+                connection, {"type": "result", "step_id": slow.step_id, "attempt": "stale", "result": "late"}
+            )
+            await asyncio.sleep(0.01)
+            self.assertFalse(retry.done())
+            retry.cancel()
+            await asyncio.wait_for(self.agent._cancelled.wait(), 1)
+        finally:
+            await self.stop()
+
+    def test_execute_and_cancel(self):
+        """测试步骤结果回传、超时取消和按执行编号匹配结果"""
+        asyncio.run(self.async_test_execute_and_cancel())
+
+    async def async_test_worker_lost(self):
+        remote = await self.start()
+        try:
+            pending = asyncio.create_task(remote.execute_task(TaskStep(name="slow", required_role="Programmer"), {}))
+            await asyncio.sleep(0.05)
+            # Worker 断开后正在执行的步骤以 WorkerLostError 结束，Agent 从池中注销
+            self.worker_task.cancel()
+            with self.assertRaises(WorkerLostError):
+                await asyncio.wait_for(pending, 1)
+            self.assertFalse(self.manager.agent_pool.has_role("Programmer"))
+        finally:
+            await self.stop()
+
+    def test_worker_lost(self):
+        """测试 Worker 断开时步骤重新排队"""
+        asyncio.run(self.async_test_worker_lost())
+
+    async def async_test_handshake(self):
+        remote = await self.start()
+        try:
+            # 无效的握手消息只关闭这条连接
+            reader, writer = await asyncio.open_unix_connection(self.address[len("unix://"):])
+            writer.write(b"not json\n")
+            await writer.drain()
+            self.assertEqual(await asyncio.wait_for(reader.read(), 1), b"")
+            writer.close()
+            step = TaskStep(name="fast", required_role="Programmer")
+            self.assertEqual(await remote.execute_task(step, {"x": 2}), {"echo": 2})
+
+            # 远程 Agent 的指纹与 Worker 上的本地 Agent 一致，不随 worker_id 变化
+            self.assertEqual(agent_fingerprint(remote), agent_fingerprint(self.agent))
+            memo = StepMemo(path="")
+            self.assertEqual(memo.static_key(step, remote), memo.static_key(step, self.agent))
+        finally:
+            await self.stop()
+
+    def test_handshake(self):
+        """测试无效握手被拒绝，以及 Worker 上报的 Agent 指纹"""
+        asyncio.run(self.async_test_handshake())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# 未安装 core_lab 时直接使用仓库根目录下的源码
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+
+from pydantic import PrivateAttr
+
+from agents.base import AgentBase
+from checkpoint import TaskCheckpoint
+from context_manager import ContextSnapshot
+from duration_estimator import DurationEstimator
+from models.task import Task, TaskStatus, TaskStep, TaskStepStatus
+from step_memo import StepMemo
+from task_manager import TaskManager
+
+
+class _StepAgent(AgentBase):
+    """记录执行的步骤名并返回 {步骤名: 1}；名称与 block 相同的步骤一直等待，模拟进程退出前未完成的步骤"""
+
+    block: str = ""
+    _executed: List[str] = PrivateAttr(default_factory=list)
+
+    async def execute_task(self, task_step: TaskStep, context: Optional[Dict[str, Any]] = None) -> Any:
+        self._executed.append(task_step.name)
+        if task_step.name == self.block:
+            await asyncio.sleep(10)
+        return {task_step.name: 1}
+
+
+def make_task(*names: str) -> Task:
+    """按顺序依次依赖的步骤组成的任务"""
+    steps: Dict[str, TaskStep] = {}
+    previous: List[str] = []
+    for name in names:
+        step = TaskStep(name=name, required_role="Worker", dependencies=previous)
+        steps[step.step_id] = step
+        previous = [step.step_id]
+    return Task(name="-".join(names), steps=steps)
+
+
+class TestTaskCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, "checkpoints.db")
+
+    async def async_test_snapshot_and_journal(self):
+        checkpoint = TaskCheckpoint(path=self.path, snapshot_interval=2)
+        task = make_task("a", "b", "c")
+        checkpoint.save_task(task, {})
+        context = ContextSnapshot()
+        for step in task.steps.values():
+            step.status = TaskStepStatus.COMPLETED
+            step.result = {step.name: 1}
+            context = context.evolve(step.result)
+            checkpoint.record_step(task, step, context)
+
+        # 第二条日志触发快照，第三条仍写入日志，恢复时重放
+        loaded, restored = await checkpoint.load(task.task_id)
+        self.assertTrue(all(step.status == TaskStepStatus.COMPLETED for step in loaded.steps.values()))
+        self.assertEqual(dict(restored), {"a": 1, "b": 1, "c": 1})
+        self.assertEqual(restored.version, 3)
+
+    def test_snapshot_and_journal(self):
+        """测试快照加日志恢复任务和上下文"""
+        asyncio.run(self.async_test_snapshot_and_journal())
+
+    async def async_test_terminal_tasks(self):
+        checkpoint = TaskCheckpoint(path=self.path)
+        tasks = {status: make_task("a") for status in TaskStatus}
+        for status, task in tasks.items():
+            checkpoint.save_task(task, {})
+            task.status = status
+            checkpoint.record_status(task)
+
+        # 只恢复等待执行和被中断的任务；完成的任务删除检查点，失败的任务保留供手动处理
+        self.assertEqual(
+            sorted(await checkpoint.unfinished()),
+            sorted(tasks[status].task_id for status in (TaskStatus.PENDING, TaskStatus.IN_PROGRESS)),
+        )
+        self.assertIsNone(await checkpoint.load(tasks[TaskStatus.COMPLETED].task_id))
+        self.assertIsNotNone(await checkpoint.load(tasks[TaskStatus.FAILED].task_id))
+
+        checkpoint = TaskCheckpoint(path=self.path, keep_failed=False)
+        checkpoint.record_status(tasks[TaskStatus.FAILED])
+        self.assertIsNone(await checkpoint.load(tasks[TaskStatus.FAILED].task_id))
+
+    def test_terminal_tasks(self):
+        """测试任务结束后的检查点处理"""
+        asyncio.run(self.async_test_terminal_tasks())
+
+    def make_manager(self, agent: AgentBase) -> TaskManager:
+        manager = TaskManager()
+        manager.checkpoint = TaskCheckpoint(path=self.path)
+        manager.step_memo = StepMemo(path="")
+        manager.duration_estimator = DurationEstimator(path=None)
+        manager.register_agent(agent)
+        return manager
+
+    async def async_test_resume_interrupted(self):
+        # 第一个进程执行完 a 后在 b 上被中断
+        blocked = _StepAgent(name="first", role="Worker", block="b")
+        manager = self.make_manager(blocked)
+        created = make_task("a", "b", "c")
+        task = await manager.create_task(created.name, created.steps)
+        run = asyncio.create_task(manager.process_task(task.task_id))
+        for _ in range(100):
+            if len(blocked._executed) == 2:
+                break
+            await asyncio.sleep(0.01)
+        run.cancel()
+        await manager.checkpoint.flush()
+
+        # 新进程只恢复被中断的任务，只重新执行未完成的步骤
+        agent = _StepAgent(name="second", role="Worker")
+        manager = self.make_manager(agent)
+        resumed = await manager.resume_unfinished()
+        self.assertEqual([item.task_id for item in resumed], [task.task_id])
+        await asyncio.wait_for(manager.process_task(task.task_id), 5)
+        self.assertEqual(agent._executed, ["b", "c"])
+        context = await manager.context_manager.get_context(task.context_id)
+        self.assertEqual(dict(context), {"a": 1, "b": 1, "c": 1})
+        self.assertEqual(await manager.checkpoint.unfinished(), [])
+
+    def test_resume_interrupted(self):
+        """测试进程退出后恢复被中断的任务"""
+        asyncio.run(self.async_test_resume_interrupted())
+
+
+if __name__ == "__main__":
+    unittest.main()
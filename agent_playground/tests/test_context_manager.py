@@ -0,0 +1,145 @@
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# 未安装 core_lab 时直接使用仓库根目录下的源码
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+
+from context_manager import ContextManager
+from context_store import BlobStore, SpilledValue
+
+
+class TestContextManager(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def make_manager(self, **kwargs) -> ContextManager:
+        return ContextManager(store=BlobStore(self.tmpdir.name), **kwargs)
+
+    async def async_test_versions(self):
+        manager = self.make_manager(history_size=3)
+        context_id = await manager.create_context()
+        before = await manager.get_context(context_id)
+        for index in range(1, 5):
+            self.assertEqual(await manager.update_context(context_id, {"step": index}), index)
+
+        # 已取得的快照不受之后的写入影响
+        self.assertEqual(dict(before), {})
+        current = await manager.get_context(context_id)
+        self.assertEqual((current.version, dict(current)), (4, {"step": 4}))
+        # 历史中只保留最近的版本
+        self.assertEqual(dict(await manager.get_context(context_id, version=2)), {"step": 2})
+        self.assertIsNone(await manager.get_context(context_id, version=1))
+
+        await manager.delete_context(context_id)
+        self.assertIsNone(await manager.update_context(context_id, {"step": 5}))
+        self.assertEqual(dict(await manager.get_context(context_id)), {})
+
+    def test_versions(self):
+        """测试写入生成新版本，历史版本可按版本号读取"""
+        asyncio.run(self.async_test_versions())
+
+    async def async_test_concurrent_updates(self):
+        manager = self.make_manager()
+        first, second = await manager.create_context(), await manager.create_context()
+        versions = await asyncio.gather(
+            *(manager.update_context(first, {f"key{index}": index}) for index in range(20)),
+            manager.update_context(second, {"other": 1}),
+        )
+        # 同一上下文的写入依次进行，不会丢失更新；不同上下文互不影响
+        self.assertEqual(sorted(versions[:20]), list(range(1, 21)))
+        self.assertEqual(len(await manager.get_context(first)), 20)
+        self.assertEqual(dict(await manager.get_context(second)), {"other": 1})
+
+    def test_concurrent_updates(self):
+        """测试并发写入同一上下文"""
+        asyncio.run(self.async_test_concurrent_updates())
+
+    async def async_test_spill_large_values(self):
+        manager = self.make_manager(spill_threshold=100)
+        first, second = await manager.create_context(), await manager.create_context()
+        document = "文" * 200
+        await manager.update_context(first, {"doc": document, "name": "small"})
+        await manager.update_context(second, {"doc": document})
+
+        # 超过阈值的值写入磁盘，相同内容只保存一份，读取时内容不变
+        snapshot = await manager.get_context(first)
+        self.assertIsInstance(snapshot._data["doc"], SpilledValue)
+        self.assertEqual(snapshot["doc"], document)
+        self.assertEqual(snapshot["name"], "small")
+        self.assertIs(snapshot["doc"], snapshot["doc"])  # 同一快照重复读取不再访问磁盘
+        self.assertEqual(manager.store.stats()["blobs"], 1)
+
+        # 最后一个引用释放时删除文件
+        await manager.delete_context(first)
+        self.assertEqual(manager.store.stats()["blobs"], 1)
+        await manager.delete_context(second)
+        self.assertEqual(manager.store.stats(), {"directory": self.tmpdir.name, "blobs": 0, "bytes_on_disk": 0})
+        self.assertEqual(os.listdir(self.tmpdir.name), [])
+
+    def test_spill_large_values(self):
+        """测试较大的值转存到磁盘后透明读取"""
+        asyncio.run(self.async_test_spill_large_values())
+
+    async def async_test_memory_budget(self):
+        manager = self.make_manager(history_size=2, memory_budget=100)
+        old, recent = await manager.create_context(), await manager.create_context()
+        await manager.update_context(old, {"a": "x" * 40})
+        held = await manager.get_context(old)
+        await manager.update_context(old, {"b": "y" * 40})
+        # 历史版本中的值同样计入驻留内存，多个版本共享的值只计算一次
+        self.assertEqual(manager.stats()["resident_bytes"], 80)
+
+        # 超出预算时转存最久未使用的上下文，正在写入的上下文保留在内存中
+        await manager.update_context(recent, {"c": "z" * 40})
+        self.assertEqual(manager.stats()["resident_bytes"], 40)
+        current = await manager.get_context(old)
+        self.assertIsInstance(current._data["a"], SpilledValue)
+        self.assertEqual(dict(current), {"a": "x" * 40, "b": "y" * 40})
+        self.assertEqual(dict(await manager.get_context(old, version=1)), {"a": "x" * 40})
+        # 转存前取得的快照不会被修改
+        self.assertEqual(held._data["a"], "x" * 40)
+        self.assertEqual(held.version, 1)
+
+    def test_memory_budget(self):
+        """测试驻留内存超出预算时按最近最少使用转存"""
+        asyncio.run(self.async_test_memory_budget())
+
+    async def async_test_evict_finished(self):
+        manager = self.make_manager(ttl=3600, max_finished=2)
+        contexts = [await manager.create_context() for _ in range(4)]
+        for context_id in contexts:
+            await manager.update_context(context_id, {"id": context_id})
+        for context_id in contexts[:3]:
+            await manager.release_context(context_id)
+
+        # 已结束的上下文超过数量上限时删除最久未访问的
+        self.assertFalse(manager.has_context(contexts[0]))
+        self.assertTrue(manager.has_context(contexts[1]))
+        # 访问已结束的上下文会刷新它的保留时间，重新打开的上下文不会被淘汰
+        await manager.get_context(contexts[1])
+        self.assertTrue(await manager.reopen_context(contexts[2]))
+        await manager.release_context(contexts[3])
+        self.assertTrue(manager.has_context(contexts[1]))
+        self.assertTrue(manager.has_context(contexts[2]))
+        self.assertEqual(manager.stats()["finished"], 2)
+
+        # 超过保留时间的上下文在下次创建时删除
+        manager.ttl = 0
+        await manager.create_context()
+        self.assertFalse(manager.has_context(contexts[1]))
+        self.assertFalse(manager.has_context(contexts[3]))
+        self.assertTrue(manager.has_context(contexts[2]))
+        self.assertEqual(manager.stats()["evicted_contexts"], 3)
+
+    def test_evict_finished(self):
+        """测试已结束任务的上下文按保留时间和数量淘汰"""
+        asyncio.run(self.async_test_evict_finished())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import unittest
+from typing import Any, Dict, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# 未安装 core_lab 时直接使用仓库根目录下的源码
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+
+from agents.base import AgentBase
+from checkpoint import TaskCheckpoint
+from deadline import (
+    LLM_MIN_GENERATION_TOKENS,
+    LLM_TOKENS_PER_SECOND,
+    BudgetExhaustedError,
+    deadline_scope,
+    generation_limit,
+    remaining,
+    within_budget,
+)
+from duration_estimator import DurationEstimator
+from models.task import TaskStatus, TaskStep, TaskStepStatus
+from step_memo import StepMemo
+from task_manager import TaskManager
+
+
+class _SleepAgent(AgentBase):
+    """等待步骤超时时间的两倍"""
+
+    async def execute_task(self, task_step: TaskStep, context: Optional[Dict[str, Any]] = None) -> Any:
+        await asyncio.sleep((task_step.timeout or 0) * 2)
+        return {task_step.name: "done"}
+
+
+class TestDeadline(unittest.TestCase):
+    def test_nested_scopes(self):
+        """测试嵌套的预算取更早的截止时间"""
+        self.assertIsNone(remaining())
+        self.assertIsNone(generation_limit())
+        with deadline_scope(10):
+            with deadline_scope(60):
+                self.assertLessEqual(remaining(), 10)
+            with deadline_scope(None) as budget:
+                self.assertLessEqual(remaining(), 10)
+                # 剩余时间换算为令牌数，按最小单位取整
+                limit = generation_limit()
+                self.assertLessEqual(limit, 10 * LLM_TOKENS_PER_SECOND)
+                self.assertEqual(limit % LLM_MIN_GENERATION_TOKENS, 0)
+                self.assertTrue(budget.limited)
+        self.assertIsNone(remaining())
+
+    async def async_test_budget_exhausted(self):
+        with deadline_scope(0.05):
+            self.assertEqual(await within_budget(asyncio.sleep(0, "ok")), "ok")
+            with self.assertRaises(BudgetExhaustedError):
+                await within_budget(asyncio.sleep(1))
+            # 预算已用完时不再开始等待
+            with self.assertRaises(BudgetExhaustedError):
+                await within_budget(asyncio.sleep(0))
+
+        # 内层的超时不是预算用完，照常抛出 TimeoutError
+        with deadline_scope(1):
+            with self.assertRaises(asyncio.TimeoutError):
+                await within_budget(asyncio.wait_for(asyncio.sleep(1), 0.01))
+
+    def test_budget_exhausted(self):
+        """测试预算用完时抛出 BudgetExhaustedError"""
+        asyncio.run(self.async_test_budget_exhausted())
+
+    async def async_test_task_deadline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            manager = TaskManager()
+            manager.checkpoint = TaskCheckpoint(path=os.path.join(directory, "checkpoints.db"))
+            manager.step_memo = StepMemo(path="")
+            manager.duration_estimator = DurationEstimator(path=None)
+            manager.register_agent(_SleepAgent(name="sleeper", role="Worker"))
+
+            first = TaskStep(name="first", required_role="Worker", timeout=0.05)
+            second = TaskStep(name="second", required_role="Worker", timeout=0.05)
+            task = await manager.create_task("截止时间", {first.step_id: first, second.step_id: second})
+            started = time.monotonic()
+            # 步骤超时后的重试退避超过任务剩余时间，直接放弃而不是等到截止时间之后
+            await asyncio.wait_for(manager.process_task(task.task_id, deadline=0.2), 5)
+            self.assertLess(time.monotonic() - started, 2)
+            self.assertEqual(task.status, TaskStatus.FAILED)
+            self.assertEqual(first.status, TaskStepStatus.FAILED)
+            self.assertEqual(second.status, TaskStepStatus.FAILED)
+
+    def test_task_deadline(self):
+        """测试步骤超时和任务截止时间"""
+        asyncio.run(self.async_test_task_deadline())
+
+
+if __name__ == "__main__":
+    unittest.main()
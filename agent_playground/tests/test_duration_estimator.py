@@ -0,0 +1,56 @@
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# 未安装 core_lab 时直接使用仓库根目录下的源码
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+
+from duration_estimator import DurationEstimator
+
+
+class TestDurationEstimator(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, "durations.json")
+
+    def test_estimate(self):
+        """测试指数加权平均和没有历史时的估计"""
+        estimator = DurationEstimator(path=None, smoothing=0.5, default=10)
+        self.assertEqual(estimator.estimate("Programmer"), 10)
+        estimator.record("Programmer", 4)
+        estimator.record("Programmer", 8)
+        self.assertEqual(estimator.estimate("Programmer"), 6)
+        estimator.record("Tester", 2)
+        # 未知角色使用已知角色的平均值
+        self.assertEqual(estimator.estimate("Architect"), 4)
+
+    async def async_test_persistence(self):
+        estimator = DurationEstimator(path=self.path)
+        estimator.record("Programmer", 3)
+        await estimator.save()
+
+        restored = DurationEstimator(path=self.path)
+        self.assertEqual(restored.estimate("Programmer"), 3)
+        self.assertEqual(restored.samples, {"Programmer": 1})
+
+        # 没有变化时不重写文件
+        os.remove(self.path)
+        await restored.save()
+        self.assertFalse(os.path.exists(self.path))
+
+        # 文件损坏时忽略历史记录
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("{")
+        self.assertEqual(DurationEstimator(path=self.path, default=7).estimate("Programmer"), 7)
+
+    def test_persistence(self):
+        """测试估计写入文件后在下次运行时继续使用"""
+        asyncio.run(self.async_test_persistence())
+
+
+if __name__ == "__main__":
+    unittest.main()
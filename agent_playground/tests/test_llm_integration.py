@@ -0,0 +1,96 @@
+import asyncio
+import os
+import sys
+import unittest
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# 未安装 core_lab 时直接使用仓库根目录下的源码
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+
+from agents.llm_backends import GenerationResult, LLMBackend
+from agents.llm_breaker import BreakerRegistry
+from agents.llm_integration import OllamaClientWrapper
+from agents.llm_limiter import LimiterRegistry
+from deadline import BudgetExhaustedError, deadline_scope
+from retry_policy import RetryPolicy
+
+
+class _FailingBackend(LLMBackend):
+    """每次调用都抛出指定异常的后端"""
+
+    name = "failing"
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+    async def chat(
+        self, model: str, messages: List[Dict[str, str]], max_tokens: Optional[int] = None, **params: Any
+    ) -> GenerationResult:
+        raise self.error
+
+    async def stream(
+        self, model: str, messages: List[Dict[str, str]], max_tokens: Optional[int] = None, **params: Any
+    ) -> AsyncIterator[GenerationResult]:
+        raise self.error
+        yield
+
+    async def embed(self, model: str, texts: List[str]) -> List[List[float]]:
+        raise self.error
+
+
+class _SlowBackend(_FailingBackend):
+    """一直等待不返回的后端"""
+
+    async def chat(
+        self, model: str, messages: List[Dict[str, str]], max_tokens: Optional[int] = None, **params: Any
+    ) -> GenerationResult:
+        await asyncio.sleep(10)
+        raise self.error
+
+
+class TestChatErrors(unittest.TestCase):
+    def make_client(self, backend: LLMBackend) -> OllamaClientWrapper:
+        return OllamaClientWrapper(
+            backend=backend,
+            cache=None,
+            limiter_registry=LimiterRegistry(),
+            retry_policy=RetryPolicy(max_attempts=1),
+            breaker_registry=BreakerRegistry(),
+        )
+
+    def messages(self, content: str) -> List[Dict[str, str]]:
+        return [{"role": "user", "content": content}]
+
+    async def async_test_backend_error(self):
+        client = self.make_client(_FailingBackend(ValueError("请求无效")))
+        self.assertIsNone(await client.chat("m", self.messages("普通")))
+        self.assertIsNone(await client.chat("m", self.messages("流式"), stream=True))
+
+    def test_backend_error(self):
+        """测试后端故障时返回 None"""
+        asyncio.run(self.async_test_backend_error())
+
+    async def async_test_caller_errors(self):
+        client = self.make_client(_FailingBackend(asyncio.TimeoutError()))
+        with self.assertRaises(asyncio.TimeoutError):
+            await client.chat("m", self.messages("超时"))
+
+        client = self.make_client(_SlowBackend(ValueError()))
+        with deadline_scope(0.05):
+            with self.assertRaises(BudgetExhaustedError):
+                await client.chat("m", self.messages("预算"))
+
+        call = asyncio.create_task(client.chat("m", self.messages("取消")))
+        await asyncio.sleep(0.01)
+        call.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await call
+
+    def test_caller_errors(self):
+        """测试预算用完、超时和取消不会被当成后端故障吞掉"""
+        asyncio.run(self.async_test_caller_errors())
+
+
+if __name__ == "__main__":
+    unittest.main()
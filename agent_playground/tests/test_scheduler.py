@@ -0,0 +1,100 @@
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# 未安装 core_lab 时直接使用仓库根目录下的源码
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+
+from pydantic import PrivateAttr
+
+from agents.base import AgentBase
+from checkpoint import TaskCheckpoint
+from duration_estimator import DurationEstimator
+from models.task import TaskStep
+from step_memo import StepMemo
+from task_manager import TaskManager
+
+
+class _RecordingAgent(AgentBase):
+    """按执行顺序记录步骤名"""
+
+    _executed: List[str] = PrivateAttr(default_factory=list)
+
+    async def execute_task(self, task_step: TaskStep, context: Optional[Dict[str, Any]] = None) -> Any:
+        self._executed.append(task_step.name)
+        await asyncio.sleep(0.01)
+        return None
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def make_manager(self) -> TaskManager:
+        manager = TaskManager()
+        manager.checkpoint = TaskCheckpoint(path=os.path.join(self.tmpdir.name, "checkpoints.db"))
+        manager.step_memo = StepMemo(path="")
+        # smoothing 为 0 时估计不随实际耗时变化，虚拟时间只取决于权重
+        manager.duration_estimator = DurationEstimator(path=None, smoothing=0)
+        manager.duration_estimator.durations = {"Worker": 1.0}
+        # 只有一个 Agent，执行顺序就是调度顺序
+        self.agent = _RecordingAgent(name="only", role="Worker")
+        manager.register_agent(self.agent)
+        return manager
+
+    async def async_test_critical_path_first(self):
+        manager = self.make_manager()
+        manager.duration_estimator.durations = {"Worker": 1.0, "Slow": 5.0}
+        manager.register_agent(_RecordingAgent(name="slow", role="Slow"))
+        short = TaskStep(name="short", required_role="Worker")
+        head = TaskStep(name="head", required_role="Worker")
+        tail = TaskStep(name="tail", required_role="Slow", dependencies=[head.step_id])
+        task = await manager.create_task("关键路径", {step.step_id: step for step in (short, head, tail)})
+        await asyncio.wait_for(manager.process_task(task.task_id), 5)
+        # head 之后还有耗时较长的 tail，虽然 short 先声明也先执行 head
+        self.assertEqual(self.agent._executed, ["head", "short"])
+
+    def test_critical_path_first(self):
+        """测试任务内按剩余关键路径长度选择步骤"""
+        asyncio.run(self.async_test_critical_path_first())
+
+    async def make_task(self, manager: TaskManager, name: str, count: int):
+        steps = [TaskStep(name=f"{name}{index}", required_role="Worker") for index in range(count)]
+        return await manager.create_task(name, {step.step_id: step for step in steps})
+
+    async def async_test_fair_share(self):
+        manager = self.make_manager()
+        big = await self.make_task(manager, "big", 6)
+        small = await self.make_task(manager, "small", 3)
+        await asyncio.wait_for(
+            asyncio.gather(manager.process_task(big.task_id), manager.process_task(small.task_id)), 5
+        )
+        # 权重相同的两个任务轮流得到 Agent，小任务不用等大任务执行完
+        owners = [name.rstrip("0123456789") for name in self.agent._executed]
+        self.assertEqual(owners[:6].count("small"), 3)
+
+        manager = self.make_manager()
+        heavy = await self.make_task(manager, "heavy", 6)
+        light = await self.make_task(manager, "light", 6)
+        await asyncio.wait_for(
+            asyncio.gather(
+                manager.process_task(heavy.task_id, weight=2), manager.process_task(light.task_id)
+            ),
+            5,
+        )
+        # 权重为 2 的任务得到两倍的份额
+        owners = [name.rstrip("0123456789") for name in self.agent._executed]
+        self.assertEqual(owners[:6].count("heavy"), 4)
+
+    def test_fair_share(self):
+        """测试多个任务按权重公平地分享 Agent"""
+        asyncio.run(self.async_test_fair_share())
+
+
+if __name__ == "__main__":
+    unittest.main()
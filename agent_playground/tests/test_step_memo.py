@@ -0,0 +1,120 @@
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# 未安装 core_lab 时直接使用仓库根目录下的源码
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+
+from pydantic import PrivateAttr
+
+from agents.base import AgentBase
+from checkpoint import TaskCheckpoint
+from duration_estimator import DurationEstimator
+from models.task import TaskStep
+from step_memo import RecordingContext, StepMemo
+from task_manager import TaskManager
+
+
+class _PromptAgent(AgentBase):
+    """读取上下文中 reads 列出的键，返回 {步骤名: 读到的值}"""
+
+    system_prompt: str = "v1"
+    reads: List[str] = ["spec"]
+    _executed: List[str] = PrivateAttr(default_factory=list)
+
+    async def execute_task(self, task_step: TaskStep, context: Optional[Dict[str, Any]] = None) -> Any:
+        self._executed.append(task_step.name)
+        return {task_step.name: [context.get(key) for key in self.reads]}
+
+
+class TestStepMemo(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, "step_memo.db")
+
+    async def async_test_lookup(self):
+        memo = StepMemo(path=self.path)
+        agent = _PromptAgent(name="analyst", role="Analyst")
+        step = TaskStep(name="analyse", required_role="Analyst")
+        key = memo.static_key(step, agent)
+
+        context = RecordingContext({"spec": "需求", "other": 1})
+        result = await agent.execute_task(step, context)
+        await memo.store(key, context, result)
+
+        # 只比较读取过的键，没有读取的键变化时命中
+        self.assertEqual(await memo.lookup(key, {"spec": "需求", "other": 2}), (True, {"analyse": ["需求"]}))
+        # 读取过的键变化或缺失时失效
+        self.assertEqual(await memo.lookup(key, {"spec": "新需求", "other": 1}), (False, None))
+        self.assertEqual(await memo.lookup(key, {"other": 1}), (False, None))
+        # Agent 配置变化时失效，名称和 ID 不影响
+        self.assertNotEqual(memo.static_key(step, agent.model_copy(update={"system_prompt": "v2"})), key)
+        self.assertEqual(memo.static_key(step, _PromptAgent(name="another", role="Analyst")), key)
+        self.assertEqual(memo.stats()["hits"], 1)
+
+    def test_lookup(self):
+        """测试按读取的上下文键命中和失效"""
+        asyncio.run(self.async_test_lookup())
+
+    async def async_test_missing_and_read_all(self):
+        memo = StepMemo(path=self.path)
+        step = TaskStep(name="analyse", required_role="Analyst")
+
+        # 读取时不存在的键之后出现，输入随之变化
+        agent = _PromptAgent(name="analyst", role="Analyst", reads=["draft"])
+        key = memo.static_key(step, agent)
+        context = RecordingContext({"spec": "需求"})
+        await memo.store(key, context, await agent.execute_task(step, context))
+        self.assertTrue((await memo.lookup(key, {"spec": "其他"}))[0])
+        self.assertFalse((await memo.lookup(key, {"spec": "需求", "draft": "草稿"}))[0])
+
+        # 遍历整个上下文时任何键变化都失效
+        key = memo.static_key(TaskStep(name="summary", required_role="Analyst"), agent)
+        context = RecordingContext({"spec": "需求", "other": 1})
+        dict(context)
+        await memo.store(key, context, {"analyse": "全部"})
+        self.assertEqual(await memo.lookup(key, {"spec": "需求", "other": 1}), (True, {"analyse": "全部"}))
+        self.assertFalse((await memo.lookup(key, {"spec": "需求", "other": 2}))[0])
+
+    def test_missing_and_read_all(self):
+        """测试缺失的键和读取整个上下文的情况"""
+        asyncio.run(self.async_test_missing_and_read_all())
+
+    async def async_test_rerun_task(self):
+        agent = _PromptAgent(name="analyst", role="Analyst", reads=["analyse"])
+        manager = TaskManager()
+        manager.checkpoint = TaskCheckpoint(path=os.path.join(self.tmpdir.name, "checkpoints.db"))
+        manager.step_memo = StepMemo(path=self.path)
+        manager.duration_estimator = DurationEstimator(path=None)
+        manager.register_agent(agent)
+
+        async def run():
+            first = TaskStep(step_id="first", name="analyse", required_role="Analyst")
+            second = TaskStep(step_id="second", name="review", required_role="Analyst", dependencies=["first"])
+            task = await manager.create_task("增量", {"first": first, "second": second})
+            await manager.process_task(task.task_id)
+            return second.result
+
+        await run()
+        self.assertEqual(agent._executed, ["analyse", "review"])
+        # 输入没有变化，再次执行时两个步骤都复用历史结果
+        self.assertEqual(await run(), {"review": [[None]]})
+        self.assertEqual(agent._executed, ["analyse", "review"])
+
+        # 修改系统提示词后重新执行
+        agent.system_prompt = "v2"
+        await run()
+        self.assertEqual(agent._executed, ["analyse", "review"] * 2)
+
+    def test_rerun_task(self):
+        """测试重新处理输入未变化的任务时复用步骤结果"""
+        asyncio.run(self.async_test_rerun_task())
+
+
+if __name__ == "__main__":
+    unittest.main()
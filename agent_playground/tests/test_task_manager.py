@@ -0,0 +1,101 @@
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+from typing import Any, Dict, List, Optional
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# 未安装 core_lab 时直接使用仓库根目录下的源码
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+
+from pydantic import PrivateAttr
+
+from agents.base import AgentBase
+from checkpoint import TaskCheckpoint
+from duration_estimator import DurationEstimator
+from models.task import TaskStatus, TaskStep, TaskStepStatus
+from retry_policy import RetryPolicy
+from step_memo import StepMemo
+from task_manager import TaskManager
+
+
+class _StepAgent(AgentBase):
+    """每个步骤等待一小段时间后返回 {步骤名: 读到的上下文键}，名为 fail 的步骤抛出异常"""
+
+    _running: List[int] = PrivateAttr(default_factory=lambda: [0, 0])  # 当前并发数、最大并发数
+
+    async def execute_task(self, task_step: TaskStep, context: Optional[Dict[str, Any]] = None) -> Any:
+        if task_step.name == "fail":
+            raise RuntimeError("步骤失败")
+        self._running[0] += 1
+        self._running[1] = max(self._running)
+        try:
+            await asyncio.sleep(0.05)
+        finally:
+            self._running[0] -= 1
+        return {task_step.name: sorted(context or {})}
+
+
+def make_manager(directory: str) -> TaskManager:
+    """不读写工作目录中文件的 TaskManager"""
+    manager = TaskManager()
+    manager.checkpoint = TaskCheckpoint(path=os.path.join(directory, "checkpoints.db"))
+    manager.step_memo = StepMemo(path="")
+    manager.duration_estimator = DurationEstimator(path=None)
+    return manager
+
+
+class TestProcessTask(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    async def async_test_parallel_steps(self):
+        manager = make_manager(self.tmpdir.name)
+        running = [0, 0]
+        for index in range(2):
+            agent = _StepAgent(name=f"worker-{index}", role="Worker")
+            agent._running = running
+            manager.register_agent(agent)
+
+        first = TaskStep(name="first", required_role="Worker")
+        second = TaskStep(name="second", required_role="Worker")
+        merge = TaskStep(name="merge", required_role="Worker", dependencies=[first.step_id, second.step_id])
+        task = await manager.create_task("并行", {step.step_id: step for step in (first, second, merge)})
+        await asyncio.wait_for(manager.process_task(task.task_id), 5)
+
+        # 两个互不依赖的步骤同时执行，合并步骤在它们都完成后才开始
+        self.assertEqual(running[1], 2)
+        self.assertEqual(task.status, TaskStatus.COMPLETED)
+        self.assertEqual(merge.result, {"merge": ["first", "second"]})
+
+    def test_parallel_steps(self):
+        """测试独立的步骤并发执行，依赖全部完成后才执行后继步骤"""
+        asyncio.run(self.async_test_parallel_steps())
+
+    async def async_test_failed_step(self):
+        manager = make_manager(self.tmpdir.name)
+        manager.register_agent(_StepAgent(name="worker", role="Worker"))
+
+        fail = TaskStep(name="fail", required_role="Worker")
+        after = TaskStep(name="after", required_role="Worker", dependencies=[fail.step_id])
+        other = TaskStep(name="other", required_role="Worker")
+        task = await manager.create_task("失败", {step.step_id: step for step in (fail, after, other)})
+        with mock.patch("task_manager.STEP_RETRY_POLICY", RetryPolicy(max_attempts=1)):
+            await asyncio.wait_for(manager.process_task(task.task_id), 5)
+
+        # 失败步骤的后继不再执行，不相关的步骤照常完成
+        self.assertEqual(task.status, TaskStatus.FAILED)
+        self.assertEqual(fail.status, TaskStepStatus.FAILED)
+        self.assertEqual(after.status, TaskStepStatus.PENDING)
+        self.assertEqual(other.status, TaskStepStatus.COMPLETED)
+
+    def test_failed_step(self):
+        """测试步骤失败时任务结束而不是一直等待"""
+        asyncio.run(self.async_test_failed_step())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import sys
+import unittest
+from typing import Dict, List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# 未安装 core_lab 时直接使用仓库根目录下的源码
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+
+from models.task import TaskStep, TaskStepStatus
+from task_plan import TaskPlan, TaskPlanError
+
+
+def make_steps(graph: Dict[str, List[str]], role: str = "Worker") -> Dict[str, TaskStep]:
+    """按 {步骤名: [依赖的步骤名]} 构造步骤，步骤 ID 与名称相同"""
+    return {
+        name: TaskStep(step_id=name, name=name, required_role=role, dependencies=dependencies)
+        for name, dependencies in graph.items()
+    }
+
+
+class TestTaskPlan(unittest.TestCase):
+    def test_invalid_dependencies(self):
+        """测试依赖不存在、依赖自身和循环依赖在创建时报错"""
+        with self.assertRaisesRegex(TaskPlanError, "不存在"):
+            TaskPlan(make_steps({"a": ["missing"]}))
+        with self.assertRaisesRegex(TaskPlanError, "依赖自身"):
+            TaskPlan(make_steps({"a": ["a"]}))
+        with self.assertRaisesRegex(TaskPlanError, "循环依赖") as raised:
+            TaskPlan(make_steps({"a": [], "b": ["a", "d"], "c": ["b"], "d": ["c"]}))
+        # 报出环上的步骤，按执行顺序排列，起点可以是环上任意一个步骤
+        cycle = str(raised.exception).split(": ")[-1].split(" -> ")
+        self.assertEqual(cycle[0], cycle[-1])
+        self.assertIn("".join(cycle[:-1]), ("bcd", "cdb", "dbc"))
+
+    def test_ready_steps(self):
+        """测试按入度释放可执行步骤"""
+        plan = TaskPlan(make_steps({"a": [], "b": [], "c": ["a", "b"], "d": ["c", "c"]}))
+        self.assertEqual(list(plan.ready), ["a", "b"])
+        self.assertEqual(plan.depth, 3)
+
+        self.assertEqual(plan.complete("a"), [])
+        self.assertEqual(plan.complete("b"), ["c"])
+        # 重复声明的依赖只计一次
+        self.assertEqual(plan.complete("c"), ["d"])
+        self.assertEqual(sorted(plan.descendants("a")), ["c", "d"])
+
+    def test_resume_completed(self):
+        """测试从检查点恢复时已完成的步骤不再计入入度"""
+        steps = make_steps({"a": [], "b": ["a"], "c": ["b"]})
+        steps["a"].status = TaskStepStatus.COMPLETED
+        plan = TaskPlan(steps)
+        self.assertEqual(list(plan.ready), ["b"])
+        self.assertEqual(plan.complete("b"), ["c"])
+
+    def test_critical_path(self):
+        """测试每个步骤的剩余关键路径长度"""
+        steps = make_steps({"a": [], "b": ["a"], "c": ["a"], "d": ["b", "c"], "e": []})
+        steps["c"].required_role = "Slow"
+        durations = {"Worker": 1.0, "Slow": 5.0}
+        remaining = TaskPlan(steps).critical_path(lambda step: durations[step.required_role])
+        # a 之后较慢的 c 分支决定剩余耗时：a + c + d
+        self.assertEqual(remaining, {"a": 7.0, "b": 2.0, "c": 6.0, "d": 1.0, "e": 1.0})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+import argparse
+import asyncio
+import uuid
+from typing import Any, Dict, List, Tuple
+
+from agents.base import AgentBase
+from agents.devops_engineer import DevOpsEngineer
+from agents.programmer import Programmer
+from agents.requirement_analyst import RequirementAnalyst
+from agents.system_architect import SystemArchitect
+from agents.tester import Tester
+from broker import (
+    BROKER_ADDRESS,
+    BROKER_HEARTBEAT_INTERVAL,
+    parse_address,
+    read_message,
+    send_message,
+)
+from deadline import deadline_scope, within_budget
+from models.task import TaskStep
+from monitoring import log_event
+from step_memo import agent_fingerprint
+
+AGENT_CLASSES = {
+    "RequirementAnalyst": RequirementAnalyst,
+    "SystemArchitect": SystemArchitect,
+    "Programmer": Programmer,
+    "Tester": Tester,
+    "DevOpsEngineer": DevOpsEngineer,
+}
+
+RECONNECT_DELAY = 3  # 与 Broker 断开后重连的间隔（秒）
+
+
+class Worker:
+    """
+    步骤执行 Worker，可以运行在独立进程或其他主机上。
+    连接 Broker 后声明自己承担的角色，接收步骤并用本地 Agent 执行，
+    执行结果通过同一连接回传，并定期发送心跳。Broker 一侧超时或取消步骤时发来 cancel 消息，
+    对应的执行被取消。
+    """
+
+    def __init__(self, agents: List[AgentBase], name: str = "", address: str = BROKER_ADDRESS):
+        self.worker_id = str(uuid.uuid4())
+        self.name = name or self.worker_id[:8]
+        self.address = address
+        self.agents: Dict[str, AgentBase] = {agent.role: agent for agent in agents}
+        self._running: Dict[Tuple[str, str], asyncio.Task] = {}  # (step_id, attempt) -> 执行中的步骤
+
+    async def _connect(self):
+        kind, target = parse_address(self.address)
+        if kind == "unix":
+            return await asyncio.open_unix_connection(target)
+        return await asyncio.open_connection(*target)
+
+    async def run(self):
+        """连接 Broker 并处理步骤，断开后自动重连"""
+        while True:
+            try:
+                reader, writer = await self._connect()
+            except OSError as e:
+                log_event("Worker Connect Failed", f"连接 Broker 失败: {self.address}", {"error": str(e)})
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+
+            await self._serve(reader, writer)
+            log_event("Worker Disconnected", f"与 Broker 的连接已断开，{RECONNECT_DELAY} 秒后重连")
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        write_lock = asyncio.Lock()
+
+        async def send(message: Dict[str, Any]):
+            async with write_lock:
+                await send_message(writer, message)
+
+        await send(
+            {
+                "type": "hello",
+                "worker_id": self.worker_id,
+                "name": self.name,
+                "roles": list(self.agents),
+                # Broker 一侧按本地 Agent 的配置复用步骤结果，与 Worker 的 ID 无关
+                "fingerprints": {role: agent_fingerprint(agent) for role, agent in self.agents.items()},
+            }
+        )
+        log_event("Worker Connected", f"Worker {self.name} 已连接 {self.address}", {"roles": list(self.agents)})
+        heartbeat = asyncio.create_task(self._heartbeat(send, writer))
+        try:
+            while True:
+                message = await read_message(reader)
+                if message is None:
+                    break
+                kind = message.get("type")
+                if kind == "assign":
+                    key = (message["step"]["step_id"], message.get("attempt"))
+                    task = asyncio.create_task(self._execute(message, send))
+                    self._running[key] = task
+                    task.add_done_callback(lambda _, key=key: self._running.pop(key, None))
+                elif kind == "cancel":
+                    task = self._running.get((message.get("step_id"), message.get("attempt")))
+                    if task:
+                        task.cancel()
+                        log_event("Worker Step Cancelled", f"Worker {self.name} 取消步骤 {message.get('step_id')}")
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            heartbeat.cancel()
+            # 连接断开后 Broker 会把步骤重新排队，本地不再继续执行
+            for task in list(self._running.values()):
+                task.cancel()
+            writer.close()
+
+    async def _heartbeat(self, send, writer: asyncio.StreamWriter):
+        """定期发送心跳；发送失败时关闭连接，由 run 重新连接"""
+        try:
+            while True:
+                await asyncio.sleep(BROKER_HEARTBEAT_INTERVAL)
+                await send({"type": "heartbeat"})
+        except (ConnectionError, OSError) as e:
+            log_event("Worker Heartbeat Failed", f"Worker {self.name} 发送心跳失败", {"error": str(e)})
+            writer.close()
+
+    async def _execute(self, message: Dict[str, Any], send):
+        step = TaskStep(**message["step"])
+        attempt = message.get("attempt")
+        agent = self.agents[message["role"]]
+        log_event("Worker Step Started", f"Worker {self.name} 开始执行 {step.name}")
+        try:
+            # 沿用 Broker 一侧的剩余预算，LLM 调用据此缩短生成长度
+            with deadline_scope(message.get("timeout")):
+                result = await within_budget(agent.execute_task(step, message.get("context")))
+        except Exception as e:
+            await send({"type": "error", "step_id": step.step_id, "attempt": attempt, "error": str(e)})
+            return
+        await send({"type": "result", "step_id": step.step_id, "attempt": attempt, "result": result})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="运行步骤执行 Worker")
+    parser.add_argument("--broker", default=BROKER_ADDRESS, help="Broker 地址，tcp://主机:端口 或 unix:///路径")
+    parser.add_argument("--roles", required=True, help="承担的角色，逗号分隔，例如 Programmer,Tester")
+    parser.add_argument("--name", default="", help="Worker 名称")
+    parser.add_argument("--task-info", default="", help="需求描述，供 RequirementAnalyst 使用")
+    args = parser.parse_args()
+
+    agents = []
+    for role in [role.strip() for role in args.roles.split(",") if role.strip()]:
+        agent = AGENT_CLASSES[role](name=f"{args.name or 'worker'}-{role}", role=role)
+        if isinstance(agent, RequirementAnalyst):
+            agent.append_task_info(args.task_info)
+        agents.append(agent)
+
+    asyncio.run(Worker(agents, name=args.name, address=args.broker).run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""agent_playground 与 agent-fastpy 共用的基础模块"""
@@ -0,0 +1,10 @@
+"""
+模型调用的公共组件，两个应用各自按配置创建实例：
+
+- rate_limiter: 并发、RPM、TPM 限流和自适应并发
+- cache: 多层响应缓存
+- circuit_breaker: 熔断器和故障转移链解析
+- singleflight: 合并相同的并发调用
+- retry: 重试策略和对冲请求
+- backends: 模型后端接口及通义千问、Ollama 和模拟后端
+"""
@@ -0,0 +1,393 @@
+import asyncio
+import hashlib
+import json
+import math
+import random
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import httpx
+
+from .rate_limiter import estimate_tokens
+
+
+@dataclass
+class GenerationResult:
+    """一次文本生成的结果；流式生成时每段的 text 为增量，最后一段带 finish_reason 和 usage"""
+
+    text: str
+    finish_reason: Optional[str] = None
+    request_id: Optional[str] = None
+    usage: Dict[str, int] = field(default_factory=dict)  # input_tokens / output_tokens
+    extra: Dict[str, Any] = field(default_factory=dict)  # 后端返回的其他统计，如 Ollama 的 eval_duration
+
+
+class LLMBackend(ABC):
+    """模型后端接口：对话、流式对话和文本向量"""
+
+    name: str = ""
+    default_embedding_model: str = ""
+
+    @abstractmethod
+    async def chat(
+        self, model: str, messages: List[Dict[str, str]], max_tokens: Optional[int] = None, **params: Any
+    ) -> GenerationResult:
+        """生成完整回应，max_tokens 限制生成长度，其余参数原样传给后端"""
+
+    @abstractmethod
+    def stream(
+        self, model: str, messages: List[Dict[str, str]], max_tokens: Optional[int] = None, **params: Any
+    ) -> AsyncIterator[GenerationResult]:
+        """逐段产出回应增量"""
+
+    @abstractmethod
+    async def embed(self, model: str, texts: List[str]) -> List[List[float]]:
+        """按输入顺序返回文本向量"""
+
+    async def close(self) -> None:
+        """释放后端持有的连接"""
+
+
+class _HTTPBackend(LLMBackend):
+    """通过 httpx 调用的后端，可以与其他后端共用一个连接池"""
+
+    def __init__(self, base_url: str, client: Optional[httpx.AsyncClient] = None, timeout: float = 120):
+        self.base_url = base_url.rstrip("/")
+        self._owns_client = client is None
+        self.client = client or httpx.AsyncClient(timeout=timeout)
+
+    async def close(self) -> None:
+        if self._owns_client:
+            await self.client.aclose()
+
+
+class DashScopeError(Exception):
+    """DashScope 接口返回的错误"""
+
+    def __init__(self, status: int, code: str, message: str, request_id: Optional[str] = None):
+        super().__init__(f"[{status}] {code}: {message}")
+        self.status = status
+        self.code = code
+        self.message = message
+        self.request_id = request_id
+
+
+class DashScopeBackend(_HTTPBackend):
+    """通义千问后端"""
+
+    name = "dashscope"
+    GENERATION_PATH = "/services/aigc/text-generation/generation"
+    EMBEDDING_PATH = "/services/embeddings/text-embedding/text-embedding"
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        base_url: str = "https://dashscope.aliyuncs.com/api/v1",
+        embedding_model: str = "text-embedding-v2",
+        client: Optional[httpx.AsyncClient] = None,
+        timeout: float = 120,
+    ):
+        if not api_key:
+            raise ValueError("DASHSCOPE_API_KEY 未配置")
+        super().__init__(base_url, client, timeout)
+        self.api_key = api_key
+        self.default_embedding_model = embedding_model
+
+    def _headers(self, **extra: str) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json", **extra}
+
+    def _payload(
+        self, model: str, messages: List[Dict[str, str]], max_tokens: Optional[int], params: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        parameters = dict(params)
+        if max_tokens:
+            parameters["max_tokens"] = max_tokens
+        return {"model": model, "input": {"messages": messages}, "parameters": parameters}
+
+    def _error(self, status: int, body: Dict[str, Any]) -> DashScopeError:
+        return DashScopeError(status, body.get("code", "Unknown"), body.get("message", ""), body.get("request_id"))
+
+    def _result(self, body: Dict[str, Any], text: str, finish_reason: Optional[str]) -> GenerationResult:
+        usage = body.get("usage") or {}
+        return GenerationResult(
+            text=text,
+            finish_reason=finish_reason,
+            request_id=body.get("request_id"),
+            usage={
+                "input_tokens": usage.get("input_tokens", 0),
+                "output_tokens": usage.get("output_tokens", 0),
+            } if finish_reason else {},
+        )
+
+    async def chat(
+        self, model: str, messages: List[Dict[str, str]], max_tokens: Optional[int] = None, **params: Any
+    ) -> GenerationResult:
+        response = await self.client.post(
+            f"{self.base_url}{self.GENERATION_PATH}",
+            headers=self._headers(),
+            json=self._payload(model, messages, max_tokens, params),
+        )
+        body = response.json()
+        if response.status_code != 200:
+            raise self._error(response.status_code, body)
+        output = body.get("output") or {}
+        return self._result(body, output.get("text") or "", output.get("finish_reason") or "stop")
+
+    async def stream(
+        self, model: str, messages: List[Dict[str, str]], max_tokens: Optional[int] = None, **params: Any
+    ) -> AsyncIterator[GenerationResult]:
+        """以 SSE 方式调用文本生成接口"""
+        payload = self._payload(model, messages, max_tokens, {**params, "incremental_output": True})
+        headers = self._headers(**{"Accept": "text/event-stream", "X-DashScope-SSE": "enable"})
+        async with self.client.stream(
+            "POST", f"{self.base_url}{self.GENERATION_PATH}", json=payload, headers=headers
+        ) as response:
+            if response.status_code != 200:
+                raise self._error(response.status_code, json.loads(await response.aread()))
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = json.loads(line[len("data:"):])
+                if data.get("code"):
+                    raise self._error(response.status_code, data)
+                output = data.get("output") or {}
+                finish_reason = output.get("finish_reason")
+                if finish_reason == "null":
+                    finish_reason = None
+                text = output.get("text") or ""
+                if text or finish_reason:
+                    yield self._result(data, text, finish_reason)
+
+    async def embed(self, model: str, texts: List[str]) -> List[List[float]]:
+        response = await self.client.post(
+            f"{self.base_url}{self.EMBEDDING_PATH}",
+            headers=self._headers(),
+            json={"model": model, "input": {"texts": texts}},
+        )
+        body = response.json()
+        if response.status_code != 200:
+            raise self._error(response.status_code, body)
+        embeddings = sorted((body.get("output") or {}).get("embeddings") or [], key=lambda item: item["text_index"])
+        return [item["embedding"] for item in embeddings]
+
+
+class OllamaError(Exception):
+    """Ollama 接口返回的错误"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"[{status}] {message}")
+        self.status = status
+        self.message = message
+
+
+class OllamaBackend(_HTTPBackend):
+    """本地 Ollama 后端"""
+
+    name = "ollama"
+    CHAT_PATH = "/api/chat"
+    EMBED_PATH = "/api/embed"
+    # 最后一段响应中的耗时统计，单位为纳秒
+    DURATION_FIELDS = ("total_duration", "load_duration", "prompt_eval_duration", "eval_duration")
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        embedding_model: str = "nomic-embed-text",
+        client: Optional[httpx.AsyncClient] = None,
+        timeout: float = 120,
+    ):
+        super().__init__(base_url or "http://localhost:11434", client, timeout)
+        self.default_embedding_model = embedding_model
+
+    def _payload(
+        self, model: str, messages: List[Dict[str, str]], stream: bool, max_tokens: Optional[int], params: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        options = dict(params)
+        if max_tokens:
+            options["num_predict"] = max_tokens
+        return {"model": model, "messages": messages, "stream": stream, "options": options}
+
+    def _result(self, body: Dict[str, Any]) -> GenerationResult:
+        done = bool(body.get("done"))
+        return GenerationResult(
+            text=(body.get("message") or {}).get("content") or "",
+            finish_reason=(body.get("done_reason") or "stop") if done else None,
+            usage={
+                "input_tokens": body.get("prompt_eval_count") or 0,
+                "output_tokens": body.get("eval_count") or 0,
+            } if done else {},
+            extra={key: body[key] for key in self.DURATION_FIELDS if key in body},
+        )
+
+    async def _raise_for_status(self, response: httpx.Response) -> None:
+        if response.status_code != 200:
+            body = json.loads(await response.aread() or b"{}")
+            raise OllamaError(response.status_code, body.get("error", ""))
+
+    async def chat(
+        self, model: str, messages: List[Dict[str, str]], max_tokens: Optional[int] = None, **params: Any
+    ) -> GenerationResult:
+        response = await self.client.post(
+            f"{self.base_url}{self.CHAT_PATH}", json=self._payload(model, messages, False, max_tokens, params)
+        )
+        await self._raise_for_status(response)
+        return self._result(response.json())
+
+    async def stream(
+        self, model: str, messages: List[Dict[str, str]], max_tokens: Optional[int] = None, **params: Any
+    ) -> AsyncIterator[GenerationResult]:
+        payload = self._payload(model, messages, True, max_tokens, params)
+        async with self.client.stream("POST", f"{self.base_url}{self.CHAT_PATH}", json=payload) as response:
+            await self._raise_for_status(response)
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                data = json.loads(line)
+                if data.get("error"):
+                    raise OllamaError(response.status_code, data["error"])
+                yield self._result(data)
+
+    async def embed(self, model: str, texts: List[str]) -> List[List[float]]:
+        response = await self.client.post(f"{self.base_url}{self.EMBED_PATH}", json={"model": model, "input": texts})
+        await self._raise_for_status(response)
+        return response.json().get("embeddings") or []
+
+
+class FakeBackendError(Exception):
+    """模拟后端按错误率注入的故障"""
+
+    def __init__(self, message: str = "模拟后端故障", status: int = 503):
+        super().__init__(f"[{status}] {message}")
+        self.status = status
+
+
+class LatencyDistribution:
+    """延迟分布，由 "分布:参数" 格式的字符串解析而来，单位为秒
+
+    fixed:秒 | uniform:最小,最大 | normal:均值,标准差 | lognormal:中位数,sigma | exponential:均值
+    """
+
+    def __init__(self, kind: str, params: List[float]):
+        samplers: Dict[str, Callable[[random.Random], float]] = {
+            "fixed": lambda rng: params[0],
+            "uniform": lambda rng: rng.uniform(params[0], params[1]),
+            "normal": lambda rng: rng.gauss(params[0], params[1]),
+            "lognormal": lambda rng: rng.lognormvariate(math.log(params[0]), params[1]),
+            "exponential": lambda rng: rng.expovariate(1 / params[0]),
+        }
+        if kind not in samplers:
+            raise ValueError(f"未知的延迟分布: {kind}")
+        self.kind = kind
+        self.params = params
+        self._sampler = samplers[kind]
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyDistribution":
+        kind, _, raw = spec.partition(":")
+        params = [float(value) for value in raw.split(",") if value.strip()]
+        return cls(kind.strip(), params or [0.0])
+
+    def sample(self, rng: random.Random) -> float:
+        return max(0.0, self._sampler(rng))
+
+
+class FakeBackend(LLMBackend):
+    """进程内模拟后端，不发网络请求
+
+    按配置的分布模拟首字延迟，回应从预设文本中按消息内容的哈希确定性地选取，
+    相同输入总是得到相同输出。用于在没有模型的机器上测量调度和接口吞吐。
+    """
+
+    name = "fake"
+    default_embedding_model = "fake"
+
+    DEFAULT_RESPONSES = [
+        "这是模拟后端生成的回应，用于测试任务编排。",
+        "模拟后端已完成分析，建议按模块拆分实现并补充测试。",
+        "模拟回应：设计方案已生成，请继续后续步骤。",
+    ]
+
+    def __init__(
+        self,
+        latency: Optional[LatencyDistribution] = None,
+        responses: Optional[List[str]] = None,
+        chunk_size: int = 4,
+        chunk_interval: float = 0.01,
+        error_rate: float = 0.0,
+        seed: int = 0,
+        embedding_dim: int = 64,
+    ):
+        self.latency = latency or LatencyDistribution.parse("lognormal:0.5,0.3")
+        self.responses = responses or list(self.DEFAULT_RESPONSES)
+        self.chunk_size = max(1, chunk_size)
+        self.chunk_interval = chunk_interval
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.embedding_dim = embedding_dim
+
+    @staticmethod
+    def load_responses(path: Optional[str]) -> Optional[List[str]]:
+        """从 JSON 列表文件读取预设回应，未指定文件时返回 None"""
+        if not path:
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _digest(self, text: str) -> bytes:
+        return hashlib.sha256(text.encode("utf-8")).digest()
+
+    def _respond(self, messages: List[Dict[str, str]], max_tokens: Optional[int]) -> str:
+        digest = self._digest(json.dumps(messages, ensure_ascii=False, sort_keys=True))
+        text = self.responses[int.from_bytes(digest[:8], "big") % len(self.responses)]
+        # estimate_tokens 按每字一个令牌估算，截断到对应字数
+        return text[:max_tokens] if max_tokens else text
+
+    async def _wait_first_token(self) -> None:
+        await asyncio.sleep(self.latency.sample(self.rng))
+        if self.error_rate and self.rng.random() < self.error_rate:
+            raise FakeBackendError()
+
+    def _finish(self, messages: List[Dict[str, str]], text: str, max_tokens: Optional[int]) -> GenerationResult:
+        """带结束原因和用量的结果，text 由调用方决定是整段文本还是空的最后一段"""
+        return GenerationResult(
+            text=text,
+            finish_reason="length" if max_tokens and len(text) >= max_tokens else "stop",
+            usage={
+                "input_tokens": sum(estimate_tokens(message["content"]) for message in messages),
+                "output_tokens": estimate_tokens(text),
+            },
+        )
+
+    async def chat(
+        self, model: str, messages: List[Dict[str, str]], max_tokens: Optional[int] = None, **params: Any
+    ) -> GenerationResult:
+        await self._wait_first_token()
+        text = self._respond(messages, max_tokens)
+        chunks = math.ceil(len(text) / self.chunk_size)
+        # 非流式调用同样要等待整段文本生成完
+        await asyncio.sleep(max(0, chunks - 1) * self.chunk_interval)
+        return self._finish(messages, text, max_tokens)
+
+    async def stream(
+        self, model: str, messages: List[Dict[str, str]], max_tokens: Optional[int] = None, **params: Any
+    ) -> AsyncIterator[GenerationResult]:
+        await self._wait_first_token()
+        text = self._respond(messages, max_tokens)
+        for start in range(0, len(text), self.chunk_size):
+            if start:
+                await asyncio.sleep(self.chunk_interval)
+            yield GenerationResult(text=text[start:start + self.chunk_size])
+        final = self._finish(messages, text, max_tokens)
+        final.text = ""
+        yield final
+
+    async def embed(self, model: str, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latency.sample(self.rng))
+        vectors = []
+        for text in texts:
+            rng = random.Random(int.from_bytes(self._digest(text)[:8], "big"))
+            vector = [rng.gauss(0, 1) for _ in range(self.embedding_dim)]
+            norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+            vectors.append([value / norm for value in vector])
+        return vectors
@@ -0,0 +1,240 @@
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+def make_cache_key(
+    backend: str,
+    model: str,
+    messages: List[Dict[str, Any]],
+    params: Optional[Dict[str, Any]] = None,
+) -> str:
+    """根据后端、模型、消息和采样参数生成缓存键"""
+    raw = json.dumps(
+        {
+            "backend": backend,
+            "model": model,
+            "messages": messages,
+            "params": params or {},
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CacheTier(ABC):
+    """缓存层抽象，ResponseCache 按顺序查询各层"""
+
+    name: str = "tier"
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        """读取缓存，未命中返回 None"""
+
+    @abstractmethod
+    async def set(self, key: str, value: Any) -> None:
+        """写入缓存"""
+
+    @abstractmethod
+    async def clear(self) -> None:
+        """清空缓存"""
+
+    async def stats(self) -> Dict[str, Any]:
+        """该层的统计信息"""
+        return {}
+
+
+class MemoryCacheTier(CacheTier):
+    """进程内 LRU 缓存"""
+
+    name = "memory"
+
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self.evictions = 0
+        self._data: "OrderedDict[str, Any]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        if key not in self._data:
+            return None
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    async def set(self, key: str, value: Any) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    async def clear(self) -> None:
+        self._data.clear()
+
+    async def stats(self) -> Dict[str, Any]:
+        return {"size": len(self._data), "max_size": self.max_size, "evictions": self.evictions}
+
+
+class SQLiteCacheTier(CacheTier):
+    """基于 SQLite 的持久化缓存，支持过期时间和条目上限"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str, ttl: float = 7 * 24 * 3600, max_entries: int = 10000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed_at)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if self.ttl and now - row[1] > self.ttl:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                conn.commit()
+                self.evictions += 1
+                return None
+            conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+            return json.loads(row[0])
+
+    def _set(self, key: str, value: Any) -> None:
+        with self._lock:
+            conn = self._connect()
+            now = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False, default=str), now, now),
+            )
+            if self.ttl:
+                cursor = conn.execute(
+                    "DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,)
+                )
+                self.evictions += cursor.rowcount
+            count = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            if count > self.max_entries:
+                cursor = conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN ("
+                    "SELECT key FROM llm_cache ORDER BY accessed_at ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+                self.evictions += cursor.rowcount
+            conn.commit()
+
+    def _clear(self) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM llm_cache")
+            conn.commit()
+
+    def _size(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    async def get(self, key: str) -> Optional[Any]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: Any) -> None:
+        await asyncio.to_thread(self._set, key, value)
+
+    async def clear(self) -> None:
+        await asyncio.to_thread(self._clear)
+
+    async def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "size": await asyncio.to_thread(self._size),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "evictions": self.evictions,
+        }
+
+
+class ResponseCache:
+    """多层模型响应缓存，按顺序查询各层，下层命中时回填上层"""
+
+    def __init__(self, tiers: List[CacheTier]):
+        self.logger = logging.getLogger("ResponseCache")
+        self.tiers = tiers
+        self.hits: Dict[str, int] = {tier.name: 0 for tier in tiers}
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        """逐层查询缓存"""
+        for index, tier in enumerate(self.tiers):
+            value = await tier.get(key)
+            if value is not None:
+                self.hits[tier.name] += 1
+                for upper in self.tiers[:index]:
+                    await upper.set(key, value)
+                self.logger.debug(f"缓存命中: {tier.name} - {key[:12]}")
+                return value
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Any) -> None:
+        """写入所有缓存层"""
+        for tier in self.tiers:
+            await tier.set(key, value)
+
+    async def clear(self) -> None:
+        """清空所有缓存层"""
+        for tier in self.tiers:
+            await tier.clear()
+
+    async def stats(self) -> Dict[str, Any]:
+        """命中、未命中及各层统计"""
+        total_hits = sum(self.hits.values())
+        lookups = total_hits + self.misses
+        return {
+            "hits": dict(self.hits),
+            "misses": self.misses,
+            "hit_rate": total_hits / lookups if lookups else 0.0,
+            "tiers": {tier.name: await tier.stats() for tier in self.tiers},
+        }
+
+
+def build_response_cache(
+    enabled: bool = True,
+    memory_size: int = 256,
+    path: Optional[str] = None,
+    ttl: float = 7 * 24 * 3600,
+    max_entries: int = 10000,
+) -> Optional[ResponseCache]:
+    """创建内存层加可选磁盘层的响应缓存，未启用时返回 None"""
+    if not enabled:
+        return None
+    tiers: List[CacheTier] = [MemoryCacheTier(memory_size)]
+    if path:
+        tiers.append(SQLiteCacheTier(path, ttl=ttl, max_entries=max_entries))
+    return ResponseCache(tiers)
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Type
+
+from .retry import is_retryable
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，请求被直接拒绝"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"熔断器 {name} 已打开，{retry_after:.1f} 秒后重新探测")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """按后端/模型划分的熔断器
+
+    关闭状态下连续失败达到阈值后打开；打开状态直接拒绝请求，超过恢复时间后
+    进入半开状态，放行少量探测请求，探测成功则关闭，失败则重新打开。
+    只有超时、连接错误、429 和 5xx 算作失败，请求参数错误说明后端仍然可用；
+    ignore 中的异常（例如调用方自己的时间预算用完）既不算成功也不算失败。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        is_failure: Callable[[BaseException], bool] = is_retryable,
+        ignore: Tuple[Type[BaseException], ...] = (),
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.is_failure = is_failure
+        self.ignore = ignore
+        self.logger = logging.getLogger("CircuitBreaker")
+
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.total_failures = 0
+        self.rejected = 0
+        self.times_opened = 0
+        self.opened_at: Optional[float] = None
+        self._probes = 0
+
+    def _transition(self, state: str) -> None:
+        if state != self.state:
+            self.logger.info(f"熔断器 {self.name}: {self.state} -> {state}")
+            self.state = state
+
+    def _before_call(self) -> None:
+        if self.state == self.OPEN:
+            elapsed = time.monotonic() - self.opened_at
+            if elapsed < self.recovery_timeout:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, self.recovery_timeout - elapsed)
+            self._transition(self.HALF_OPEN)
+            self._probes = 0
+        if self.state == self.HALF_OPEN:
+            if self._probes >= self.half_open_max_calls:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, 0.0)
+            self._probes += 1
+
+    def _on_success(self) -> None:
+        self.consecutive_failures = 0
+        if self.state == self.HALF_OPEN:
+            self._transition(self.CLOSED)
+
+    def _on_failure(self) -> None:
+        self.consecutive_failures += 1
+        self.total_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self.times_opened += 1
+            self._transition(self.OPEN)
+
+    def allows_request(self) -> bool:
+        """当前是否会放行请求（不占用探测名额）"""
+        if self.state == self.OPEN:
+            return time.monotonic() - self.opened_at >= self.recovery_timeout
+        if self.state == self.HALF_OPEN:
+            return self._probes < self.half_open_max_calls
+        return True
+
+    @asynccontextmanager
+    async def guard(self) -> AsyncIterator[None]:
+        """包裹一次后端调用，熔断打开时抛出 CircuitOpenError"""
+        self._before_call()
+        try:
+            yield
+        except (asyncio.CancelledError, GeneratorExit):
+            # 取消或流式调用方提前退出不代表后端状态，归还探测名额
+            self._release_probe()
+            raise
+        except Exception as exc:
+            if isinstance(exc, self.ignore):
+                self._release_probe()
+                raise
+            if self.is_failure(exc):
+                self._on_failure()
+            else:
+                self._on_success()
+            raise
+        else:
+            self._on_success()
+
+    def _release_probe(self) -> None:
+        if self.state == self.HALF_OPEN:
+            self._probes -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "total_failures": self.total_failures,
+            "rejected": self.rejected,
+            "times_opened": self.times_opened,
+        }
+
+
+class BreakerRegistry:
+    """按名称管理熔断器，新建的熔断器使用相同的参数"""
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        ignore: Tuple[Type[BaseException], ...] = (),
+    ):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.ignore = ignore
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        if name not in self._breakers:
+            self._breakers[name] = CircuitBreaker(
+                name,
+                failure_threshold=self.failure_threshold,
+                recovery_timeout=self.recovery_timeout,
+                half_open_max_calls=self.half_open_max_calls,
+                ignore=self.ignore,
+            )
+        return self._breakers[name]
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: breaker.stats() for name, breaker in self._breakers.items()}
+
+
+def parse_failover_chain(value: str) -> List[Tuple[str, str]]:
+    """解析 "后端:模型,后端:模型" 格式的故障转移链，模型名中可以包含冒号"""
+    chain = []
+    for item in value.split(","):
+        item = item.strip()
+        if item:
+            backend, _, model = item.partition(":")
+            chain.append((backend.strip(), model.strip()))
+    return chain
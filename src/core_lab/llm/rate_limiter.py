@@ -0,0 +1,339 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+
+class TokenBucket:
+    """令牌桶，按每分钟速率匀速补充"""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens = self.capacity
+        self._updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """获得 amount 个令牌还需等待的秒数"""
+        self._refill()
+        # 超过容量的请求只要求桶是满的，避免永远等待
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        """扣除令牌，可以扣成负数（按实际用量补扣）"""
+        self._refill()
+        self.tokens -= amount
+
+
+class ConcurrencyGate:
+    """并发上限，等待者按先来先服务的顺序获得名额，上限可以在运行时调整"""
+
+    def __init__(self, limit: int):
+        self._limit = max(1, limit)
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @limit.setter
+    def limit(self, value: int) -> None:
+        self._limit = max(1, value)
+        self._wake()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < self._limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    async def acquire(self) -> None:
+        if not self._waiters and self.in_flight < self._limit:
+            self.in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # 已经分到名额后才被取消，交还名额
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+
+def is_overload_error(exc: BaseException) -> bool:
+    """判断异常是否表示后端过载：超时、429 或 5xx"""
+    if isinstance(exc, asyncio.TimeoutError):
+        return True
+    status = getattr(exc, "status", None) or getattr(exc, "status_code", None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+
+class AdaptiveConcurrency:
+    """根据过载信号自适应调整并发上限
+
+    上限被用满且单令牌延迟平稳时，每完成约 limit 个请求把上限加一（加性增）；
+    只有超时、429 和 5xx 才按比例降低上限（乘性减），每个延迟周期内最多降低一次。
+    生成长度不同的请求原始延迟相差很大，所以延迟按生成的令牌数归一化后只用来
+    决定是否继续上探：单令牌延迟超过基线的 tolerance 倍时保持当前上限。
+    """
+
+    def __init__(
+        self,
+        gate: ConcurrencyGate,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        tolerance: float = 2.0,
+        backoff: float = 0.5,
+        smoothing: float = 0.2,
+        baseline_drift: float = 0.01,
+        history_size: int = 200,
+    ):
+        self.gate = gate
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.smoothing = smoothing
+        self.baseline_drift = baseline_drift
+        self.estimate = float(gate.limit)
+        # 单令牌延迟（没有令牌数时为整次延迟）的基线和平滑值
+        self.baseline: Optional[float] = None
+        self.smoothed: Optional[float] = None
+        # 整次调用的平滑延迟，作为降低上限的冷却周期
+        self.round_trip: Optional[float] = None
+        self.history: Deque[Dict[str, Any]] = deque(maxlen=history_size)
+        self._last_decrease = 0.0
+
+    def on_sample(self, latency: float, error: Optional[BaseException] = None, tokens: int = 0) -> None:
+        """记录一次调用的延迟、生成的令牌数和结果并调整上限"""
+        now = time.monotonic()
+        if error is not None:
+            if is_overload_error(error):
+                self._decrease(now, self.backoff, "overload")
+            return
+
+        if self.round_trip is None:
+            self.round_trip = latency
+        else:
+            self.round_trip += self.smoothing * (latency - self.round_trip)
+
+        sample = latency / tokens if tokens > 0 else latency
+        # 基线缓慢上浮，模型切换后能重新找到新的最低延迟
+        if self.baseline is None:
+            self.baseline = sample
+        else:
+            self.baseline = min(sample, self.baseline * (1 + self.baseline_drift))
+        if self.smoothed is None:
+            self.smoothed = sample
+        else:
+            self.smoothed += self.smoothing * (sample - self.smoothed)
+
+        # 只有上限被用满且延迟没有膨胀时才继续向上探测
+        if self.gate.in_flight >= self.gate.limit and self.smoothed <= self.baseline * self.tolerance:
+            self._set(self.estimate + 1 / self.estimate, "probe")
+
+    def _decrease(self, now: float, ratio: float, reason: str) -> None:
+        if self.round_trip and now - self._last_decrease < self.round_trip:
+            return
+        self._last_decrease = now
+        self._set(self.estimate * ratio, reason)
+
+    def _set(self, estimate: float, reason: str) -> None:
+        self.estimate = min(float(self.max_limit), max(float(self.min_limit), estimate))
+        limit = int(self.estimate)
+        if limit != self.gate.limit:
+            self.gate.limit = limit
+            self.history.append({"time": time.time(), "limit": limit, "reason": reason})
+
+    def stats(self) -> Dict[str, Any]:
+        history: List[Dict[str, Any]] = list(self.history)
+        return {
+            "limit": self.gate.limit,
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "baseline_latency": self.baseline,
+            "smoothed_latency": self.smoothed,
+            "round_trip": self.round_trip,
+            "history": history,
+        }
+
+
+class _LatencyStats:
+    """累计耗时统计"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "avg": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+        }
+
+
+class Permit:
+    """一次获准的模型调用"""
+
+    def __init__(self, limiter: "BackendLimiter", estimated_tokens: int, queue_wait: float):
+        self.limiter = limiter
+        self.estimated_tokens = estimated_tokens
+        self.queue_wait = queue_wait
+        self.output_tokens = 0
+
+    def record_tokens(self, actual_tokens: int, output_tokens: int = 0) -> None:
+        """按实际消耗的令牌数修正每分钟令牌桶，output_tokens 为生成的令牌数"""
+        if self.limiter.tpm_bucket:
+            self.limiter.tpm_bucket.consume(actual_tokens - self.estimated_tokens)
+        self.estimated_tokens = actual_tokens
+        self.output_tokens = output_tokens
+
+
+class BackendLimiter:
+    """单个后端/模型的限流器：最大并发 + 每分钟请求数 + 每分钟令牌数
+
+    排队的调用者按先来先服务的顺序放行，排队时间和生成时间分开统计。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None,
+        adaptive_max: Optional[int] = None,
+    ):
+        self.name = name
+        self.gate = ConcurrencyGate(max_concurrency)
+        # 提供 adaptive_max 时并发上限在 [1, adaptive_max] 之间自动调整
+        self.adaptive = AdaptiveConcurrency(self.gate, max_limit=adaptive_max) if adaptive_max else None
+        self.rpm_bucket = TokenBucket(rpm) if rpm else None
+        self.tpm_bucket = TokenBucket(tpm) if tpm else None
+        self.queue_wait = _LatencyStats()
+        self.generation_time = _LatencyStats()
+        self.queued = 0
+        self._fifo = asyncio.Lock()
+
+    async def _wait_buckets(self, estimated_tokens: int) -> None:
+        while True:
+            delay = 0.0
+            if self.rpm_bucket:
+                delay = max(delay, self.rpm_bucket.wait_time(1))
+            if self.tpm_bucket:
+                delay = max(delay, self.tpm_bucket.wait_time(estimated_tokens))
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        if self.rpm_bucket:
+            self.rpm_bucket.consume(1)
+        if self.tpm_bucket:
+            self.tpm_bucket.consume(estimated_tokens)
+
+    @asynccontextmanager
+    async def acquire(self, estimated_tokens: int = 0) -> AsyncIterator[Permit]:
+        """排队获取调用许可，退出上下文时归还并发名额"""
+        queued_at = time.perf_counter()
+        self.queued += 1
+        try:
+            # 队首调用者拿到并发名额和令牌之前，后面的调用者不会越过它
+            async with self._fifo:
+                await self.gate.acquire()
+                try:
+                    await self._wait_buckets(estimated_tokens)
+                except BaseException:
+                    self.gate.release()
+                    raise
+        finally:
+            self.queued -= 1
+        started_at = time.perf_counter()
+        permit = Permit(self, estimated_tokens, started_at - queued_at)
+        self.queue_wait.add(permit.queue_wait)
+        error: Optional[BaseException] = None
+        try:
+            yield permit
+        except BaseException as exc:
+            error = exc
+            raise
+        finally:
+            latency = time.perf_counter() - started_at
+            self.generation_time.add(latency)
+            if self.adaptive and not isinstance(error, asyncio.CancelledError):
+                self.adaptive.on_sample(latency, error, permit.output_tokens)
+            self.gate.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.gate.limit,
+            "in_flight": self.gate.in_flight,
+            "queued": self.queued,
+            "queue_wait": self.queue_wait.to_dict(),
+            "generation_time": self.generation_time.to_dict(),
+            "adaptive": self.adaptive.stats() if self.adaptive else None,
+        }
+
+
+class LimiterRegistry:
+    """按 (后端, 模型) 管理限流器，同一后端的模型默认共享配置"""
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        rpm: float = 0,
+        tpm: float = 0,
+        adaptive_max: Optional[int] = None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.rpm = rpm
+        self.tpm = tpm
+        self.adaptive_max = adaptive_max
+        self._limiters: Dict[Tuple[str, str], BackendLimiter] = {}
+
+    def get(self, backend: str, model: str) -> BackendLimiter:
+        key = (backend, model)
+        if key not in self._limiters:
+            self._limiters[key] = BackendLimiter(
+                f"{backend}:{model}",
+                max_concurrency=self.max_concurrency,
+                rpm=self.rpm,
+                tpm=self.tpm,
+                adaptive_max=self.adaptive_max or None,
+            )
+        return self._limiters[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {limiter.name: limiter.stats() for limiter in self._limiters.values()}
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的令牌数，中文约每字一个令牌"""
+    return max(1, len(text))
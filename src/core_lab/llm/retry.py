@@ -0,0 +1,152 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple, TypeVar
+
+import httpx
+
+T = TypeVar("T")
+
+# HTTP 客户端的传输层异常，两个应用都通过 httpx 调用模型后端
+_TRANSPORT_ERRORS: Tuple[type, ...] = (httpx.TransportError,)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """判断异常是否值得重试：超时、连接错误、429 和 5xx 可以重试，其余 4xx 不重试"""
+    if isinstance(exc, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = getattr(exc, "status", None) or getattr(exc, "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return isinstance(exc, _TRANSPORT_ERRORS)
+
+
+class RetryPolicy:
+    """带抖动的指数退避重试策略，可设置总截止时间"""
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 10.0,
+        deadline: Optional[float] = None,
+        retry_on: Callable[[BaseException], bool] = is_retryable,
+    ):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.retry_on = retry_on
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次失败后的等待时间（full jitter）"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def next_delay(self, attempt: int, exc: BaseException, elapsed: float = 0.0) -> Optional[float]:
+        """第 attempt 次失败后重试前的等待时间，超出次数、不可重试或会越过截止时间时返回 None"""
+        if attempt >= self.max_attempts or not self.retry_on(exc):
+            return None
+        delay = self.backoff(attempt)
+        if self.deadline is not None and elapsed + delay >= self.deadline:
+            return None
+        return delay
+
+    async def call(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        on_retry: Optional[Callable[[int, BaseException, float], None]] = None,
+    ) -> T:
+        """执行 fn，失败时按策略重试，超出次数或截止时间后抛出最后一次的异常"""
+        started_at = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                if self.deadline is None:
+                    return await fn()
+                remaining = self.deadline - (time.monotonic() - started_at)
+                if remaining <= 0:
+                    raise asyncio.TimeoutError("重试截止时间已到")
+                return await asyncio.wait_for(fn(), remaining)
+            except Exception as exc:
+                delay = self.next_delay(attempt, exc, time.monotonic() - started_at)
+                if delay is None:
+                    raise
+                if on_retry:
+                    on_retry(attempt, exc, delay)
+                await asyncio.sleep(delay)
+
+
+class Hedger:
+    """对冲请求：请求耗时超过历史 p95 时再发一个相同请求，取先成功的结果并取消另一个"""
+
+    def __init__(self, percentile: float = 0.95, min_samples: int = 20, window: int = 200):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.hedged = 0  # 发出对冲请求的次数
+        self.hedge_wins = 0  # 对冲请求先完成的次数
+
+    def delay(self) -> Optional[float]:
+        """对冲前的等待时间，样本不足时返回 None 表示不对冲"""
+        if len(self.latencies) < self.min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile))
+        return ordered[index]
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        started_at = time.perf_counter()
+        delay = self.delay()
+        primary = asyncio.ensure_future(fn())
+        tasks = {primary}
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    self.hedged += 1
+                    tasks.add(asyncio.ensure_future(fn()))
+
+            while True:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tasks.discard(task)
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        self.latencies.append(time.perf_counter() - started_at)
+                        return task.result()
+                    if not tasks:
+                        raise task.exception()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "delay": self.delay(),
+            "samples": len(self.latencies),
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+        }
+
+
+class HedgerRegistry:
+    """按后端/模型管理对冲器，每个模型单独统计延迟分布"""
+
+    def __init__(self, percentile: float = 0.95, min_samples: int = 20):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self._hedgers: Dict[str, Hedger] = {}
+
+    def get(self, name: str) -> Hedger:
+        if name not in self._hedgers:
+            self._hedgers[name] = Hedger(percentile=self.percentile, min_samples=self.min_samples)
+        return self._hedgers[name]
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: hedger.stats() for name, hedger in self._hedgers.items()}
@@ -0,0 +1,66 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class _Call:
+    """一次正在进行的共享调用"""
+
+    def __init__(self, task: "asyncio.Task[Any]"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """合并相同键的并发调用，所有调用方等待同一次执行的结果"""
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self.executed = 0  # 实际执行的次数
+        self.shared = 0  # 被合并掉的调用次数
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """执行 fn，如果相同 key 的调用正在进行则等待其结果
+
+        异常会传递给所有等待者；单个等待者被取消不会影响其他等待者，
+        只有全部等待者都取消时才会取消底层调用。
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda task: self._finish(key, call))
+            self.executed += 1
+        else:
+            self.shared += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # 已取消的调用不再被新的调用方复用
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                call.task.cancel()
+
+    def _finish(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        # 所有等待者都已离开时，避免出现未获取异常的警告
+        if not call.task.cancelled():
+            call.task.exception()
+
+    def in_flight(self) -> int:
+        """正在进行的调用数量"""
+        return len(self._calls)
+
+    def stats(self) -> Dict[str, int]:
+        """合并统计"""
+        return {
+            "in_flight": self.in_flight(),
+            "executed": self.executed,
+            "shared": self.shared,
+        }